@@ -0,0 +1,261 @@
+#
+#  Copyright 2019 The FATE Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import asyncio
+import contextlib
+import json
+import os
+import typing
+from pathlib import Path
+
+from fate_test._flow_client import (QueryJobResponse, PollBackoff, POLL_MAX_INTERVAL, POLL_MAX_FAILURES,
+                                    upload_file_path)
+from fate_test._http import IDEMPOTENT_METHODS, RETRY_BACKOFF_FACTOR, http_options
+from fate_test._io import LOGGER
+from fate_test._parser import Data
+
+
+class AsyncFLOWClient(object):
+    """
+    asyncio counterpart of `FLOWClient` talking to flow http api directly, configured by the same `http` section:
+    all coroutines of a client share one connection pool of at most `pool_size` connections, and a request fails
+    once connecting takes longer than `connect_timeout` or the service is silent for `read_timeout` seconds;
+    requests refused or reset before answer are retried up to `retries` times as by `FlowSession`.
+    Requires aiohttp (`pip install fate_test[async]`), call `close` when done
+    """
+
+    def __init__(self,
+                 address: typing.Optional[str],
+                 data_base_dir: typing.Optional[Path],
+                 cache_directory: typing.Optional[Path],
+                 poll_max_interval: typing.Optional[float] = None,
+                 http: typing.Optional[dict] = None):
+        self.address = address
+        self.version = "v2"
+        self._base_url = f"http://{address}/{self.version}"
+        self._data_base_dir = data_base_dir
+        self._cache_directory = cache_directory
+        self._poll_max_interval = poll_max_interval or POLL_MAX_INTERVAL
+        self._http = http_options(http)
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            import aiohttp
+
+            options = self._http
+            connector = aiohttp.TCPConnector(limit=options["pool_size"], limit_per_host=options["pool_size"],
+                                             force_close=not options["keep_alive"])
+            # uploads may take long in total, only connecting and each read are limited
+            timeout = aiohttp.ClientTimeout(total=None, sock_connect=options["connect_timeout"],
+                                            sock_read=options["read_timeout"])
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _request(self, method, endpoint, body=None, **kwargs):
+        """
+        send request and return its json response; `body` is a function returning a context manager
+        which yields request data, called again for each attempt, e.g. a form streaming a file;
+        a request refused is retried whatever its method, one reset only if its method is idempotent
+        """
+        import aiohttp
+
+        retries = self._http["retries"]
+        attempt = 0
+        while True:
+            try:
+                with body() if body is not None else contextlib.nullcontext() as data:
+                    if data is not None:
+                        kwargs["data"] = data
+                    async with self._get_session().request(method, f"{self._base_url}/{endpoint}",
+                                                           **kwargs) as response:
+                        response.raise_for_status()
+                        return await response.json(content_type=None)
+            except aiohttp.ClientConnectorError as e:
+                error = e
+            except (aiohttp.ServerDisconnectedError, aiohttp.ClientOSError) as e:
+                if method not in IDEMPOTENT_METHODS:
+                    raise
+                error = e
+            if attempt >= retries:
+                raise error
+            attempt += 1
+            LOGGER.debug(f"{method} {endpoint} of {self.address} failed, retry {attempt}/{retries}: {error}")
+            # same backoff as urllib3: first retry at once, then doubling
+            await asyncio.sleep(0 if attempt <= 1 else RETRY_BACKOFF_FACTOR * 2 ** (attempt - 1))
+
+    async def _get(self, endpoint, **params):
+        return await self._request("GET", endpoint, params={k: v for k, v in params.items() if v is not None})
+
+    async def _post(self, endpoint, **kwargs):
+        return await self._request("POST", endpoint, **kwargs)
+
+    def upload_file_path(self, data: Data, output_path=None):
+        """
+        path of file uploaded for `data`
+        """
+        return upload_file_path(data, output_path, self._data_base_dir, self._cache_directory)
+
+    async def bind_table(self, data: Data, callback=None):
+        conf = data.config
+        conf['file'] = os.path.join(str(self._data_base_dir), conf.get('file'))
+        path = Path(conf.get('file'))
+        if not path.exists():
+            raise Exception('The file is obtained from the fate flow client machine, but it does not exist, '
+                            f'please check the path: {path}')
+        response = await self._post("table/bind/path",
+                                    json=dict(path=str(path), namespace=data.namespace, name=data.table_name))
+        try:
+            if callback is not None:
+                callback(response)
+                status = str(response['message']).lower()
+            else:
+                status = response["message"]
+            code = response["code"]
+            if code != 0:
+                raise RuntimeError(f"Return code {code} != 0, bind path failed")
+        except BaseException:
+            raise ValueError(f"Bind path failed, response={response}")
+        return status
+
+    async def _upload_file(self, data: Data, output_path=None):
+        import aiohttp
+
+        conf = data.config
+        path = self.upload_file_path(data, output_path)
+        conf['file'] = str(path)
+        if not path.exists():
+            raise Exception('The file is obtained from the fate flow client machine, but it does not exist, '
+                            f'please check the path: {path}')
+        # fields encoded as flow sdk `data.upload_file` does
+        fields = dict(head=data.head, partitions=data.partitions, meta=json.dumps(data.meta), namespace=data.namespace,
+                      name=data.table_name, extend_sid=data.extend_sid)
+
+        @contextlib.contextmanager
+        def _form():
+            with open(path, "rb") as f:
+                form = aiohttp.FormData()
+                for name, value in fields.items():
+                    if value is not None:
+                        form.add_field(name, str(value))
+                form.add_field("file", f, filename=path.name)
+                yield form
+
+        return await self._post("data/component/upload/file", body=_form)
+
+    async def submit_upload(self, data: Data, output_path=None):
+        """
+        upload file of `data` and return job id of the upload job without waiting for it
+        """
+        response = await self._upload_file(data, output_path)
+        try:
+            return response["job_id"]
+        except Exception as e:
+            raise RuntimeError(f"upload data failed, response={response}") from e
+
+    async def upload_file_and_convert_to_dataframe(self, data: Data, callback=None, output_path=None):
+        """
+        upload file of `data` and wait for the upload job, `callback` is called once with the upload response
+        as `FLOWClient` does
+        """
+        response = await self._upload_file(data, output_path)
+        try:
+            if callback is not None:
+                callback(response)
+            job_id = response["job_id"]
+        except Exception as e:
+            raise RuntimeError(f"upload data failed") from e
+        status = await self.awaiting(job_id, "local", 0)
+        return str(status).lower()
+
+    async def query_job(self, job_id, role, party_id):
+        response = await self._get("job/query", job_id=job_id, role=role, party_id=party_id)
+        return QueryJobResponse(response)
+
+    async def query_task(self, job_id, role, party_id):
+        return await self._get("job/task/query", job_id=job_id, role=role, party_id=party_id)
+
+    async def awaiting(self, job_id, role, party_id, callback=None):
+        """
+        poll job with backoff until it is done and return its final `Status`
+        """
+        backoff = PollBackoff(max_interval=self._poll_max_interval)
+        failures = 0
+        while True:
+            await asyncio.sleep(backoff.next())
+            try:
+                response = await self.query_job(job_id, role, party_id)
+            except Exception as e:
+                failures += 1
+                if failures >= POLL_MAX_FAILURES:
+                    raise
+                LOGGER.debug(f"query job {job_id} failed {failures} times, retry later: {e}")
+                continue
+            failures = 0
+            if response.status.is_done():
+                return response.status
+            if callback is not None:
+                callback(response)
+
+    async def output_data_table(self, job_id, role, party_id, task_name, output_data_name):
+        response = await self._get("output/data/table", job_id=job_id, role=role, party_id=party_id,
+                                   task_name=task_name)
+        if response.get("code") is not None:
+            raise ValueError(f"Query output data table failed, response={response}")
+        output_data_info = response.get(output_data_name)[0]
+        if output_data_info is None:
+            raise ValueError(f"output data name {output_data_name} not found")
+        return output_data_info
+
+    async def table_query(self, table_name, namespace):
+        response = await self._get("table/query", namespace=namespace, name=table_name, display="False")
+        try:
+            code = response["code"]
+            if code != 0:
+                raise ValueError(f"Return code {code}!=0")
+            return json.dumps(response["data"], indent=4)
+        except BaseException:
+            raise ValueError(f"Query table fails, response={response}")
+
+    async def table_count(self, table_name, namespace):
+        """
+        row count of table, None if table does not exist
+        """
+        response = await self._get("table/query", namespace=namespace, name=table_name, display="False")
+        if response.get("code") != 0 or not response.get("data"):
+            return None
+        return response["data"].get("count")
+
+    async def delete_data(self, data: Data):
+        try:
+            table_name = data.config['table_name'] if data.config.get(
+                'table_name', None) is not None else data.config.get('name')
+            await self.delete_table(table_name, data.config['namespace'])
+        except Exception as e:
+            raise RuntimeError(f"delete data failed") from e
+
+    async def delete_table(self, table_name, namespace):
+        return await self._post("table/delete", json=dict(namespace=namespace, name=table_name))
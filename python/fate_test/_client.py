@@ -13,14 +13,21 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 #
+import typing
 
 from fate_test._flow_client import FLOWClient
+from fate_test._http import pretty_http_stats
 from fate_test._parser import Config
 
+if typing.TYPE_CHECKING:
+    from fate_test._async_flow_client import AsyncFLOWClient
+
 
 class Clients(object):
     def __init__(self, config: Config):
         self._flow_clients = {}
+        self._async_flow_clients = {}
+        self._config = config
         # self._tunnel_id_to_flow_clients = {}
         self._role_str_to_service_id = {}
         for party, service_id in config.party_to_service_id.items():
@@ -30,15 +37,43 @@ class Clients(object):
         for service_id, service in config.service_id_to_service.items():
             if isinstance(service, Config.service):
                 self._flow_clients[service_id] = FLOWClient(
-                    service.address, config.data_base_dir, config.cache_directory)
+                    service.address, config.data_base_dir, config.cache_directory, config.poll_max_interval,
+                    config.http)
 
     def __getitem__(self, role_str: str) -> 'FLOWClient':
         if role_str not in self._role_str_to_service_id:
             raise RuntimeError(f"no flow client found binding to {role_str}")
         return self._flow_clients[self._role_str_to_service_id[role_str]]
 
+    def async_client(self, role_str: str) -> 'AsyncFLOWClient':
+        """
+        asyncio flow client of service binding to `role_str`, created on first use and shared by roles of the service
+        """
+        if role_str not in self._role_str_to_service_id:
+            raise RuntimeError(f"no flow client found binding to {role_str}")
+        service_id = self._role_str_to_service_id[role_str]
+        if service_id not in self._async_flow_clients:
+            from fate_test._async_flow_client import AsyncFLOWClient
+
+            config = self._config
+            self._async_flow_clients[service_id] = AsyncFLOWClient(
+                config.service_id_to_service[service_id].address, config.data_base_dir, config.cache_directory,
+                config.poll_max_interval, config.http)
+        return self._async_flow_clients[service_id]
+
+    async def close_async_clients(self):
+        for client in self._async_flow_clients.values():
+            await client.close()
+        self._async_flow_clients = {}
+
     def contains(self, role_str):
         return role_str in self._role_str_to_service_id
 
     def all_roles(self):
         return sorted(self._role_str_to_service_id.keys())
+
+    def flow_clients(self):
+        return list(self._flow_clients.values())
+
+    def pretty_http_stats(self):
+        return pretty_http_stats([client.session for client in self._flow_clients.values()])
@@ -49,6 +49,17 @@ fate_base: path(FATE)/
 # whether to delete data in suites after all jobs done
 clean_data: true
 
+# max seconds between two status queries of a running job, polling starts fast and backs off up to it
+# poll_max_interval: 5
+
+# http connections to each flow service
+# http:
+#   pool_size: 10        # max connections kept alive
+#   keep_alive: true
+#   connect_timeout: 10  # seconds
+#   read_timeout: 300    # seconds
+#   retries: 3           # retries of refused connections, and of reset connections for idempotent requests
+
 # participating parties' id and corresponding flow service ip & port information
 parties:
   guest: ['9999']
@@ -176,6 +187,8 @@ class Config(object):
         self.all_examples_data_config = os.path.join(config["data_base_dir"], config["all_examples_data_config"])
         self.fate_base = config["fate_base"]
         self.clean_data = config.get("clean_data", True)
+        self.poll_max_interval = config.get("poll_max_interval", None)
+        self.http = config.get("http", None)
         self.parties = Parties.from_dict(config["parties"])
         self.role = config["parties"]
         self.serving_setting = config["services"][0]
@@ -247,6 +260,11 @@ class Config(object):
         return config
 
 
+# let pickle find service tuples as attributes of Config, so that config can be sent to worker processes
+for _service_type in (Config.service, Config.tunnel_service, Config.tunnel):
+    _service_type.__qualname__ = f"Config.{_service_type.__name__}"
+
+
 def parse_config(config):
     try:
         config_inst = Config.load(config)
@@ -0,0 +1,249 @@
+#
+#  Copyright 2019 The FATE Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import asyncio
+import contextlib
+import contextvars
+import threading
+import time
+
+from fate_test._io import LOGGER
+
+SUBMITTED = "submitted"
+FINISHED = "finished"
+
+# (publisher, task) job events published in current thread or coroutine go to
+_scope = contextvars.ContextVar("fate_test_job_event_scope", default=None)
+
+
+class JobEvent(object):
+    """
+    job submitted or finished while running `task`, e.g. a pipeline job of a testsuite;
+    `event` is the pipeline stage which ran the job, such as `fit` or `predict`
+    """
+
+    def __init__(self, task, kind, job_id, event=None, status=None, elapsed=None):
+        self.task = task
+        self.kind = kind
+        self.job_id = job_id
+        self.event = event
+        self.status = status
+        self.elapsed = elapsed
+
+    def to_dict(self):
+        return dict(task=self.task, kind=self.kind, job_id=self.job_id, event=self.event,
+                    status=None if self.status is None else str(self.status), elapsed=self.elapsed)
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(**d)
+
+    def __repr__(self):
+        return f"JobEvent({self.task}, {self.kind}, {self.job_id}, event={self.event}, status={self.status})"
+
+
+class JobEventBus(object):
+    """
+    job events of running tasks, safe to publish from any thread; subprocesses publish through `PipePublisher`
+    and their events are delivered with `receive`, coroutines consume events with `stream`
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events = {}
+        self._subscribers = []
+
+    def publish(self, event: JobEvent):
+        with self._lock:
+            self._events.setdefault(event.task, []).append(event)
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            # noinspection PyBroadException
+            try:
+                subscriber(event)
+            except Exception:
+                LOGGER.exception(f"subscriber of job events failed on {event}")
+
+    def subscribe(self, callback):
+        """
+        call `callback` with each event published from now on, return function cancelling subscription
+        """
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def _unsubscribe():
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+
+        return _unsubscribe
+
+    async def stream(self, task=None):
+        """
+        yield events published from now on, of `task` only if given
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+
+        def _put(event):
+            if task is None or event.task == task:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+
+        unsubscribe = self.subscribe(_put)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            unsubscribe()
+
+    def events(self, task, kind=None):
+        with self._lock:
+            return [event for event in self._events.get(task, []) if kind is None or event.kind == kind]
+
+    def submitted(self, task):
+        """
+        submitted jobs of task in order, latest known status of each filled in from its finished event
+        """
+        events = self.events(task)
+        finished = {event.job_id: event for event in events if event.kind == FINISHED}
+        jobs = []
+        for event in events:
+            if event.kind != SUBMITTED or any(job.job_id == event.job_id for job in jobs):
+                continue
+            done = finished.get(event.job_id)
+            jobs.append(event if done is None else
+                        JobEvent(task, SUBMITTED, event.job_id, event.event, done.status, done.elapsed))
+        return jobs
+
+    def clear(self, task):
+        with self._lock:
+            self._events.pop(task, None)
+
+    def receive(self, message):
+        """
+        publish `message` if it is an event sent by `PipePublisher` and return the event, None if it was not one
+        """
+        if isinstance(message, dict) and message.get("job_event") is not None:
+            event = JobEvent.from_dict(message["job_event"])
+            self.publish(event)
+            return event
+        return None
+
+
+# bus of job events of this process
+job_events = JobEventBus()
+
+
+class PipePublisher(object):
+    """
+    publisher of a subprocess, sending events through `conn` to be delivered by `JobEventBus.receive`
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._lock = threading.Lock()
+
+    def publish(self, event: JobEvent):
+        with self._lock:
+            self._conn.send(dict(job_event=event.to_dict()))
+
+
+@contextlib.contextmanager
+def publish_to(publisher, task):
+    """
+    job events published by current thread or coroutine inside the block go to `task` of `publisher`,
+    including jobs of fate client pipelines run inside the block, see `install_pipeline_callback`
+    """
+    install_pipeline_callback()
+    token = _scope.set((publisher, task))
+    try:
+        yield publisher
+    finally:
+        _scope.reset(token)
+
+
+def publish_job(job_id, event=None, kind=SUBMITTED, status=None, elapsed=None):
+    """
+    publish job of the task running in current scope, e.g. from a pipeline callback; ignored outside a scope
+    """
+    scope = _scope.get()
+    if scope is None:
+        LOGGER.debug(f"job {job_id} published outside of any task, ignored")
+        return
+    publisher, task = scope
+    publisher.publish(JobEvent(task, kind, job_id, event, status, elapsed))
+
+
+class PipelineJobCallback(object):
+    """
+    fate client pipeline callback publishing each job of the pipeline when it is submitted and once it succeeds;
+    a failed job raises in the pipeline before its end callback, its status is left to be queried from flow
+    """
+
+    def __init__(self):
+        self._submit_time = {}
+
+    def on_fit_begin(self, job_info=None, **kwargs):
+        self._submitted(job_info, "fit")
+
+    def on_fit_end(self, job_info=None, **kwargs):
+        self._succeeded(job_info, "fit")
+
+    def on_predict_begin(self, job_info=None, **kwargs):
+        self._submitted(job_info, "predict")
+
+    def on_predict_end(self, job_info=None, **kwargs):
+        self._succeeded(job_info, "predict")
+
+    # fate client `CallbackHandler` dispatches end of predict under this name
+    on_prediction_end = on_predict_end
+
+    def _submitted(self, job_info, event):
+        self._submit_time[job_info["job_id"]] = time.time()
+        publish_job(job_info["job_id"], event)
+
+    def _succeeded(self, job_info, event):
+        submit_time = self._submit_time.pop(job_info["job_id"], None)
+        publish_job(job_info["job_id"], event, kind=FINISHED, status="success",
+                    elapsed=None if submit_time is None else time.time() - submit_time)
+
+
+_install_lock = threading.Lock()
+_installed = []
+
+
+def install_pipeline_callback():
+    """
+    add `PipelineJobCallback` to each fate client pipeline created from now on in this process,
+    return whether fate client pipeline is available
+    """
+    with _install_lock:
+        if _installed:
+            return _installed[0]
+        try:
+            from fate_client.pipeline.pipeline import Pipeline
+        except ImportError:
+            LOGGER.debug("fate client pipeline not found, pipeline jobs are not published")
+            _installed.append(False)
+            return False
+        init_callback_handler = Pipeline._init_callback_handler
+
+        def _init_callback_handler(self):
+            init_callback_handler(self)
+            self.add_callback(PipelineJobCallback())
+
+        Pipeline._init_callback_handler = _init_callback_handler
+        _installed.append(True)
+        return True
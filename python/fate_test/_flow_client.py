@@ -15,28 +15,62 @@
 #
 import json
 import os
+import random
+import threading
 import time
 import typing
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import timedelta
 from pathlib import Path
 
 from fate_client.flow_sdk import FlowClient
 from fate_test import _config
+from fate_test._http import FlowSession, attach_session, http_options
+from fate_test._io import LOGGER
 from fate_test._parser import Data
 
+# seconds between polls of a running job: start fast and back off exponentially up to the max interval
+POLL_INITIAL_INTERVAL = 0.2
+POLL_MAX_INTERVAL = 5.0
+POLL_BACKOFF_FACTOR = 2.0
+# each interval is randomized by this fraction of itself, so that jobs submitted together are polled apart
+POLL_JITTER = 0.2
+# consecutive failed queries of a job before giving up waiting for it
+POLL_MAX_FAILURES = 5
+# max number of jobs queried at the same time by `query_jobs`
+DEFAULT_QUERY_CONCURRENCY = 8
+
+
+def upload_file_path(data: Data, output_path, data_base_dir, cache_directory):
+    conf = data.config
+    # if conf.get("engine", {}) != "PATH":
+    if output_path is not None:
+        return Path(os.path.join(os.path.abspath(output_path), os.path.basename(conf.get('file'))))
+    if _config.data_switch is not None:
+        return Path(os.path.join(str(cache_directory), os.path.basename(conf.get('file'))))
+    return Path(os.path.join(str(data_base_dir), conf.get('file')))
+
 
 class FLOWClient(object):
 
     def __init__(self,
                  address: typing.Optional[str],
                  data_base_dir: typing.Optional[Path],
-                 cache_directory: typing.Optional[Path]):
+                 cache_directory: typing.Optional[Path],
+                 poll_max_interval: typing.Optional[float] = None,
+                 http: typing.Optional[dict] = None):
         self.address = address
         self.version = "v2"
         self._client = FlowClient(self.address.split(':')[0], self.address.split(':')[1], self.version)
+        self.session = FlowSession(address, **http_options(http))
+        attach_session(self._client, self.session)
         self._data_base_dir = data_base_dir
         self._cache_directory = cache_directory
         self.data_size = 0
+        self.poller = JobPoller(self, poll_max_interval or POLL_MAX_INTERVAL)
+        # responses of finished jobs, which never change
+        self._finished_jobs = {}
+        self._finished_jobs_lock = threading.Lock()
 
     def set_address(self, address):
         self.address = address
@@ -71,26 +105,7 @@ class FLOWClient(object):
         return status
 
     def upload_file_and_convert_to_dataframe(self, data: Data, callback=None, output_path=None):
-        conf = data.config
-        # if conf.get("engine", {}) != "PATH":
-        if output_path is not None:
-            conf['file'] = os.path.join(os.path.abspath(output_path), os.path.basename(conf.get('file')))
-        else:
-            if _config.data_switch is not None:
-                conf['file'] = os.path.join(str(self._cache_directory), os.path.basename(conf.get('file')))
-            else:
-                conf['file'] = os.path.join(str(self._data_base_dir), conf.get('file'))
-        path = Path(conf.get('file'))
-        if not path.exists():
-            raise Exception('The file is obtained from the fate flow client machine, but it does not exist, '
-                            f'please check the path: {path}')
-        response = self._client.data.upload_file(file=str(path),
-                                                 head=data.head,
-                                                 meta=data.meta,
-                                                 extend_sid=data.extend_sid,
-                                                 partitions=data.partitions,
-                                                 namespace=data.namespace,
-                                                 name=data.table_name)
+        response = self._upload_file(data, output_path)
         try:
             if callback is not None:
                 callback(response)
@@ -105,14 +120,50 @@ class FLOWClient(object):
         self._awaiting(job_id, "local", 0)
         return status
 
+    def submit_upload(self, data: Data, output_path=None):
+        """
+        upload file of `data` and return job id of the upload job without waiting for it,
+        query its status by `query_job(job_id, "local", 0)`
+        """
+        response = self._upload_file(data, output_path)
+        try:
+            return response["job_id"]
+        except Exception as e:
+            raise RuntimeError(f"upload data failed, response={response}") from e
+
+    def upload_file_path(self, data: Data, output_path=None):
+        """
+        path of file uploaded for `data`
+        """
+        return upload_file_path(data, output_path, self._data_base_dir, self._cache_directory)
+
+    def _upload_file(self, data: Data, output_path=None):
+        conf = data.config
+        path = self.upload_file_path(data, output_path)
+        conf['file'] = str(path)
+        if not path.exists():
+            raise Exception('The file is obtained from the fate flow client machine, but it does not exist, '
+                            f'please check the path: {path}')
+        response = self._client.data.upload_file(file=str(path),
+                                                 head=data.head,
+                                                 meta=data.meta,
+                                                 extend_sid=data.extend_sid,
+                                                 partitions=data.partitions,
+                                                 namespace=data.namespace,
+                                                 name=data.table_name)
+        return response
+
     def delete_data(self, data: Data):
         try:
             table_name = data.config['table_name'] if data.config.get(
                 'table_name', None) is not None else data.config.get('name')
-            self._client.table.delete(name=table_name, namespace=data.config['namespace'])
+            self.delete_table(table_name, data.config['namespace'])
         except Exception as e:
             raise RuntimeError(f"delete data failed") from e
 
+    def delete_table(self, table_name, namespace):
+        return self._client.table.delete(name=table_name, namespace=namespace)
+
     def output_data_table(self, job_id, role, party_id, task_name, output_data_name):
         data_info = self._output_data_table(job_id=job_id, role=role, party_id=party_id, task_name=task_name)
         output_data_info = data_info.get(output_data_name)[0]
@@ -124,20 +175,29 @@ class FLOWClient(object):
         result = self._table_query(name=table_name, namespace=namespace)
         return result
 
+    def table_count(self, table_name, namespace):
+        """
+        row count of table, None if table does not exist
+        """
+        response = self._client.table.query(namespace=namespace, name=table_name)
+        if response.get("code") != 0 or not response.get("data"):
+            return None
+        return response["data"].get("count")
+
     def add_notes(self, job_id, role, party_id, notes):
         self._client.job.add_notes(job_id, role=role, party_id=party_id, notes=notes)
 
+    def stop_job(self, job_id):
+        response = self._client.job.stop(job_id=job_id)
+        if response.get("code") != 0:
+            raise RuntimeError(f"stop job {job_id} failed, response={response}")
+        return response
+
     """def add_notes(self, job_id, role, party_id, notes):
         self._add_notes(job_id=job_id, role=role, party_id=party_id, notes=notes)"""
 
     def _awaiting(self, job_id, role, party_id, callback=None):
-        while True:
-            response = self._query_job(job_id, role=role, party_id=party_id)
-            if response.status.is_done():
-                return response.status
-            if callback is not None:
-                callback(response)
-            time.sleep(1)
+        return self.poller.wait(job_id, role, party_id, callback)
 
     def _output_data_table(self, job_id, role, party_id, task_name):
         response = self._client.output.data_table(job_id, role=role, party_id=party_id, task_name=task_name)
@@ -165,8 +225,35 @@ class FLOWClient(object):
         return response
 
     def query_job(self, job_id, role, party_id):
-        response = self._client.job.query(job_id, role=role, party_id=party_id)
-        return QueryJobResponse(response)
+        key = (job_id, role, party_id)
+        with self._finished_jobs_lock:
+            cached = self._finished_jobs.get(key)
+        if cached is not None:
+            return cached
+        response = QueryJobResponse(self._client.job.query(job_id, role=role, party_id=party_id))
+        if response.status.is_done():
+            with self._finished_jobs_lock:
+                self._finished_jobs[key] = response
+        return response
+
+    def query_jobs(self, job_ids, role, party_id, concurrency=DEFAULT_QUERY_CONCURRENCY):
+        """
+        `QueryJobResponse` of each job in order, finished jobs are answered from cache
+        and the others queried at the same time; flow api has no query of several job ids at once
+        """
+        with self._finished_jobs_lock:
+            missing = list(dict.fromkeys(job_id for job_id in job_ids
+                                         if (job_id, role, party_id) not in self._finished_jobs))
+        responses = {}
+        if len(missing) == 1:
+            responses[missing[0]] = self.query_job(missing[0], role, party_id)
+        elif missing:
+            with ThreadPoolExecutor(max_workers=min(concurrency, len(missing))) as executor:
+                for job_id, response in zip(missing, executor.map(lambda j: self.query_job(j, role, party_id),
+                                                                  missing)):
+                    responses[job_id] = response
+        return [responses[job_id] if job_id in responses else self.query_job(job_id, role, party_id)
+                for job_id in job_ids]
 
     def _query_job(self, job_id, role, party_id):
         response = self._client.job.query(job_id, role, party_id)
@@ -202,6 +289,114 @@ class FLOWClient(object):
     """
 
 
+class PollBackoff(object):
+    """
+    poll intervals starting at `initial`, multiplied by `factor` after each poll up to `max_interval`,
+    each randomized by `jitter` of itself
+    """
+
+    def __init__(self, initial=POLL_INITIAL_INTERVAL, max_interval=POLL_MAX_INTERVAL, factor=POLL_BACKOFF_FACTOR,
+                 jitter=POLL_JITTER):
+        self.max_interval = max_interval
+        self.factor = factor
+        self.jitter = jitter
+        self._interval = min(initial, max_interval)
+
+    def next(self):
+        interval = self._interval
+        self._interval = min(self._interval * self.factor, self.max_interval)
+        return interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+
+class _WatchedJob(object):
+    def __init__(self, max_interval):
+        self.future = Future()
+        self.backoff = PollBackoff(max_interval=max_interval)
+        self.next_poll = time.time() + self.backoff.next()
+        self.callbacks = []
+        self.failures = 0
+
+
+class JobPoller(object):
+    """
+    shared polling loop of a flow service: one thread queries all watched jobs, each on its own backoff schedule,
+    and resolves future of a job with its final `Status` once it is done
+    """
+
+    def __init__(self, client, max_interval=POLL_MAX_INTERVAL):
+        self._client = client
+        self._max_interval = max_interval
+        self._cond = threading.Condition()
+        self._jobs = {}
+        self._thread = None
+
+    def watch(self, job_id, role, party_id, callback=None) -> Future:
+        """
+        start tracking job, `callback` is called with `QueryJobResponse` of each poll before job is done
+        """
+        key = (job_id, role, party_id)
+        with self._cond:
+            job = self._jobs.get(key)
+            if job is None:
+                job = self._jobs[key] = _WatchedJob(self._max_interval)
+            if callback is not None:
+                job.callbacks.append(callback)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name=f"job-poller-{self._client.address}",
+                                                daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return job.future
+
+    def wait(self, job_id, role, party_id, callback=None, timeout=None):
+        return self.watch(job_id, role, party_id, callback).result(timeout)
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                if not self._jobs:
+                    self._thread = None
+                    return
+                now = time.time()
+                due = [(key, job) for key, job in self._jobs.items() if job.next_poll <= now]
+                if not due:
+                    self._cond.wait(min(job.next_poll for job in self._jobs.values()) - now)
+                    continue
+            for key, job in due:
+                self._poll(key, job)
+
+    def _poll(self, key, job):
+        try:
+            response = self._client.query_job(*key)
+        except Exception as e:
+            job.failures += 1
+            if job.failures < POLL_MAX_FAILURES:
+                LOGGER.debug(f"query job {key[0]} failed {job.failures} times, retry later: {e}")
+                job.next_poll = time.time() + job.backoff.next()
+                return
+            self._resolve(key, job, exception=e)
+            return
+        job.failures = 0
+        if response.status.is_done():
+            self._resolve(key, job, status=response.status)
+            return
+        for callback in list(job.callbacks):
+            # noinspection PyBroadException
+            try:
+                callback(response)
+            except Exception:
+                LOGGER.exception(f"callback of job {key[0]} failed")
+        job.next_poll = time.time() + job.backoff.next()
+
+    def _resolve(self, key, job, status=None, exception=None):
+        with self._cond:
+            self._jobs.pop(key, None)
+        if exception is not None:
+            job.future.set_exception(exception)
+        else:
+            job.future.set_result(status)
+
+
 class Status(object):
     def __init__(self, status: str):
         self.status = status
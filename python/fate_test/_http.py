@@ -0,0 +1,144 @@
+#
+#  Copyright 2019 The FATE Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import bisect
+import threading
+import time
+
+import prettytable
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# defaults of `http` section in fate_test config
+HTTP_DEFAULTS = dict(pool_size=10, keep_alive=True, connect_timeout=10, read_timeout=300, retries=3)
+# backoff factor of retried requests, see urllib3 `Retry.get_backoff_time`
+RETRY_BACKOFF_FACTOR = 0.2
+# methods retried once connection is reset, others may have taken effect on flow already
+IDEMPOTENT_METHODS = Retry.DEFAULT_ALLOWED_METHODS
+# upper bounds in seconds of request latency histogram buckets, the last bucket is unbounded
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+
+
+def http_options(config):
+    """
+    options of `http` section in fate_test config merged with defaults
+    """
+    options = dict(HTTP_DEFAULTS)
+    unknown = set(config or {}) - set(HTTP_DEFAULTS)
+    if unknown:
+        raise ValueError(f"unknown http options {sorted(unknown)}, choose from {sorted(HTTP_DEFAULTS)}")
+    options.update({k: v for k, v in (config or {}).items() if v is not None})
+    return options
+
+
+class HttpStats(object):
+    """
+    requests and their latency histogram of a flow service
+    """
+
+    def __init__(self, address):
+        self.address = address
+        self.requests = 0
+        self.failures = 0
+        self.latency = [0] * (len(LATENCY_BUCKETS) + 1)
+        self._lock = threading.Lock()
+
+    def observe(self, elapsed, failed=False):
+        with self._lock:
+            self.requests += 1
+            self.failures += failed
+            self.latency[bisect.bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+
+
+class FlowSession(requests.Session):
+    """
+    requests session to one flow service: connections are kept alive in a pool of at most `pool_size`,
+    requests without timeout get the configured one, and connections refused or reset before answer are retried;
+    only idempotent methods are retried on reset, so that uploads are never sent twice;
+    flow sdk prepares requests without session headers and calls `send`, so options are applied there
+    """
+
+    def __init__(self, address, pool_size=HTTP_DEFAULTS["pool_size"], keep_alive=HTTP_DEFAULTS["keep_alive"],
+                 connect_timeout=HTTP_DEFAULTS["connect_timeout"], read_timeout=HTTP_DEFAULTS["read_timeout"],
+                 retries=HTTP_DEFAULTS["retries"]):
+        super().__init__()
+        self.stats = HttpStats(address)
+        self.timeout = (connect_timeout, read_timeout)
+        retry = Retry(total=retries, connect=retries, read=retries, status=0, redirect=0,
+                      backoff_factor=RETRY_BACKOFF_FACTOR, raise_on_status=False)
+        self._adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.mount("http://", self._adapter)
+        self.mount("https://", self._adapter)
+        self.keep_alive = keep_alive
+        if not keep_alive:
+            self.headers["Connection"] = "close"
+
+    def send(self, request, **kwargs):
+        if not self.keep_alive:
+            request.headers["Connection"] = "close"
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        start = time.time()
+        try:
+            response = super().send(request, **kwargs)
+        except Exception:
+            self.stats.observe(time.time() - start, failed=True)
+            raise
+        self.stats.observe(time.time() - start)
+        return response
+
+    def connections(self):
+        """
+        (connections opened, requests sent through them) of pooled connections
+        """
+        opened = sent = 0
+        pools = self._adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools[key]
+            opened += pool.num_connections
+            sent += pool.num_requests
+        return opened, sent
+
+
+def attach_session(sdk_client, session):
+    """
+    replace requests sessions held by flow sdk client and its api endpoints with `session`,
+    raise RuntimeError if there is none, e.g. the sdk no longer sends requests through one
+    """
+    attached = False
+    for owner in [sdk_client, *vars(sdk_client).values()]:
+        if not hasattr(owner, "__dict__"):
+            continue
+        for name, value in list(vars(owner).items()):
+            if isinstance(value, requests.Session):
+                setattr(owner, name, session)
+                attached = True
+    if not attached:
+        raise RuntimeError(f"flow sdk client {type(sdk_client).__name__} holds no requests session, "
+                           f"http options of {session.stats.address} cannot be applied")
+
+
+def pretty_http_stats(sessions):
+    table = prettytable.PrettyTable()
+    table.set_style(prettytable.ORGMODE)
+    buckets = [f"<{bound}s" for bound in LATENCY_BUCKETS] + [f">={LATENCY_BUCKETS[-1]}s"]
+    table.field_names = ["service", "requests", "failed", "connections opened", "connections reused", *buckets]
+    for session in sessions:
+        stats = session.stats
+        opened, sent = session.connections()
+        table.add_row([stats.address, stats.requests, stats.failures, opened, max(0, sent - opened),
+                       *stats.latency])
+    return table.get_string(title="http connections")
@@ -0,0 +1,241 @@
+#
+#  Copyright 2019 The FATE Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import json
+import os
+import threading
+import time
+
+from fate_test._io import LOGGER
+
+JOURNAL_FILENAME = "journal.jsonl"
+
+
+def journal_path(namespace):
+    return os.path.join("logs", namespace, JOURNAL_FILENAME)
+
+
+def _read_records(path):
+    records = []
+    with open(path, "r") as f:
+        for n, line in enumerate(f):
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # last line of a crashed run may be cut short
+                LOGGER.warning(f"line {n + 1} of run journal {path} ignored: {line.strip()}")
+    return records
+
+
+def _to_json(o):
+    # numpy scalars in metrics
+    if hasattr(o, "item"):
+        return o.item()
+    return str(o)
+
+
+class RunJournal(object):
+    """
+    append-only record of a run in `logs/{namespace}/journal.jsonl`, one json object per line:
+    tables uploaded for each suite, jobs finished with their final status, benchmark metrics,
+    performance time summaries and suites done; with `resume`, records of earlier runs of namespace are loaded
+    so that work which already succeeded is skipped
+    """
+
+    def __init__(self, namespace=None, resume=False, path=None):
+        self.path = path if path is not None else journal_path(namespace)
+        self._lock = threading.Lock()
+        # suite -> tables uploaded and not cleaned since
+        self._uploads = {}
+        # (suite, job) -> record of finished job
+        self._jobs = {}
+        # (suite, group, job) -> metric of benchmark job
+        self._metrics = {}
+        # (suite, job) -> time info of performance job
+        self._performance = {}
+        self._suites = set()
+        # shard index -> record of testsuites partitioned into shards
+        self._shards = {}
+        if resume:
+            self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"no run journal {self.path} to resume")
+        for record in _read_records(self.path):
+            self._apply(record)
+        LOGGER.info(f"resume from {self.path}: {len(self._jobs)} jobs, {len(self._metrics)} metrics, "
+                    f"{len(self._suites)} suites done")
+
+    @classmethod
+    def merge(cls, paths):
+        """
+        journal of records of journal files at `paths`, e.g. of shard runs, applied in time order; for reading only
+        """
+        records = []
+        for path in paths:
+            records.extend(_read_records(path))
+        journal = cls(path=paths[0])
+        for record in sorted(records, key=lambda r: r.get("time", 0)):
+            journal._apply(record)
+        return journal
+
+    def _apply(self, record):
+        kind, suite = record["type"], record.get("suite")
+        if kind == "upload":
+            self._uploads.setdefault(suite, set()).add(record["table"])
+        elif kind == "clean":
+            self._uploads.pop(suite, None)
+        elif kind == "job":
+            self._jobs[(suite, record["job_name"])] = record
+        elif kind == "metric":
+            self._metrics[(suite, record["group"], record["job_name"])] = record["metric"]
+        elif kind == "performance":
+            self._performance[(suite, record["job_name"])] = record["time_info"]
+        elif kind == "suite":
+            self._suites.add(suite)
+        elif kind == "shard":
+            self._shards[record["index"]] = record
+
+    def _append(self, record):
+        record = dict(record, time=time.time())
+        line = json.dumps(record, default=_to_json)
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._apply(json.loads(line))
+
+    @staticmethod
+    def _table(data):
+        return f"{data.role_str}:{data.namespace}.{data.table_name}"
+
+    def record_upload(self, suite, data):
+        self._append(dict(type="upload", suite=str(suite.path), table=self._table(data)))
+
+    def uploaded(self, suite, data):
+        with self._lock:
+            return self._table(data) in self._uploads.get(str(suite.path), ())
+
+    def record_clean(self, suite):
+        self._append(dict(type="clean", suite=str(suite.path)))
+
+    def record_job(self, suite, job_name):
+        """
+        record final status of job in suite
+        """
+        status = suite.get_final_status()[job_name]
+        self._append(dict(type="job", suite=str(suite.path), job_name=job_name, job_id=status.job_id,
+                          status=[str(s) for s in status.status] if isinstance(status.status, list)
+                          else str(status.status),
+                          exception_id=status.exception_id, time_elapsed=status.time_elapsed, event=status.event,
+                          load_time=status.load_time))
+
+    def jobs(self, suite_path):
+        """
+        records of finished jobs of suite at `suite_path`, in order first recorded
+        """
+        with self._lock:
+            return [record for (path, _), record in self._jobs.items() if path == str(suite_path)]
+
+    def suites(self):
+        """
+        paths of suites with jobs recorded or done, in order first recorded
+        """
+        with self._lock:
+            paths = [path for path, _ in self._jobs]
+            return list(dict.fromkeys(paths + sorted(self._suites)))
+
+    @staticmethod
+    def restore_status(suite, record):
+        """
+        restore final status of job in record into suite
+        """
+        from fate_test._flow_client import Status
+
+        status = [Status(s) for s in record["status"]] if isinstance(record["status"], list) else record["status"]
+        suite.update_status(job_name=record["job_name"], job_id=record["job_id"], status=status,
+                            exception_id=record["exception_id"], time_elapsed=record["time_elapsed"],
+                            event=record["event"], load_time=record["load_time"])
+
+    def succeeded_jobs(self, suite):
+        """
+        names of jobs in suite which succeeded in journal, their final status restored into suite
+        """
+        from fate_test._flow_client import Status
+
+        succeeded = set()
+        for record in self.jobs(suite.path):
+            if not isinstance(record["status"], list) or not all(Status(s).is_success() for s in record["status"]):
+                continue
+            if record["job_name"] not in suite.get_final_status():
+                continue
+            self.restore_status(suite, record)
+            succeeded.add(record["job_name"])
+        return succeeded
+
+    def record_metric(self, suite, group, job_name, metric):
+        self._append(dict(type="metric", suite=str(suite.path), group=group, job_name=job_name, metric=metric))
+
+    def metric(self, suite, group, job_name):
+        with self._lock:
+            return self._metrics.get((str(suite.path), group, job_name))
+
+    def record_performance(self, suite, job_name, time_info):
+        self._append(dict(type="performance", suite=str(suite.path), job_name=job_name, time_info=time_info))
+
+    def performance(self, suite, job_name):
+        with self._lock:
+            return self._performance.get((str(suite.path), job_name))
+
+    def record_suite(self, suite):
+        """
+        record that all work of suite is done, including cleanup of its data
+        """
+        self._append(dict(type="suite", suite=str(suite.path)))
+
+    def record_shard(self, index, count, suites, shard_suites):
+        """
+        record partition of a sharded run: keys of all `suites` found and of `shard_suites` run by shard `index`
+        """
+        self._append(dict(type="shard", index=index, count=count, suites=sorted(suites),
+                          shard_suites=sorted(shard_suites)))
+
+    def shard_gaps(self):
+        """
+        problems of partition recorded by shards merged into journal: shards missing, suites of no shard,
+        suites run by more than one shard, and shards disagreeing on suites found; None if no shard recorded
+        """
+        with self._lock:
+            shards = dict(self._shards)
+        if not shards:
+            return None
+        counts = {record["count"] for record in shards.values()}
+        found = [frozenset(record["suites"]) for record in shards.values()]
+        assigned = {}
+        for index, record in shards.items():
+            for key in record["shard_suites"]:
+                assigned.setdefault(key, []).append(index)
+        all_suites = frozenset().union(*found)
+        return dict(missing_shards=sorted(set(range(1, max(counts) + 1)) - set(shards)),
+                    unassigned=sorted(all_suites - set(assigned)),
+                    duplicated={key: sorted(indexes) for key, indexes in assigned.items() if len(indexes) > 1},
+                    inconsistent=len(counts) > 1 or len(set(found)) > 1)
+
+    def suite_done(self, suite):
+        with self._lock:
+            return str(suite.path) in self._suites
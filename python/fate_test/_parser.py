@@ -15,6 +15,7 @@
 #
 
 import re
+import threading
 import typing
 from pathlib import Path
 
@@ -96,9 +97,11 @@ class Data(object):
 
 
 class PipelineJob(object):
-    def __init__(self, job_name: str, script_path: Path):
+    def __init__(self, job_name: str, script_path: Path, deps: typing.Optional[typing.List[str]] = None):
         self.job_name = job_name
         self.script_path = script_path
+        # names of jobs in the same testsuite that must succeed before this one starts
+        self.deps = deps or []
 
 
 class Testsuite(object):
@@ -115,6 +118,7 @@ class Testsuite(object):
         self.path = path
         self.suite_name = Path(self.path).stem
         self._final_status = {}
+        self._status_lock = threading.Lock()
         """
         self._dependency: typing.MutableMapping[str, typing.List[Job]] = {}
         self._ready_jobs = deque()
@@ -148,11 +152,41 @@ class Testsuite(object):
             echo.echo('[Warning]  Pipeline does not support parameter: provider-> {}'.format(provider))
         for job_name, job_configs in testsuite_config.get("tasks", {}).items():
             script_path = path.parent.joinpath(job_configs["script"]).resolve()
-            pipeline_jobs.append(PipelineJob(job_name, script_path))
+            deps = job_configs.get("deps", [])
+            if isinstance(deps, str):
+                deps = [deps]
+            pipeline_jobs.append(PipelineJob(job_name, script_path, deps))
 
         testsuite = Testsuite(dataset, pipeline_jobs, path)
+        testsuite.check_deps()
         return testsuite
 
+    def check_deps(self):
+        """
+        check that deps of pipeline jobs name jobs of this testsuite and form no cycle
+        """
+        deps = {job.job_name: job.deps for job in self.pipeline_jobs}
+        for job_name, job_deps in deps.items():
+            unknown = [dep for dep in job_deps if dep not in deps]
+            if unknown:
+                raise ValueError(f"deps {unknown} of task {job_name} not found in {self.path}")
+        visited, visiting = set(), []
+
+        def _visit(job_name):
+            if job_name in visiting:
+                cycle = visiting[visiting.index(job_name):] + [job_name]
+                raise ValueError(f"deps of tasks form a cycle in {self.path}: {' -> '.join(cycle)}")
+            if job_name in visited:
+                return
+            visiting.append(job_name)
+            for dep in deps[job_name]:
+                _visit(dep)
+            visiting.pop()
+            visited.add(job_name)
+
+        for name in deps:
+            _visit(name)
+
     """def jobs_iter(self) -> typing.Generator[Job, None, None]:
         while self._ready_jobs:
             yield self._ready_jobs.pop()"""
@@ -177,7 +211,7 @@ class Testsuite(object):
         table = prettytable.PrettyTable()
         table.set_style(prettytable.ORGMODE)
         # field_names = ["job_name", "job_id", "status", "time_consuming", "exception_id", "rest_dependency"]
-        field_names = ["job_name", "job_id", "status", "time_consuming", "exception_id"]
+        field_names = ["job_name", "job_id", "status", "time_consuming", "load_time", "exception_id"]
         table.field_names = field_names
 
         for status in self.get_final_status().values():
@@ -210,6 +244,7 @@ class Testsuite(object):
                 self.style_table(job_id_event),
                 self.style_table(status_txt),
                 self.style_table(time_elapsed_txt),
+                self.style_table("-" if status.load_time is None else f"{status.load_time:.3f}s"),
                 f"{TxtStyle.FIELD_VAL}{exception_id_txt}{TxtStyle.END}"
                 # f"{TxtStyle.FIELD_VAL}{','.join(status.rest_dependency)}{TxtStyle.END}",
             ]
@@ -218,10 +253,13 @@ class Testsuite(object):
         return table.get_string(title=f"{TxtStyle.TITLE}Testsuite Summary: {self.suite_name}{TxtStyle.END}")
 
     def update_status(
-            self, job_name, job_id=None, status=None, exception_id=None, time_elapsed=None, event=None
+            self, job_name, job_id=None, status=None, exception_id=None, time_elapsed=None, event=None,
+            load_time=None
     ):
-        for k, v in locals().items():
-            if k != "job_name" and v is not None:
+        updates = {k: v for k, v in locals().items() if k not in ("self", "job_name") and v is not None}
+        # jobs of a testsuite may finish concurrently
+        with self._status_lock:
+            for k, v in updates.items():
                 setattr(self._final_status[job_name], k, v)
 
     def get_final_status(self):
@@ -236,7 +274,8 @@ class FinalStatus(object):
             status="not submitted",
             exception_id="-",
             time_elapsed=None,
-            event="-"
+            event="-",
+            load_time=None
     ):
         self.name = name
         self.job_id = job_id
@@ -245,6 +284,8 @@ class FinalStatus(object):
         self.suite_file = None
         self.time_elapsed = time_elapsed
         self.event = event
+        # seconds taken to load script of job
+        self.load_time = load_time
 
 
 class BenchmarkJob(object):
@@ -0,0 +1,108 @@
+#
+#  Copyright 2019 The FATE Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from fate_test._io import LOGGER
+
+# runs of each testsuite and job kept by run history
+DEFAULT_HISTORY_RUNS = 10
+# a testsuite or job which failed in any of its last runs counts as recently failed
+RECENT_RUNS = 3
+RUN_HISTORY_VERSION = 2
+
+
+class RunHistory(object):
+    """
+    outcome and duration of last runs of testsuites and their jobs, kept in `{cache_directory}/run_history.json`
+    or at `path`; testsuites are keyed by their path relative to `root`, so that hosts with checkouts
+    at different paths share keys
+
+    `order` puts work which failed recently first, the more failures the earlier, then work expected to take
+    least time by its mean duration; work never run before counts as taking no time, so that it reports early
+    """
+
+    def __init__(self, cache_directory=None, max_runs=DEFAULT_HISTORY_RUNS, root=None, path=None):
+        self.path = path if path is not None else os.path.join(os.path.abspath(cache_directory), "run_history.json")
+        self.max_runs = max_runs
+        self.root = root
+        self._lock = threading.Lock()
+        self._history = self._load()
+
+    def _load(self):
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    history = json.load(f)
+                if history.get("version") == RUN_HISTORY_VERSION:
+                    return history
+                LOGGER.warning(f"run history {self.path} of version {history.get('version')} ignored")
+            except (OSError, ValueError):
+                LOGGER.exception(f"load run history {self.path} failed, start with empty history")
+        return dict(version=RUN_HISTORY_VERSION, runs={})
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._history, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def suite_key(self, suite):
+        if self.root is None:
+            return Path(suite.path).as_posix()
+        return Path(os.path.relpath(suite.path, self.root)).as_posix()
+
+    def job_key(self, suite, job_name):
+        return f"{self.suite_key(suite)}:{job_name}"
+
+    def record(self, key, elapsed, success):
+        with self._lock:
+            runs = self._history["runs"].setdefault(key, [])
+            runs.append(dict(time=time.time(), elapsed=elapsed, success=bool(success)))
+            del runs[:-self.max_runs]
+            try:
+                self._save()
+            except OSError:
+                LOGGER.exception(f"save run history {self.path} failed")
+
+    def _runs(self, key):
+        with self._lock:
+            return list(self._history["runs"].get(key, []))
+
+    def expected_duration(self, key):
+        """
+        mean seconds of successful runs of work, None if it never succeeded
+        """
+        durations = [run["elapsed"] for run in self._runs(key) if run["success"] and run["elapsed"] is not None]
+        return sum(durations) / len(durations) if durations else None
+
+    def priority(self, key):
+        """
+        sort key of work: (negative number of recent failures, expected seconds)
+        """
+        failures = sum(not run["success"] for run in self._runs(key)[-RECENT_RUNS:])
+        duration = self.expected_duration(key)
+        return -failures, 0.0 if duration is None else duration
+
+    def order(self, items, key):
+        """
+        items sorted by priority of `key(item)`, ties kept in given order
+        """
+        return sorted(items, key=lambda item: self.priority(key(item)))
@@ -0,0 +1,184 @@
+#
+#  Copyright 2019 The FATE Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import hashlib
+import json
+import os
+import threading
+import time
+
+from fate_test._io import LOGGER
+
+# default max number of tables kept by upload cache
+DEFAULT_UPLOAD_CACHE_SIZE = 64
+UPLOAD_CACHE_VERSION = 1
+_HASH_CHUNK_SIZE = 8 << 20
+
+
+def file_digest(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class UploadCache(object):
+    """
+    tables uploaded to flow services, keyed by content hash of uploaded file plus upload parameters,
+    index kept in `{cache_directory}/upload_cache/index.json`
+
+    a cached table is reused only if flow still reports it with the recorded count;
+    least recently used tables beyond `max_tables` are deleted from their flow service
+    """
+
+    def __init__(self, cache_directory, max_tables=DEFAULT_UPLOAD_CACHE_SIZE):
+        self.path = os.path.join(os.path.abspath(cache_directory), "upload_cache", "index.json")
+        self.max_tables = max_tables
+        self._lock = threading.RLock()
+        # keys looked up or recorded in this run, never evicted by it
+        self._used = set()
+        self._index = self._load()
+
+    def _load(self):
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    index = json.load(f)
+                if index.get("version") == UPLOAD_CACHE_VERSION:
+                    return index
+                LOGGER.warning(f"upload cache {self.path} of version {index.get('version')} ignored")
+            except (OSError, ValueError):
+                LOGGER.exception(f"load upload cache {self.path} failed, start with empty cache")
+        return dict(version=UPLOAD_CACHE_VERSION, tables={}, files={})
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._index, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def _file_hash(self, path):
+        """
+        content hash of file, reused while its size and mtime stay the same
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            known = self._index["files"].get(path)
+        if known is not None and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+            return known["sha256"]
+        digest = file_digest(path)
+        with self._lock:
+            self._index["files"][path] = dict(size=stat.st_size, mtime_ns=stat.st_mtime_ns, sha256=digest)
+        return digest
+
+    def key(self, client, data, path):
+        params = dict(address=client.address, namespace=data.namespace, table_name=data.table_name,
+                      file=self._file_hash(path), head=data.head, meta=data.meta, partitions=data.partitions,
+                      extend_sid=data.extend_sid)
+        return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+
+    def lookup(self, client, data, output_path=None):
+        """
+        whether table of `data` is cached and still holds the recorded count on its flow service
+        """
+        path = client.upload_file_path(data, output_path)
+        if not path.exists():
+            return False
+        key = self.key(client, data, path)
+        with self._lock:
+            entry = self._index["tables"].get(key)
+        if entry is None:
+            return False
+        try:
+            count = client.table_count(data.table_name, data.namespace)
+        except Exception:
+            LOGGER.exception(f"query cached table {data.namespace}.{data.table_name} failed, upload again")
+            count = None
+        with self._lock:
+            if count is None or count != entry["count"]:
+                LOGGER.debug(f"cached table {data.namespace}.{data.table_name} is gone or changed, "
+                             f"count {count} != {entry['count']}")
+                self._index["tables"].pop(key, None)
+                self._save()
+                return False
+            entry["last_used"] = time.time()
+            self._used.add(key)
+            self._save()
+        return True
+
+    def record(self, client, data, output_path=None):
+        """
+        record table of successfully uploaded `data`, replacing entries of same table with other content
+        """
+        path = client.upload_file_path(data, output_path)
+        key = self.key(client, data, path)
+        count = client.table_count(data.table_name, data.namespace)
+        if count is None:
+            LOGGER.warning(f"uploaded table {data.namespace}.{data.table_name} not found, not cached")
+            return
+        with self._lock:
+            tables = self._index["tables"]
+            for stale in [k for k, v in tables.items() if k != key and self._same_table(v, client, data)]:
+                del tables[stale]
+            tables[key] = dict(address=client.address, namespace=data.namespace, table_name=data.table_name,
+                               file=os.path.abspath(path), count=count, last_used=time.time())
+            self._used.add(key)
+            self._save()
+
+    @staticmethod
+    def _same_table(entry, client, data):
+        return (entry["address"], entry["namespace"], entry["table_name"]) == \
+            (client.address, data.namespace, data.table_name)
+
+    def contains(self, client, data):
+        """
+        whether table of `data` on `client` is owned by cache, so that it is left to eviction instead of cleanup
+        """
+        with self._lock:
+            return any(self._same_table(entry, client, data) for entry in self._index["tables"].values())
+
+    def evict(self, clients):
+        """
+        delete least recently used tables beyond `max_tables` from their flow services,
+        tables used in this run are kept
+        """
+        flow_clients = {client.address: client for client in clients.flow_clients()}
+        with self._lock:
+            tables = self._index["tables"]
+            candidates = sorted((k for k in tables if k not in self._used), key=lambda k: tables[k]["last_used"])
+            evicted = candidates[:max(0, len(tables) - self.max_tables)]
+            for key in evicted:
+                entry = tables.pop(key)
+                client = flow_clients.get(entry["address"])
+                if client is None:
+                    LOGGER.warning(f"no flow client of {entry['address']} configured, "
+                                   f"evicted table {entry['namespace']}.{entry['table_name']} is not deleted")
+                    continue
+                try:
+                    client.delete_table(entry["table_name"], entry["namespace"])
+                    LOGGER.debug(f"evicted table {entry['namespace']}.{entry['table_name']} "
+                                 f"from {entry['address']}")
+                except Exception:
+                    LOGGER.exception(f"delete evicted table {entry['namespace']}.{entry['table_name']} failed")
+            # forget hashes of files no longer referenced
+            referenced = {entry["file"] for entry in tables.values()}
+            files = self._index["files"]
+            for path in [path for path in files if path not in referenced]:
+                del files[path]
+            self._save()
+        return len(evicted)
@@ -3,7 +3,11 @@ import time
 import click
 
 from fate_test._config import parse_config, default_config
-from fate_test.scripts._utils import _set_namespace
+from fate_test._journal import RunJournal
+from fate_test._upload_cache import UploadCache, DEFAULT_UPLOAD_CACHE_SIZE
+from fate_test.scripts._runner import DEFAULT_WORKER_MAX_JOBS
+from fate_test.scripts._script_cache import configure_script_modules
+from fate_test.scripts._utils import _set_namespace, DEFAULT_UPLOAD_CONCURRENCY
 
 
 def parse_custom_type(value):
@@ -16,6 +20,13 @@ def parse_custom_type(value):
         raise click.BadParameter('Invalid input format. Use "str=int" or "str=str".')
 
 
+def parse_shard(value):
+    parts = value.split('/')
+    if len(parts) == 2 and parts[0].isdigit() and parts[1].isdigit() and 1 <= int(parts[0]) <= int(parts[1]):
+        return int(parts[0]), int(parts[1])
+    raise click.BadParameter('Invalid shard. Use "i/N" with 1 <= i <= N.')
+
+
 class SharedOptions(object):
     _options = {
         "config": (('-c', '--config'),
@@ -34,6 +45,36 @@ class SharedOptions(object):
                             default=None), None),
         "partitions": (('--partitions', '-dp'),
                        dict(type=int, help="data partitions when uploading data", default=None), None),
+        "upload_concurrency": (('--upload-concurrency',),
+                               dict(type=int, help="max number of concurrent uploads to each flow service",
+                                    default=None), DEFAULT_UPLOAD_CONCURRENCY),
+        "upload_cache": (('--upload-cache',),
+                         dict(type=bool, is_flag=True,
+                              help="reuse tables uploaded by previous runs with same file content and parameters",
+                              default=None), False),
+        "upload_cache_size": (('--upload-cache-size',),
+                              dict(type=int, help="max number of tables kept by upload cache, "
+                                                  "least recently used ones beyond are deleted",
+                                   default=None), DEFAULT_UPLOAD_CACHE_SIZE),
+        "defer_clean_data": (('--defer-clean-data',),
+                             dict(type=bool, is_flag=True,
+                                  help="delete data of a suite in background while next suite runs",
+                                  default=None), False),
+        "isolate": (('--isolate',),
+                    dict(type=bool, is_flag=True,
+                         help="run each script in a pooled worker process, killed if it exceeds `--timeout`",
+                         default=None), False),
+        "worker_max_jobs": (('--worker-max-jobs',),
+                            dict(type=int, help="scripts a worker process runs before it is replaced",
+                                 default=None), DEFAULT_WORKER_MAX_JOBS),
+        "worker_max_rss": (('--worker-max-rss',),
+                           dict(type=int, help="resident memory in MB beyond which a worker process is replaced",
+                                default=None), None),
+        "reuse_script_module": (('--reuse-script-module',),
+                                dict(type=bool, is_flag=True,
+                                     help="reuse module of a script loaded by an earlier job instead of running "
+                                          "the script again, while the script is unchanged",
+                                     default=None), False),
         "engine_run": (('--engine-run', '-eg'), dict(type=parse_custom_type,
                                                      help="config for pipeline task `engine run`, "
                                                           "specify config params in str=int or str=str format",
@@ -62,15 +103,36 @@ class SharedOptions(object):
             if v is not None:
                 self._options_kwargs[k] = v
 
-    def post_process(self):
+    def post_process(self, journal=False):
+        """
+        with `journal`, the run is recorded in a run journal, resumed from journal of `--resume` namespace if given
+        """
         # add defaults here
         for k, v in self._options.items():
             if self._options_kwargs.get(k, None) is None:
                 self._options_kwargs[k] = v[2]
 
+        self._options_kwargs['journal'] = None
+        if journal:
+            resume = self._options_kwargs.get('resume')
+            if resume is not None:
+                self._options_kwargs['namespace'] = resume
+            try:
+                self._options_kwargs['journal'] = RunJournal(self._options_kwargs['namespace'],
+                                                             resume=resume is not None)
+            except FileNotFoundError as e:
+                raise click.BadParameter(str(e), param_hint="--resume")
+
         # update config
         config = parse_config(self._options_kwargs['config'])
         self._options_kwargs['config'] = config
+        if self._options_kwargs['upload_cache']:
+            self._options_kwargs['upload_cache'] = UploadCache(config.cache_directory,
+                                                               self._options_kwargs['upload_cache_size'])
+        else:
+            self._options_kwargs['upload_cache'] = None
+
+        configure_script_modules(config.cache_directory, self._options_kwargs['reuse_script_module'])
 
         _set_namespace(self._options_kwargs['namespace_mangling'], self._options_kwargs['namespace'])
 
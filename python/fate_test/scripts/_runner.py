@@ -0,0 +1,214 @@
+#
+#  Copyright 2019 The FATE Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import multiprocessing
+import os
+import resource
+import threading
+import time
+
+from fate_test._events import FINISHED, SUBMITTED, PipePublisher, job_events
+from fate_test._io import LOGGER
+from fate_test.scripts._script_cache import configure_script_modules, script_modules
+
+# scripts a worker runs before it is replaced by a fresh one
+DEFAULT_WORKER_MAX_JOBS = 50
+# seconds a retired worker is given to exit before it is killed
+WORKER_STOP_TIMEOUT = 5
+
+
+def _rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1 << 20)
+    except (OSError, ValueError):
+        # peak rather than current size, in KB on linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _worker_main(conn, initializer=None, initargs=()):
+    if initializer is not None:
+        initializer(*initargs)
+    job_events.subscribe(PipePublisher(conn).publish)
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        func, args, kwargs = job
+        reply = dict(done=True, result=None, error=None)
+        try:
+            reply["result"] = func(*args, **kwargs)
+        except Exception as e:
+            reply["error"] = f"{type(e).__name__}: {e}"
+        reply["rss"] = _rss_mb()
+        try:
+            conn.send(reply)
+        except Exception as e:
+            conn.send(dict(done=True, result=None, error=f"result of script not picklable: {e}", rss=reply["rss"]))
+
+
+class _Worker(object):
+    def __init__(self, ctx, initializer=None, initargs=()):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, initializer, initargs),
+                                   name="fate-test-script-worker", daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+
+    def stop(self, kill=False):
+        if not kill:
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+            self.process.join(WORKER_STOP_TIMEOUT)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class ScriptRunner(object):
+    """
+    run functions such as script mains in a warm pool of at most `size` spawned worker processes, None for no limit;
+    a call taking longer than `timeout` seconds kills its worker, and a worker is replaced after `max_jobs` calls
+    or once its resident memory exceeds `max_rss` MB; job events published by workers reach `job_events` of caller.
+    Jobs a killed call submitted and did not see finished are stopped by `stop_job(job_id)` before its worker slot
+    is given to another call. Each worker calls `initializer(*initargs)` when it starts. Safe to call from several
+    threads, each call takes one worker
+    """
+
+    def __init__(self, size=1, timeout=None, max_jobs=DEFAULT_WORKER_MAX_JOBS, max_rss=None, initializer=None,
+                 initargs=(), stop_job=None):
+        self.size = size
+        self.timeout = timeout
+        self.max_jobs = max_jobs
+        self.max_rss = max_rss
+        self.initializer = initializer
+        self.initargs = initargs
+        self.stop_job = stop_job
+        self._ctx = multiprocessing.get_context("spawn")
+        self._cond = threading.Condition()
+        self._idle = []
+        self._started = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _acquire(self):
+        with self._cond:
+            while not self._idle and self.size is not None and self._started >= self.size:
+                self._cond.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._started += 1
+        try:
+            return _Worker(self._ctx, self.initializer, self.initargs)
+        except BaseException:
+            with self._cond:
+                self._started -= 1
+                self._cond.notify()
+            raise
+
+    def _release(self, worker, retire=False, kill=False, events=()):
+        if retire:
+            worker.stop(kill=kill)
+            self._stop_jobs(events)
+        with self._cond:
+            if retire:
+                self._started -= 1
+            else:
+                self._idle.append(worker)
+            self._cond.notify()
+
+    def _stop_jobs(self, events):
+        if self.stop_job is None:
+            return
+        finished = {event.job_id for event in events if event.kind == FINISHED}
+        running = dict.fromkeys(event.job_id for event in events
+                                if event.kind == SUBMITTED and event.job_id not in finished)
+        for job_id in running:
+            # noinspection PyBroadException
+            try:
+                self.stop_job(job_id)
+                LOGGER.info(f"stopped job {job_id} of killed script worker")
+            except Exception:
+                LOGGER.exception(f"failed to stop job {job_id} of killed script worker")
+
+    def run(self, func, *args, **kwargs):
+        """
+        call `func(*args, **kwargs)` in a worker and return its result; `func` must be a module level function.
+        Raise TimeoutError if it does not return in time, RuntimeError if it raised or its worker died
+        """
+        worker = self._acquire()
+        deadline = None if self.timeout is None else time.time() + self.timeout
+        reply = None
+        # job events of this call, jobs still running are stopped if the call is killed
+        events = []
+        try:
+            worker.conn.send((func, args, kwargs))
+            while deadline is None or worker.conn.poll(max(0.0, deadline - time.time())):
+                reply = worker.conn.recv()
+                event = job_events.receive(reply)
+                if event is None:
+                    break
+                events.append(event)
+                reply = None
+        except (EOFError, OSError) as e:
+            worker.process.join(WORKER_STOP_TIMEOUT)
+            self._release(worker, retire=True, kill=True, events=events)
+            raise RuntimeError(f"script worker exited with code {worker.process.exitcode} "
+                               f"while running {func.__name__}") from e
+        except BaseException:
+            # e.g. arguments not picklable or caller interrupted, worker is replaced so its slot is not lost
+            self._release(worker, retire=True, kill=True, events=events)
+            raise
+        if reply is None:
+            self._release(worker, retire=True, kill=True, events=events)
+            raise TimeoutError(f"{func.__name__} did not finish in {self.timeout}s, worker killed")
+        worker.jobs += 1
+        retire = worker.jobs >= self.max_jobs or (self.max_rss is not None and reply["rss"] > self.max_rss)
+        if retire:
+            LOGGER.debug(f"retire script worker after {worker.jobs} jobs, rss {reply['rss']:.0f}MB")
+        self._release(worker, retire=retire)
+        if reply["error"] is not None:
+            raise RuntimeError(reply["error"])
+        return reply["result"]
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._started -= len(idle)
+        for worker in idle:
+            worker.stop()
+
+
+def script_runner(options, timeout=None, size=1, required=False, stop_job=None):
+    """
+    `ScriptRunner` configured by shared options, None if scripts run in current process:
+    unless `required`, only with `--isolate`
+    """
+    if not (required or options["isolate"]):
+        return None
+    return ScriptRunner(size=size, timeout=timeout, max_jobs=options["worker_max_jobs"],
+                        max_rss=options["worker_max_rss"], initializer=configure_script_modules,
+                        initargs=(script_modules.cache_directory, script_modules.reuse), stop_job=stop_job)
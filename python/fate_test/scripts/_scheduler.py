@@ -0,0 +1,172 @@
+#
+#  Copyright 2019 The FATE Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from fate_test._io import LOGGER
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+SKIPPED = "skipped"
+ABORTED = "aborted"
+# max number of work items running at the same time, whatever their resources
+DEFAULT_MAX_WORKERS = 64
+
+
+class WorkItem(object):
+    """
+    node of a work graph; `run` is called in a worker thread and returns whether it succeeded
+
+    the item starts once all items of `after` finished and all items of `requires` succeeded,
+    it is skipped if any item of `requires` did not succeed; while running it holds `resources`,
+    amounts keyed by resource name such as `upload`, `task_cores` or `party:9999`;
+    once its graph is aborted, the item is dropped without running if it has `on_abort`, which is called instead
+    """
+
+    def __init__(self, name, run, resources=None, after=(), requires=(), on_skip=None, on_abort=None):
+        self.name = name
+        self.run = run
+        self.resources = resources or {}
+        self.after = list(after)
+        self.requires = list(requires)
+        self.on_skip = on_skip
+        self.on_abort = on_abort
+        self.state = PENDING
+
+
+class WorkGraph(object):
+    """
+    run work items as soon as their dependencies are done and their resources fit into `limits`;
+    a limit keyed by a resource kind, e.g. `party`, applies to each resource of that kind, e.g. `party:9999`.
+    Items are admitted in the order they were added, later items pass blocked ones when resources allow,
+    and an item needing more than a limit runs alone on that resource; once `abort()` returns True,
+    pending items with `on_abort` are dropped while running items finish
+    """
+
+    def __init__(self, limits=None, max_workers=DEFAULT_MAX_WORKERS, abort=None):
+        self.limits = {k: v for k, v in (limits or {}).items() if v is not None}
+        self.max_workers = max_workers
+        self.abort = abort
+        self._items = []
+        self._used = {}
+
+    def add(self, item: WorkItem):
+        self._items.append(item)
+        return item
+
+    def _limit(self, resource):
+        return self.limits.get(resource, self.limits.get(resource.split(":")[0]))
+
+    def _fits(self, item):
+        for resource, amount in item.resources.items():
+            limit, used = self._limit(resource), self._used.get(resource, 0)
+            if limit is not None and used and used + amount > limit:
+                return False
+        return True
+
+    def _acquire(self, item, sign=1):
+        for resource, amount in item.resources.items():
+            self._used[resource] = self._used.get(resource, 0) + sign * amount
+
+    def _admit(self, pending, running, executor):
+        admitted = True
+        while admitted:
+            admitted = False
+            for item in list(pending):
+                if item.on_abort is not None and self.abort is not None and self.abort():
+                    pending.remove(item)
+                    item.state = ABORTED
+                    item.on_abort()
+                    admitted = True
+                    continue
+                if any(dep.state in (PENDING, RUNNING) for dep in item.after + item.requires):
+                    continue
+                if any(dep.state != SUCCEEDED for dep in item.requires):
+                    pending.remove(item)
+                    item.state = SKIPPED
+                    if item.on_skip is not None:
+                        item.on_skip()
+                    admitted = True
+                    continue
+                if len(running) >= self.max_workers or not self._fits(item):
+                    continue
+                pending.remove(item)
+                self._acquire(item)
+                item.state = RUNNING
+                running[executor.submit(item.run)] = item
+                admitted = True
+
+    def run(self):
+        pending = [item for item in self._items if item.state == PENDING]
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                self._admit(pending, running, executor)
+                if not running:
+                    break
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = running.pop(future)
+                    self._acquire(item, sign=-1)
+                    try:
+                        item.state = SUCCEEDED if future.result() else FAILED
+                    except Exception:
+                        LOGGER.exception(f"{item.name} failed")
+                        item.state = FAILED
+        if pending:
+            raise RuntimeError(f"work items {[item.name for item in pending]} never started, check their dependencies")
+        return {item.name: item.state for item in self._items}
+
+
+class FailureBudget(object):
+    """
+    failures tolerated before remaining work is aborted, no limit if `limit` is None; safe to use from any thread
+    """
+
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def fail(self):
+        with self._lock:
+            self.failures += 1
+
+    def exhausted(self):
+        with self._lock:
+            return self.limit is not None and self.failures >= self.limit
+
+
+def add_suite_work(graph, tables, table_users, finish, upload=None, jobs=()):
+    """
+    add work items of a testsuite to `graph`: `upload` starts after earlier testsuites using any of `tables`
+    finished, `jobs` run only if the upload succeeded, and `finish` runs once the upload and all jobs are done;
+    `table_users`, table -> work item finishing its last user, is updated so that later testsuites wait for `finish`
+    """
+    if upload is not None:
+        upload.after = list(dict.fromkeys(upload.after + [table_users[table] for table in tables
+                                                          if table in table_users]))
+        graph.add(upload)
+    for job in jobs:
+        if upload is not None:
+            job.requires.append(upload)
+        graph.add(job)
+    finish.after += [*jobs, *([upload] if upload is not None else [])]
+    graph.add(finish)
+    for table in tables:
+        table_users[table] = finish
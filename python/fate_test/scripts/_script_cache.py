@@ -0,0 +1,133 @@
+#
+#  Copyright 2019 The FATE Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import hashlib
+import importlib.util
+import marshal
+import os
+import struct
+import threading
+import time
+
+from fate_test._io import LOGGER
+
+SCRIPT_CACHE_DIRNAME = "script_cache"
+# bytecode files start with interpreter magic number, then mtime in ns and size of compiled script
+_HEADER = struct.Struct("<qq")
+
+
+class ScriptModules(object):
+    """
+    modules of pipeline and benchmark scripts: compiled code of a script is kept in memory and, as bytecode,
+    under `{cache_directory}/script_cache`, both keyed by path, mtime and size of the script.
+    Each load executes the code in a fresh module named after the script and a hash of its path, so that scripts
+    with the same file name do not collide; with `reuse`, a module already loaded is returned as is
+    """
+
+    def __init__(self, cache_directory=None, reuse=False):
+        self.cache_directory = cache_directory
+        self.reuse = reuse
+        self._lock = threading.Lock()
+        # path -> (mtime_ns, size, code)
+        self._code = {}
+        # path -> (mtime_ns, size, module)
+        self._modules = {}
+
+    def configure(self, cache_directory=None, reuse=False):
+        self.cache_directory = cache_directory
+        self.reuse = reuse
+
+    @staticmethod
+    def module_name(path):
+        stem = os.path.splitext(os.path.basename(path))[0]
+        return f"{stem}_{hashlib.sha1(path.encode()).hexdigest()[:8]}"
+
+    def _bytecode_path(self, path):
+        if self.cache_directory is None:
+            return None
+        return os.path.join(os.path.abspath(self.cache_directory), SCRIPT_CACHE_DIRNAME,
+                            f"{self.module_name(path)}.pyc")
+
+    def _read_bytecode(self, pyc_path, mtime_ns, size):
+        try:
+            with open(pyc_path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        magic = importlib.util.MAGIC_NUMBER
+        if data[:len(magic)] != magic or data[len(magic):len(magic) + _HEADER.size] != _HEADER.pack(mtime_ns, size):
+            return None
+        try:
+            return marshal.loads(data[len(magic) + _HEADER.size:])
+        except (EOFError, ValueError, TypeError):
+            LOGGER.debug(f"bytecode {pyc_path} corrupted, compile script again")
+            return None
+
+    @staticmethod
+    def _write_bytecode(pyc_path, code, mtime_ns, size):
+        try:
+            os.makedirs(os.path.dirname(pyc_path), exist_ok=True)
+            tmp_path = f"{pyc_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(importlib.util.MAGIC_NUMBER + _HEADER.pack(mtime_ns, size) + marshal.dumps(code))
+            os.replace(tmp_path, pyc_path)
+        except OSError:
+            LOGGER.exception(f"write bytecode {pyc_path} failed")
+
+    def _compile(self, path, mtime_ns, size):
+        with self._lock:
+            cached = self._code.get(path)
+        if cached is not None and cached[:2] == (mtime_ns, size):
+            return cached[2]
+        pyc_path = self._bytecode_path(path)
+        code = None if pyc_path is None else self._read_bytecode(pyc_path, mtime_ns, size)
+        if code is None:
+            with open(path, "rb") as f:
+                code = compile(f.read(), path, "exec", dont_inherit=True)
+            if pyc_path is not None:
+                self._write_bytecode(pyc_path, code, mtime_ns, size)
+        with self._lock:
+            self._code[path] = (mtime_ns, size, code)
+        return code
+
+    def load(self, script_path):
+        """
+        module of script and seconds it took to load
+        """
+        start = time.time()
+        path = os.path.abspath(str(script_path))
+        stat = os.stat(path)
+        if self.reuse:
+            with self._lock:
+                cached = self._modules.get(path)
+            if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+                return cached[2], time.time() - start
+        code = self._compile(path, stat.st_mtime_ns, stat.st_size)
+        spec = importlib.util.spec_from_loader(self.module_name(path), loader=None, origin=path)
+        mod = importlib.util.module_from_spec(spec)
+        mod.__file__ = path
+        exec(code, mod.__dict__)
+        if self.reuse:
+            with self._lock:
+                self._modules[path] = (stat.st_mtime_ns, stat.st_size, mod)
+        return mod, time.time() - start
+
+
+# script modules of this process, configured by shared options and in each script worker
+script_modules = ScriptModules()
+
+
+def configure_script_modules(cache_directory=None, reuse=False):
+    script_modules.configure(cache_directory, reuse)
@@ -1,24 +1,44 @@
 import glob as glob_
-import importlib
+import hashlib
 import os
+import queue
+import threading
 import time
 import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from inspect import signature
 from pathlib import Path
 
 import click
 
 from fate_test._client import Clients
 from fate_test._config import Config
-from fate_test._flow_client import DataProgress, UploadDataResponse, QueryJobResponse, Status
+from fate_test._events import job_events, publish_to
+from fate_test._flow_client import DataProgress, Status
 from fate_test._io import echo, LOGGER, set_logger
 from fate_test._parser import (Testsuite, BenchmarkSuite, PerformanceSuite, FinalStatus,
                                DATA_LOAD_HOOK, CONF_LOAD_HOOK, DSL_LOAD_HOOK, Data)
+from fate_test.scripts._script_cache import script_modules
+
+# default max number of concurrent uploads to each flow service
+DEFAULT_UPLOAD_CONCURRENCY = 4
+# seconds between two refreshes of upload progress bar
+UPLOAD_REFRESH_INTERVAL = 1
+# max number of tables deleted concurrently
+DEFAULT_DELETE_CONCURRENCY = 8
+# task cores a pipeline job is assumed to take by global schedule if none configured
+DEFAULT_TASK_CORES = 4
 
 
 def _big_data_task(includes, guest_data_size, host_data_size, guest_feature_num, host_feature_num, host_data_type,
-                   config_inst, encryption_type, match_rate, sparsity, force, split_host, output_path):
+                   config_inst, encryption_type, match_rate, sparsity, force, split_host, output_path,
+                   engine="pandas", workers=1, id_cache=False, seed=None, on_generated=None, output_format='csv',
+                   batch_size=None, sparse=False, profile=None, id_cache_size=None):
     from fate_test.scripts import generate_mock_data
 
+    if id_cache_size is None:
+        id_cache_size = generate_mock_data.DEFAULT_ID_CACHE_SIZE
+
     def _find_testsuite_files(path):
         suffix = ["testsuite.yaml", "benchmark.yaml", "performance.yaml", "llmsuite.yaml"]
         if isinstance(path, str):
@@ -42,7 +62,70 @@ def _big_data_task(includes, guest_data_size, host_data_size, guest_feature_num,
             for include_path in include_paths:
                 generate_mock_data.get_big_data(guest_data_size, host_data_size, guest_feature_num, host_feature_num,
                                                 include_path, host_data_type, config_inst, encryption_type,
-                                                match_rate, sparsity, force, split_host, output_path)
+                                                match_rate, sparsity, force, split_host, output_path,
+                                                engine=engine, workers=workers, id_cache=id_cache, seed=seed,
+                                                on_generated=on_generated, output_format=output_format,
+                                                batch_size=batch_size, sparse=sparse, profile=profile,
+                                                id_cache_size=id_cache_size)
+
+
+def _stream_upload_data(clients: Clients, suites, config: Config, output_dir, generate, remove_data=False,
+                        buffer_size=2, partitions=None):
+    """
+    run `generate(on_generated)` while a background uploader uploads each generated file as soon as it is ready;
+    at most `buffer_size` files wait in queue, generation blocks when queue is full,
+    so with `remove_data` disk usage is bounded to a few files instead of the whole dataset
+    """
+    datasets = {}
+    for suite in suites:
+        _update_data_path(suite, output_dir)
+        if partitions is not None:
+            _update_data_config(suite, partitions=partitions)
+        for data in suite.dataset:
+            datasets.setdefault(os.path.basename(data.file), []).append((suite, data))
+    file_queue = queue.Queue(maxsize=buffer_size)
+
+    def _upload_file(data_name, data_path, generated):
+        for suite, data in datasets.get(data_name, []):
+            data.update(config)
+            try:
+                status = clients[data.role_str].transform_local_file_to_dataframe(
+                    data, lambda resp: echo.file(f"[dataset]{resp}"), output_dir)
+                if status != 'success':
+                    raise RuntimeError(f"uploading {data_name} for {suite.path} {status}")
+                echo.echo(f"[stream] upload {data.role_str}<-{data.namespace}.{data.table_name} success")
+            except Exception:
+                exception_id = str(uuid.uuid1())
+                echo.file(f"exception({exception_id})")
+                LOGGER.exception(f"exception id: {exception_id}")
+                echo.echo(f"upload data {data.config} to {data.role_str} fail, exception_id: {exception_id}")
+        if remove_data and generated and os.path.exists(data_path):
+            from fate_test.scripts.generate_mock_data import remove_generated
+            remove_generated(data_path)
+
+    def _uploader():
+        uploaded = set()
+        while True:
+            item = file_queue.get()
+            if item is None:
+                return
+            data_name, data_path, generated = item
+            # the same file may be generated for several suites, upload it once
+            if data_name in uploaded:
+                continue
+            uploaded.add(data_name)
+            _upload_file(data_name, data_path, generated)
+
+    def _on_generated(data_name, data_path, generated):
+        file_queue.put((data_name, data_path, generated))
+
+    thread = threading.Thread(target=_uploader, daemon=True)
+    thread.start()
+    try:
+        generate(_on_generated)
+    finally:
+        file_queue.put(None)
+        thread.join()
 
 
 def _load_testsuites(includes, excludes, glob, provider=None, suffix="testsuite.yaml", suite_type="testsuite"):
@@ -114,6 +197,68 @@ def _load_testsuites(includes, excludes, glob, provider=None, suffix="testsuite.
     return suites
 
 
+def _role_party(config: Config, role_str):
+    role, index = role_str.rsplit("_", 1)
+    return config.parties.role_to_party(role)[int(index)]
+
+
+def _job_resources(config: Config, suite):
+    """
+    resources each job of suite holds under global schedule: one slot of every party of suite and its task cores
+    """
+    parties = {config.parties.role_to_party("guest")[0],
+               *(_role_party(config, data.role_str) for data in suite.dataset)}
+    resources = {f"party:{party}": 1 for party in parties}
+    resources["task_cores"] = config.task_cores or DEFAULT_TASK_CORES
+    return resources
+
+
+def _suite_tables(clients: Clients, suite):
+    """
+    tables of suite datasets, keyed by flow service
+    """
+    return {(id(clients[data.role_str]), data.namespace, data.table_name) for data in suite.dataset}
+
+
+def _suites_root(suites):
+    """
+    common path of directories of suites, suites are keyed by their path relative to it in shards and run history
+    """
+    if not suites:
+        return None
+    return os.path.commonpath([str(suite.path.parent) for suite in suites])
+
+
+def _shard_suites(suites, index, count, history=None):
+    """
+    suites of shard `index` (1-based) out of `count`: by a stable hash of path of each suite relative to the common
+    path of all suites, or with `history`, by bin packing expected durations so that shards take about equal time;
+    shards agree on partition as long as they discover the same suites and, for bin packing, read the same history
+    snapshot, which should not change while shards run
+    """
+    if not suites:
+        return []
+    root = _suites_root(suites)
+    keys = {id(suite): Path(os.path.relpath(suite.path, root)).as_posix() for suite in suites}
+    if history is None:
+        return [suite for suite in suites
+                if int(hashlib.sha1(keys[id(suite)].encode()).hexdigest(), 16) % count == index - 1]
+
+    durations = {id(suite): history.expected_duration(keys[id(suite)]) for suite in suites}
+    known = [d for d in durations.values() if d is not None]
+    # suites never succeeded count as taking the mean duration of the others
+    default = sum(known) / len(known) if known else 1.0
+    durations = {k: default if d is None else d for k, d in durations.items()}
+    loads = [0.0] * count
+    shard = []
+    for suite in sorted(suites, key=lambda s: (-durations[id(s)], keys[id(s)])):
+        i = min(range(count), key=lambda k: (loads[k], k))
+        loads[i] += durations[id(suite)]
+        if i == index - 1:
+            shard.append(suite)
+    return shard
+
+
 @LOGGER.catch
 def _bind_data(clients: Clients, suite, config: Config):
     if not suite.dataset:
@@ -156,85 +301,310 @@ def _bind_data(clients: Clients, suite, config: Config):
 
 @LOGGER.catch
 def _upload_data(clients: Clients, suite, config: Config, output_path=None, **kwargs):
+    _upload_datasets(clients, suite, config, output_path, **kwargs)
+
+
+def _upload_datasets(clients: Clients, suite, config: Config, output_path=None, **kwargs):
+    """
+    upload all datasets of suite concurrently: at most `upload_concurrency` uploads run on each flow service,
+    and jobs of submitted uploads are polled together by the shared poller of each flow client;
+    with `upload_cache`, datasets whose table is still cached on flow service are not uploaded again;
+    with `journal`, datasets already uploaded for suite are skipped as long as flow still reports their table,
+    and new uploads are recorded. Returns number of datasets failed to upload, unexpected errors are raised
+    """
     if kwargs.get("partitions") is not None:
         _update_data_config(suite, partitions=kwargs.get("partitions"))
+    concurrency = max(1, kwargs.get("upload_concurrency") or DEFAULT_UPLOAD_CONCURRENCY)
+    upload_cache = kwargs.get("upload_cache")
+    journal = kwargs.get("journal")
+    # datasets waiting to be submitted, grouped by flow service
+    pending = {}
+    for i, data in enumerate(suite.dataset):
+        pending.setdefault(id(clients[data.role_str]), []).append((i, data))
+    running = {service: 0 for service in pending}
+    submitting = {}
+    awaiting = {}
+
+    def _show(_):
+        shown = [progress.show() for *_, progress in list(awaiting.values())[:2]]
+        if len(awaiting) > len(shown):
+            shown.append(f"(+{len(awaiting) - len(shown)} running)")
+        return " ".join(shown)
+
+    failed = []
+
+    def _fail(i, data, status=None):
+        failed.append(i)
+        exception_id = str(uuid.uuid1())
+        echo.file(f"exception({exception_id})")
+        if status is not None:
+            LOGGER.error(f"exception id: {exception_id}, uploading {i + 1}th data for {suite.path} {status}")
+        else:
+            LOGGER.exception(f"exception id: {exception_id}")
+        echo.echo(f"upload {i + 1}th data {data.config} to {data.role_str} fail, exception_id: {exception_id}")
+
+    echo.stdout_newline()
     with click.progressbar(length=len(suite.dataset),
                            label="dataset",
                            show_eta=False,
                            show_pos=True,
-                           width=24) as bar:
-        for i, data in enumerate(suite.dataset):
-            data.update(config)
-            data_progress = DataProgress(f"{data.role_str}<-{data.namespace}.{data.table_name}")
-
-            def update_bar(n_step):
-                bar.item_show_func = lambda x: data_progress.show()
-                time.sleep(0.1)
-                bar.update(n_step)
-
-            def _call_back(resp):
-                if isinstance(resp, UploadDataResponse):
-                    data_progress.submitted(resp.job_id)
-                    echo.file(f"[dataset]{resp.job_id}")
-                if isinstance(resp, QueryJobResponse):
-                    data_progress.update()
-                update_bar(0)
-
-            try:
-                echo.stdout_newline()
-                # role, idx = data.role_str.lower().split("_")
-                # party_id = config.role[role][int(idx)]
-                status = clients[data.role_str].transform_local_file_to_dataframe(data,
-                                                                                  _call_back,
-                                                                                  output_path)
-                time.sleep(1)
-                data_progress.update()
-                if status != 'success':
-                    raise RuntimeError(f"uploading {i + 1}th data for {suite.path} {status}")
+                           item_show_func=_show,
+                           width=24) as bar, \
+            ThreadPoolExecutor(max_workers=max(1, concurrency * len(pending))) as executor:
+        while pending or submitting or awaiting:
+            for service, items in list(pending.items()):
+                while items and running[service] < concurrency:
+                    i, data = items.pop(0)
+                    data.update(config)
+                    client = clients[data.role_str]
+                    progress = DataProgress(f"{data.role_str}<-{data.namespace}.{data.table_name}")
+                    uploaded = journal is not None and journal.uploaded(suite, data)
+                    future = executor.submit(_submit_upload, client, data, output_path, upload_cache, uploaded)
+                    submitting[future] = (service, i, data, client, progress)
+                    running[service] += 1
+                if not items:
+                    del pending[service]
+
+            for future in [future for future in submitting if future.done()]:
+                service, i, data, client, progress = submitting.pop(future)
+                try:
+                    job_id = future.result()
+                except Exception:
+                    running[service] -= 1
+                    _fail(i, data)
+                    bar.update(1)
+                    continue
+                if job_id is None:
+                    running[service] -= 1
+                    if journal is not None and journal.uploaded(suite, data):
+                        echo.file(f"[dataset] {data.namespace}.{data.table_name} uploaded before, skip uploading")
+                    else:
+                        echo.file(f"[dataset] cached {data.namespace}.{data.table_name}, skip uploading")
+                        if journal is not None:
+                            journal.record_upload(suite, data)
+                    bar.update(1)
+                    continue
+                progress.submitted(job_id)
+                echo.file(f"[dataset]{job_id}")
+                # jobs are polled by the shared poller of flow client, future resolves with final status
+                poll = client.poller.watch(job_id, "local", 0, callback=lambda _, p=progress: p.update())
+                awaiting[poll] = (service, i, data, client, progress)
+
+            for poll in [poll for poll in awaiting if poll.done()]:
+                service, i, data, client, progress = awaiting.pop(poll)
+                running[service] -= 1
+                try:
+                    status = poll.result()
+                except Exception:
+                    _fail(i, data)
+                    bar.update(1)
+                    continue
+                if not status.is_success():
+                    _fail(i, data, status)
+                    bar.update(1)
+                    continue
+                if upload_cache is not None:
+                    try:
+                        upload_cache.record(client, data, output_path)
+                    except Exception:
+                        LOGGER.exception(f"cache uploaded table {data.namespace}.{data.table_name} failed")
+                if journal is not None:
+                    journal.record_upload(suite, data)
                 bar.update(1)
-
-                """if _config.data_switch:
-                    from fate_test.scripts import generate_mock_data
-
-                    generate_mock_data.remove_file(data_path)"""
+            bar.update(0)
+
+            if submitting or awaiting:
+                wait([*submitting, *awaiting], timeout=UPLOAD_REFRESH_INTERVAL, return_when=FIRST_COMPLETED)
+    if upload_cache is not None:
+        evicted = upload_cache.evict(clients)
+        if evicted:
+            echo.file(f"[dataset] {evicted} least recently used tables evicted from upload cache")
+    return len(failed)
+
+
+def _submit_upload(client, data, output_path=None, upload_cache=None, uploaded=False):
+    """
+    submit upload of `data`, return None without uploading if its table is still cached,
+    or if it was `uploaded` by the resumed run and flow still reports its table
+    """
+    if uploaded:
+        try:
+            if client.table_count(data.table_name, data.namespace) is not None:
+                return None
+            LOGGER.warning(f"table {data.namespace}.{data.table_name} uploaded before is gone, upload again")
+        except Exception:
+            LOGGER.exception(f"query table {data.namespace}.{data.table_name} uploaded before failed, upload again")
+    if upload_cache is not None:
+        try:
+            if upload_cache.lookup(client, data, output_path):
+                return None
+        except Exception:
+            LOGGER.exception(f"look up upload cache of {data.namespace}.{data.table_name} failed")
+    return client.submit_upload(data, output_path)
+
+
+def _delete_tables(clients: Clients, suite, upload_cache=None, concurrency=DEFAULT_DELETE_CONCURRENCY,
+                   on_deleted=None):
+    """
+    delete tables of suite datasets with at most `concurrency` deletions in flight across all flow services,
+    tables cached by `upload_cache` are kept; `on_deleted(data, table_name)` is called in caller thread per table
+    """
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = {}
+        for data in suite.dataset:
+            table_name = data.config['table_name'] if data.config.get(
+                'table_name', None) is not None else data.config.get('name')
+            client = clients[data.role_str]
+            if upload_cache is not None and upload_cache.contains(client, data):
+                # cached tables are kept for later runs and deleted on eviction
+                if on_deleted is not None:
+                    on_deleted(data, table_name)
+                continue
+            futures[executor.submit(client.delete_data, data)] = (data, table_name)
+        for future in as_completed(futures):
+            data, table_name = futures[future]
+            # noinspection PyBroadException
+            try:
+                future.result()
             except Exception:
-                exception_id = str(uuid.uuid1())
-                echo.file(f"exception({exception_id})")
-                LOGGER.exception(f"exception id: {exception_id}")
-                echo.echo(f"upload {i + 1}th data {data.config} to {data.role_str} fail, exception_id: {exception_id}")
-                # raise RuntimeError(f"exception uploading {i + 1}th data") from e
+                LOGGER.exception(f"delete failed: name={table_name}, namespace={data.config['namespace']}")
+            if on_deleted is not None:
+                on_deleted(data, table_name)
 
 
-def _delete_data(clients: Clients, suite: Testsuite):
+def _delete_data(clients: Clients, suite: Testsuite, upload_cache=None, concurrency=DEFAULT_DELETE_CONCURRENCY):
     with click.progressbar(length=len(suite.dataset),
                            label="delete ",
                            show_eta=False,
                            show_pos=True,
                            width=24) as bar:
+        def _deleted(data, table_name):
+            bar.item_show_func = \
+                lambda x: f"delete table: name={table_name}, namespace={data.config['namespace']}"
+            bar.update(1)
+
+        _delete_tables(clients, suite, upload_cache, concurrency, _deleted)
+    echo.stdout_newline()
+
+
+class CleanupQueue(object):
+    """
+    delete data of suites in a background thread, so that next suite starts while tables of last one are deleted;
+    call `wait_for` before uploading data of a suite, and `join` at the end of run
+    """
+
+    def __init__(self, clients: Clients, upload_cache=None, concurrency=DEFAULT_DELETE_CONCURRENCY):
+        self._clients = clients
+        self._upload_cache = upload_cache
+        self._concurrency = concurrency
+        self._queue = queue.Queue()
+        self._cond = threading.Condition()
+        # tables waiting to be deleted, (flow service, namespace, table name) -> count
+        self._pending = {}
+        self._thread = None
+
+    def _keys(self, suite):
         for data in suite.dataset:
+            table_name = data.config['table_name'] if data.config.get(
+                'table_name', None) is not None else data.config.get('name')
+            yield id(self._clients[data.role_str]), data.config['namespace'], table_name
+
+    def put(self, suite):
+        with self._cond:
+            for key in self._keys(suite):
+                self._pending[key] = self._pending.get(key, 0) + 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="cleanup-queue", daemon=True)
+                self._thread.start()
+        self._queue.put(suite)
+
+    def _run(self):
+        while True:
+            suite = self._queue.get()
+            if suite is None:
+                return
+
+            def _deleted(data, table_name):
+                key = (id(self._clients[data.role_str]), data.config['namespace'], table_name)
+                with self._cond:
+                    self._pending[key] -= 1
+                    if not self._pending[key]:
+                        del self._pending[key]
+                    self._cond.notify_all()
+
             # noinspection PyBroadException
             try:
-                table_name = data.config['table_name'] if data.config.get(
-                    'table_name', None) is not None else data.config.get('name')
-                bar.item_show_func = \
-                    lambda x: f"delete table: name={table_name}, namespace={data.config['namespace']}"
-                clients[data.role_str].delete_data(data)
+                _delete_tables(self._clients, suite, self._upload_cache, self._concurrency, _deleted)
+                echo.file(f"[cleanup] data of {suite.path} deleted")
             except Exception:
-                LOGGER.exception(
-                    f"delete failed: name={table_name}, namespace={data.config['namespace']}")
-
-            time.sleep(0.5)
-            bar.update(1)
-            echo.stdout_newline()
+                LOGGER.exception(f"delete data of {suite.path} failed")
+                with self._cond:
+                    for key in self._keys(suite):
+                        self._pending.pop(key, None)
+                    self._cond.notify_all()
+
+    def wait_for(self, suite):
+        """
+        block until no table of suite is waiting to be deleted, so that tables uploaded next are not deleted
+        """
+        keys = set(self._keys(suite))
+        with self._cond:
+            self._cond.wait_for(lambda: not keys.intersection(self._pending))
+
+    def join(self):
+        with self._cond:
+            if self._thread is None:
+                return
+            thread, self._thread = self._thread, None
+            if self._pending:
+                echo.echo(f"waiting for deletion of {len(self._pending)} tables")
+        self._queue.put(None)
+        thread.join()
 
 
 def _load_module_from_script(script_path):
-    module_name = str(script_path).split("/", -1)[-1].split(".")[0]
-    loader = importlib.machinery.SourceFileLoader(module_name, str(script_path))
-    spec = importlib.util.spec_from_loader(loader.name, loader)
-    mod = importlib.util.module_from_spec(spec)
-    loader.exec_module(mod)
-    return mod
+    return script_modules.load(script_path)[0]
+
+
+def _run_script_main(script_path, config: Config, param, namespace=None):
+    """
+    load script and call its `main` with the arguments it takes, pipeline scripts get `namespace` if given;
+    return what `main` returned and seconds taken to load script
+    """
+    mod, load_time = script_modules.load(script_path)
+    input_params = signature(mod.main).parameters
+    # local script
+    if len(input_params) == 1:
+        return mod.main(param=param), load_time
+    elif len(input_params) == 2:
+        return mod.main(config=config, param=param), load_time
+    # pipeline script
+    elif len(input_params) == 3:
+        if namespace is not None:
+            return mod.main(config=config, param=param, namespace=namespace), load_time
+        return mod.main(config=config, param=param), load_time
+    return mod.main(), load_time
+
+
+def _run_pipeline_script(script_path, config: Config, namespace=None, task=None, publisher=None):
+    """
+    run `main` of pipeline script in current process, publishing jobs it submits as events of `task`,
+    return error if any and seconds taken to load script; `loaded` is False if the script could not be loaded.
+    Entry point of script workers, so it lives in an importable module: commands are loaded by `eval`
+    and their functions cannot be pickled
+    """
+    result = dict(loaded=False, error=None, load_time=None)
+    with publish_to(publisher or job_events, task):
+        try:
+            mod, result["load_time"] = script_modules.load(script_path)
+            result["loaded"] = True
+            if namespace is not None:
+                mod.main(config=config, namespace=namespace)
+            else:
+                mod.main(config=config)
+        except Exception as e:
+            result["error"] = str(e)
+    return result
 
 
 def _set_namespace(data_namespace_mangling, namespace):
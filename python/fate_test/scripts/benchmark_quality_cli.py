@@ -3,7 +3,6 @@ import re
 import time
 import uuid
 from datetime import timedelta
-from inspect import signature
 
 import click
 
@@ -12,7 +11,10 @@ from fate_test._config import Config
 from fate_test._io import LOGGER, echo
 from fate_test._parser import BenchmarkSuite
 from fate_test.scripts._options import SharedOptions
-from fate_test.scripts._utils import _upload_data, _delete_data, _load_testsuites, _load_module_from_script
+from fate_test.scripts._runner import script_runner
+from fate_test.scripts._scheduler import SUCCEEDED, WorkGraph, WorkItem, add_suite_work
+from fate_test.scripts._utils import _upload_data, _upload_datasets, _delete_data, CleanupQueue, _load_testsuites, \
+    _run_script_main, _job_resources, _suite_tables
 from fate_test.utils import show_data, match_metrics
 
 DATA_DISPLAY_PATTERN = re.compile("^FATE")
@@ -43,15 +45,25 @@ DATA_DISPLAY_PATTERN = re.compile("^FATE")
               help="upload data only")
 @click.option("--disable-clean-data", "clean_data", flag_value=False, default=None)
 @click.option("--enable-clean-data", "clean_data", flag_value=True, default=None)
+@click.option("--global-schedule", is_flag=True, default=False,
+              help="schedule uploads, jobs and cleanups of all benchmark suites together under the limits below")
+@click.option("--max-party-jobs", type=int, default=2,
+              help="max number of benchmark jobs involving a party running at the same time, with --global-schedule")
+@click.option("--max-task-cores", type=int, default=None,
+              help="max sum of task cores of benchmark jobs running at the same time, with --global-schedule")
+@click.option("--max-uploads", type=int, default=2,
+              help="max number of benchmark suites uploading data at the same time, with --global-schedule")
+@click.option("--resume", type=str, metavar="<namespace>",
+              help="resume run of namespace from its journal, skipping work which already succeeded")
 @SharedOptions.get_shared_options(hidden=True)
 @click.pass_context
 def run_benchmark_quality(ctx, include, exclude, glob, skip_data, tol, clean_data, storage_tag, history_tag, match_details,
-                          task_cores, timeout, **kwargs):
+                          task_cores, timeout, global_schedule, max_party_jobs, max_task_cores, max_uploads, **kwargs):
     """
     process benchmark suite, alias: bq
     """
     ctx.obj.update(**kwargs)
-    ctx.obj.post_process()
+    ctx.obj.post_process(journal=True)
     namespace = ctx.obj["namespace"]
     config_inst = ctx.obj["config"]
     if ctx.obj["extend_sid"] is not None:
@@ -80,27 +92,61 @@ def run_benchmark_quality(ctx, include, exclude, glob, skip_data, tol, clean_dat
     if not yes and not click.confirm("running?"):
         return
     client = Clients(config_inst)
+    cleanup = CleanupQueue(client, ctx.obj["upload_cache"]) if ctx.obj["defer_clean_data"] else None
+    # concurrent jobs always run in worker processes, keeping their module globals apart
+    runner = script_runner(ctx.obj, config_inst.timeout, size=None if global_schedule else 1, required=global_schedule,
+                           stop_job=client["guest_0"].stop_job)
+    journal = ctx.obj["journal"]
     fate_version = client["guest_0"].get_version()
+    if global_schedule:
+        # noinspection PyBroadException
+        try:
+            _schedule_benchmark_suites(suites, client, config_inst, namespace, data_namespace_mangling,
+                                       limits=dict(party=max_party_jobs, task_cores=max_task_cores,
+                                                   upload=max_uploads),
+                                       runner=runner, journal=journal, tol=tol, storage_tag=storage_tag,
+                                       history_tag=history_tag, fate_version=fate_version,
+                                       match_details=match_details, skip_data=skip_data,
+                                       data_only=kwargs.get("data_only"), clean_data=clean_data,
+                                       upload_cache=ctx.obj["upload_cache"], partitions=ctx.obj["partitions"],
+                                       upload_concurrency=ctx.obj["upload_concurrency"])
+        except Exception:
+            exception_id = uuid.uuid1()
+            echo.echo(f"exception in global schedule, exception_id={exception_id}", err=True, fg='red')
+            LOGGER.exception(f"exception id: {exception_id}")
+        suites = []
     for i, suite in enumerate(suites):
         # noinspection PyBroadException
         try:
             start = time.time()
             echo.echo(f"[{i + 1}/{len(suites)}]start at {time.strftime('%Y-%m-%d %X')} {suite.path}", fg='red')
-            if not skip_data:
+            # metrics of all jobs recorded by an earlier run, no data needed
+            done = all(journal.metric(suite, pair.pair_name, job.job_name) is not None
+                       for pair in suite.pairs for job in pair.jobs)
+            if not skip_data and not done:
+                if cleanup is not None:
+                    cleanup.wait_for(suite)
                 try:
-                    _upload_data(client, suite, config_inst, partitions=ctx.obj["partitions"])
+                    _upload_data(client, suite, config_inst, partitions=ctx.obj["partitions"],
+                                 upload_concurrency=ctx.obj["upload_concurrency"],
+                                 upload_cache=ctx.obj["upload_cache"], journal=journal)
                 except Exception as e:
                     raise RuntimeError(f"exception occur while uploading data for {suite.path}") from e
                 if kwargs.get("data_only"):
                     continue
             try:
                 _run_benchmark_pairs(config_inst, suite, tol, namespace, data_namespace_mangling, storage_tag,
-                                     history_tag, fate_version, match_details)
+                                     history_tag, fate_version, match_details, runner=runner, journal=journal)
             except Exception as e:
                 raise RuntimeError(f"exception occur while running benchmark jobs for {suite.path}") from e
 
-            if not skip_data and clean_data:
-                _delete_data(client, suite)
+            if not skip_data and clean_data and not journal.suite_done(suite):
+                journal.record_clean(suite)
+                if cleanup is not None:
+                    cleanup.put(suite)
+                else:
+                    _delete_data(client, suite, upload_cache=ctx.obj["upload_cache"])
+            journal.record_suite(suite)
             echo.echo(f"[{i + 1}/{len(suites)}]elapse {timedelta(seconds=int(time.time() - start))}", fg='red')
 
         except Exception:
@@ -109,58 +155,148 @@ def run_benchmark_quality(ctx, include, exclude, glob, skip_data, tol, clean_dat
             LOGGER.exception(f"exception id: {exception_id}")
         finally:
             echo.stdout_newline()
+    if runner is not None:
+        runner.close()
+    if cleanup is not None:
+        cleanup.join()
+    echo.echo(client.pretty_http_stats())
     echo.farewell()
     echo.echo(f"testsuite namespace: {namespace}", fg='red')
 
 
+def _add_fate_pythonpath(config: Config):
+    PYTHONPATH = os.environ.get('PYTHONPATH') + ":" + os.path.join(config.fate_base, "python")
+    os.environ['PYTHONPATH'] = PYTHONPATH
+
+
 @LOGGER.catch
 def _run_benchmark_pairs(config: Config, suite: BenchmarkSuite, tol: float, namespace: str,
-                         data_namespace_mangling: bool, storage_tag, history_tag, fate_version, match_details):
+                         data_namespace_mangling: bool, storage_tag, history_tag, fate_version, match_details,
+                         runner=None, journal=None):
     # pipeline demo goes here
     pair_n = len(suite.pairs)
-    fate_base = config.fate_base
-    PYTHONPATH = os.environ.get('PYTHONPATH') + ":" + os.path.join(fate_base, "python")
-    os.environ['PYTHONPATH'] = PYTHONPATH
+    _add_fate_pythonpath(config)
     for i, pair in enumerate(suite.pairs):
         echo.echo(f"Running [{i + 1}/{pair_n}] group: {pair.pair_name}")
         results = {}
         # data_summary = None
         job_n = len(pair.jobs)
         for j, job in enumerate(pair.jobs):
-            try:
-                echo.echo(f"Running [{j + 1}/{job_n}] job: {job.job_name}")
-                job_name, script_path, conf_path = job.job_name, job.script_path, job.conf_path
-                param = Config.load_from_file(conf_path)
-                mod = _load_module_from_script(script_path)
-                input_params = signature(mod.main).parameters
-                # local script
-                if len(input_params) == 1:
-                    data, metric = mod.main(param=param)
-                elif len(input_params) == 2:
-                    data, metric = mod.main(config=config, param=param)
-                # pipeline script
-                elif len(input_params) == 3:
-                    if data_namespace_mangling:
-                        data, metric = mod.main(config=config, param=param, namespace=f"_{namespace}")
-                    else:
-                        data, metric = mod.main(config=config, param=param)
-                else:
-                    data, metric = mod.main()
-                results[job_name] = metric
-                echo.echo(f"[{j + 1}/{job_n}] job: {job.job_name} Success!\n")
-                if data and DATA_DISPLAY_PATTERN.match(job_name):
-                    # data_summary = data
-                    show_data(data)
-                # if data_summary is None:
-                #    data_summary = data
-            except Exception as e:
-                exception_id = uuid.uuid1()
-                echo.echo(f"exception while running [{j + 1}/{job_n}] job, exception_id={exception_id}", err=True,
-                          fg='red')
-                LOGGER.exception(f"exception id: {exception_id}, error message: \n{e}")
-                continue
-        rel_tol = pair.compare_setting.get("relative_tol")
-        # show_data(data_summary)
-        match_metrics(evaluate=True, group_name=pair.pair_name, abs_tol=tol, rel_tol=rel_tol,
-                      storage_tag=storage_tag, history_tag=history_tag, fate_version=fate_version,
-                      cache_directory=config.cache_directory, match_details=match_details, **results)
+            metric = _run_benchmark_job(config, suite, pair, job, f"[{j + 1}/{job_n}]", namespace,
+                                        data_namespace_mangling, runner=runner, journal=journal)
+            if metric is not None:
+                results[job.job_name] = metric
+        _match_pair_metrics(config, pair, results, tol, storage_tag, history_tag, fate_version, match_details)
+
+
+def _run_benchmark_job(config: Config, suite: BenchmarkSuite, pair, job, progress, namespace: str,
+                       data_namespace_mangling: bool, runner=None, journal=None):
+    """
+    run benchmark job of pair unless its metric is in `journal`, return its metric, None if it failed
+    """
+    metric = journal.metric(suite, pair.pair_name, job.job_name) if journal is not None else None
+    if metric is not None:
+        echo.echo(f"{progress} job: {job.job_name} succeeded before, skip")
+        return metric
+    try:
+        echo.echo(f"Running {progress} job: {job.job_name}")
+        job_name, script_path, conf_path = job.job_name, job.script_path, job.conf_path
+        param = Config.load_from_file(conf_path)
+        script_namespace = f"_{namespace}" if data_namespace_mangling else None
+        if runner is not None:
+            (data, metric), load_time = runner.run(_run_script_main, script_path, config, param,
+                                                   script_namespace)
+        else:
+            (data, metric), load_time = _run_script_main(script_path, config, param, script_namespace)
+        if journal is not None:
+            journal.record_metric(suite, pair.pair_name, job_name, metric)
+        echo.echo(f"{progress} job: {job.job_name} Success! script loaded in {load_time:.3f}s\n")
+        if data and DATA_DISPLAY_PATTERN.match(job_name):
+            # data_summary = data
+            show_data(data)
+        # if data_summary is None:
+        #    data_summary = data
+        return metric
+    except Exception as e:
+        exception_id = uuid.uuid1()
+        echo.echo(f"exception while running {progress} job, exception_id={exception_id}", err=True,
+                  fg='red')
+        LOGGER.exception(f"exception id: {exception_id}, error message: \n{e}")
+        return None
+
+
+def _match_pair_metrics(config: Config, pair, results, tol, storage_tag, history_tag, fate_version, match_details):
+    rel_tol = pair.compare_setting.get("relative_tol")
+    # show_data(data_summary)
+    match_metrics(evaluate=True, group_name=pair.pair_name, abs_tol=tol, rel_tol=rel_tol,
+                  storage_tag=storage_tag, history_tag=history_tag, fate_version=fate_version,
+                  cache_directory=config.cache_directory, match_details=match_details, **results)
+
+
+def _schedule_benchmark_suites(suites, clients: Clients, config: Config, namespace: str,
+                               data_namespace_mangling: bool, limits, runner, tol, storage_tag, history_tag,
+                               fate_version, match_details, skip_data=False, data_only=False, clean_data=False,
+                               upload_cache=None, journal=None, **upload_kwargs):
+    """
+    run uploads, benchmark jobs and metric comparisons of all suites as one work graph under `limits`,
+    scheduled as testsuites are by `suite --global-schedule`; metrics of a pair are compared once the suite is done
+    """
+    graph = WorkGraph(limits)
+    _add_fate_pythonpath(config)
+    # table -> last work item of the suite which used it
+    table_users = {}
+    for i, suite in enumerate(suites):
+        progress = f"[{i + 1}/{len(suites)}]"
+        # metrics of all jobs recorded by an earlier run, no data needed
+        done = all(journal.metric(suite, pair.pair_name, job.job_name) is not None
+                   for pair in suite.pairs for job in pair.jobs)
+        upload = None
+        if not skip_data and not done:
+            def _upload(suite=suite, progress=progress):
+                echo.echo(f"{progress}upload data of {suite.path}", fg='red')
+                failed = _upload_datasets(clients, suite, config, upload_cache=upload_cache, journal=journal,
+                                          **upload_kwargs)
+                if failed:
+                    raise RuntimeError(f"{failed} datasets of {suite.path} failed to upload")
+                return True
+
+            upload = WorkItem(f"upload {suite.path}", _upload, resources={"upload": 1})
+        results = {pair.pair_name: {} for pair in suite.pairs}
+        jobs = []
+        if not data_only:
+            resources = _job_resources(config, suite)
+            for pair in suite.pairs:
+                for j, job in enumerate(pair.jobs):
+                    def _job(suite=suite, pair=pair, job=job, job_progress=f"{progress}[{pair.pair_name}]"):
+                        metric = _run_benchmark_job(config, suite, pair, job, job_progress, namespace,
+                                                    data_namespace_mangling, runner=runner, journal=journal)
+                        if metric is None:
+                            return False
+                        results[pair.pair_name][job.job_name] = metric
+                        return True
+
+                    def _skip(suite=suite, job=job):
+                        echo.echo(f"Skip job: {job.job_name} of {suite.path}, data upload not success")
+
+                    jobs.append(WorkItem(f"job {job.job_name} of {pair.pair_name} in {suite.path}", _job,
+                                         resources=resources, on_skip=_skip))
+
+        def _finish(suite=suite, progress=progress, upload=upload, results=results):
+            if upload is not None and upload.state != SUCCEEDED:
+                echo.echo(f"{progress}exception occur while uploading data for {suite.path}", err=True, fg='red')
+                return False
+            if data_only:
+                return True
+            for pair in suite.pairs:
+                echo.echo(f"{progress}group: {pair.pair_name} of {suite.path}")
+                _match_pair_metrics(config, pair, results[pair.pair_name], tol, storage_tag, history_tag,
+                                    fate_version, match_details)
+            if not skip_data and clean_data and not journal.suite_done(suite):
+                journal.record_clean(suite)
+                _delete_data(clients, suite, upload_cache=upload_cache)
+            journal.record_suite(suite)
+            return True
+
+        add_suite_work(graph, _suite_tables(clients, suite), table_users, WorkItem(f"finish {suite.path}", _finish),
+                       upload=upload, jobs=jobs)
+    graph.run()
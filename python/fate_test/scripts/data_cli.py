@@ -3,13 +3,17 @@ import re
 import uuid
 
 import click
+from prettytable import PrettyTable, ORGMODE
 from ruamel import yaml
 
 from fate_test._client import Clients
 from fate_test._config import Config
 from fate_test._io import LOGGER, echo
 from fate_test.scripts._options import SharedOptions
-from fate_test.scripts._utils import _load_testsuites, _delete_data, _big_data_task, _upload_data, _update_data_path
+from fate_test.scripts.data_profiles import DISTRIBUTION_PROFILES, get_profile
+from fate_test.scripts._utils import _load_testsuites, _delete_data, _big_data_task, _upload_data, _update_data_path, \
+    _stream_upload_data
+from fate_test.utils import TxtStyle
 
 
 @click.group(name="data")
@@ -72,7 +76,9 @@ def upload(ctx, include, exclude, glob, suite_type, role, config_type, **kwargs)
             return
 
         for suite in suites:
-            _upload_data(client, suite, config_inst, partitions=ctx.obj["partitions"])
+            _upload_data(client, suite, config_inst, partitions=ctx.obj["partitions"],
+                         upload_concurrency=ctx.obj["upload_concurrency"],
+                         upload_cache=ctx.obj["upload_cache"])
     else:
         config = get_config(config_inst)
         if config_type == 'min_test':
@@ -152,13 +158,40 @@ def delete(ctx, include, exclude, glob, yes, suite_type, **kwargs):
 @click.option('-o', '--output-path', type=click.Path(exists=True),
               help="Customize the output path of generated data")
 @click.option('--force', is_flag=True, default=False,
-              help="Overwrite existing file")
+              help="Overwrite existing file, instead of resuming or skipping it")
 @click.option('--split-host', is_flag=True, default=False,
               help="Divide the amount of host data equally among all the host tables in TestSuite")
 @click.option('--upload-data', is_flag=True, default=False,
               help="Generated data will be uploaded")
 @click.option('--remove-data', is_flag=True, default=False,
               help="The generated data will be deleted")
+@click.option('--engine', type=click.Choice(["pandas", "vectorized"]), default="pandas",
+              help="Data generating engine, `vectorized` samples and formats whole batches with numpy")
+@click.option('-w', '--workers', type=int, default=1,
+              help="Number of processes generating shards of each table, default to 1")
+@click.option('--id-cache', is_flag=True, default=False,
+              help="Reuse hashed ids memory-mapped in cache directory, effective with `--engine vectorized`")
+@click.option('--id-cache-size', type=int, default=None,
+              help="Max megabytes of hashed ids kept by `--id-cache`, least recently used ones beyond are removed, "
+                   "default to 2048")
+@click.option('--seed', type=int, default=None,
+              help="Random seed, generated data with the same seed and parameters are byte-identical")
+@click.option('--stream-upload', is_flag=True, default=False,
+              help="Upload each data file as soon as it is generated, overlapping generation and upload")
+@click.option('--stream-buffer', type=int, default=2,
+              help="Max number of generated files waiting for upload in `--stream-upload` mode")
+@click.option('--output-format', type=click.Choice(["csv", "parquet", "arrow", "npy"]), default="csv",
+              help="Format of generated data file, formats other than csv require `--engine vectorized`, "
+                   "npy supports dense data only")
+@click.option('--batch-size', type=str, default=None,
+              help="Rows(e.g. 10000) or bytes(e.g. 64MB) sampled and written at once, "
+                   "default to about one million cells")
+@click.option('--sparse', is_flag=True, default=False,
+              help="Sample tag and tag_value host data as sparse rows, each holding exactly `sparsity` of all columns")
+@click.option('--profile', type=click.Choice(list(DISTRIBUTION_PROFILES)), default=None,
+              help="Distribution profile of dense data, requires `--engine vectorized`, default to uniform")
+@click.option('--profile-param', type=str, multiple=True,
+              help="Parameter of distribution profile in form of key=value, e.g. positive_rate=0.1")
 # @click.option('--use-local-data', is_flag=True, default=False,
 #               help="The existing data of the server will be uploaded, This parameter is not recommended for "
 #                    "distributed applications")
@@ -168,7 +201,8 @@ def delete(ctx, include, exclude, glob, yes, suite_type, **kwargs):
 @click.pass_context
 def generate(ctx, include, host_data_type, encryption_type, match_rate, sparsity, guest_data_size,
              host_data_size, guest_feature_num, host_feature_num, output_path, force, split_host, upload_data,
-             **kwargs):
+             remove_data, engine, workers, id_cache, id_cache_size, seed, stream_upload, stream_buffer, output_format,
+             batch_size, sparse, profile, profile_param, **kwargs):
     """
     create data defined in suite config files
     """
@@ -185,6 +219,38 @@ def generate(ctx, include, host_data_type, encryption_type, match_rate, sparsity
         upload_data = False
     """
     yes = ctx.obj["yes"]
+    from fate_test.scripts.generate_mock_data import parse_batch_size
+    try:
+        parse_batch_size(batch_size)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--batch-size")
+    if profile is not None:
+        if engine != "vectorized":
+            raise click.BadParameter("distribution profile requires `--engine vectorized`", param_hint="--profile")
+        try:
+            params = {}
+            for param in profile_param:
+                if "=" not in param:
+                    raise ValueError(f"profile param should be in form of key=value, got {param}")
+                key, value = param.split("=", 1)
+                params[key.strip()] = yaml.safe_load(value)
+            profile = get_profile(profile, **params)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--profile-param")
+    elif profile_param:
+        raise click.BadParameter("profile params are given without `--profile`", param_hint="--profile-param")
+    if output_format != "csv":
+        if sparse:
+            raise click.BadParameter("sparse mode only writes csv", param_hint="--output-format")
+        if engine != "vectorized":
+            raise click.BadParameter(f"output format {output_format} requires `--engine vectorized`",
+                                     param_hint="--output-format")
+        if upload_data or stream_upload:
+            raise click.BadParameter("only csv data can be uploaded, convert with `data export` first",
+                                     param_hint="--output-format")
+        if output_format in ["parquet", "arrow"]:
+            from fate_test.scripts.generate_mock_data import import_pyarrow
+            import_pyarrow()
     echo.welcome()
     echo.echo(f"testsuite namespace: {namespace}", fg='red')
     echo.echo("loading testsuites:")
@@ -196,22 +262,95 @@ def generate(ctx, include, host_data_type, encryption_type, match_rate, sparsity
     suites += _load_testsuites(includes=include, excludes=tuple(), glob=None,
                                suffix="performance.yaml", suite_type="performance")
     for suite in suites:
-        if upload_data:
+        if upload_data or stream_upload:
             echo.echo(f"\tdataget({len(suite.dataset)}) dataset({len(suite.dataset)}) {suite.path}")
         else:
             echo.echo(f"\tdataget({len(suite.dataset)}) {suite.path}")
     if not yes and not click.confirm("running?"):
         return
 
-    _big_data_task(include, guest_data_size, host_data_size, guest_feature_num, host_feature_num, host_data_type,
-                   config_inst, encryption_type, match_rate, sparsity, force, split_host, output_path)
+    def _generate(on_generated=None):
+        _big_data_task(include, guest_data_size, host_data_size, guest_feature_num, host_feature_num, host_data_type,
+                       config_inst, encryption_type, match_rate, sparsity, force, split_host, output_path,
+                       engine=engine, workers=workers, id_cache=id_cache, seed=seed, on_generated=on_generated,
+                       output_format=output_format, batch_size=batch_size, sparse=sparse, profile=profile,
+                       id_cache_size=id_cache_size)
+
+    if stream_upload:
+        client = Clients(config_inst)
+        output_dir = output_path if output_path else os.path.abspath(config_inst.cache_directory)
+        _stream_upload_data(client, suites, config_inst, output_dir, _generate, remove_data=remove_data,
+                            buffer_size=stream_buffer, partitions=ctx.obj["partitions"])
+        return
+
+    _generate()
     if upload_data:
         client = Clients(config_inst)
         for suite in suites:
             output_dir = output_path if output_path else os.path.abspath(config_inst.cache_directory)
             _update_data_path(suite, output_dir)
             # echo.echo(f"data files: {[data.file for data in suite.dataset]}")
-            _upload_data(client, suite, config_inst, partitions=ctx.obj["partitions"])
+            _upload_data(client, suite, config_inst, partitions=ctx.obj["partitions"],
+                         upload_concurrency=ctx.obj["upload_concurrency"],
+                         upload_cache=ctx.obj["upload_cache"])
+
+
+@data_group.command("generate_benchmark")
+@click.option('-n', '--data-size', type=int, default=10000,
+              help="Number of rows generated by each engine, not less than 100")
+@click.option('-f', '--feature-num', type=int, default=200,
+              help="Feature dimensions of generated data")
+@click.option('-ht', '--data-type', type=click.Choice(['dense', 'tag', 'tag_value']), multiple=True,
+              help="Data format to benchmark, default to all")
+@click.option('-s', '--sparsity', default=0.2, type=float,
+              help="The sparsity of tag data, The value is between (0-1)")
+@click.option('-p', '--encryption-type', type=click.Choice(['sha256', 'md5']),
+              help="ID encryption method, choose between sha256 and md5")
+@click.option('-of', '--output-format', type=click.Choice(["csv", "parquet", "arrow", "npy"]), multiple=True,
+              help="Output format to benchmark, default to csv; binary formats are measured with vectorized engine")
+@SharedOptions.get_shared_options(hidden=True)
+@click.pass_context
+def generate_benchmark(ctx, data_size, feature_num, data_type, sparsity, encryption_type, output_format, **kwargs):
+    """
+    compare generating throughput(rows/sec) and file size of data generate engines and output formats
+    """
+    from fate_test.scripts.generate_mock_data import benchmark_generate, import_pyarrow
+
+    ctx.obj.update(**kwargs)
+    ctx.obj.post_process()
+    if {"parquet", "arrow"} & set(output_format):
+        import_pyarrow()
+    data_types = data_type if data_type else ('dense', 'tag', 'tag_value')
+    result = benchmark_generate(data_size, feature_num, data_types=data_types, sparsity=sparsity,
+                                encryption_type=encryption_type, output_formats=output_format or ("csv",))
+    table = PrettyTable()
+    table.set_style(ORGMODE)
+    table.field_names = ["data type", "engine", "format", "rows", "time consuming", "rows/sec", "size(MB)"]
+    for r in result:
+        table.add_row([r["data_type"], r["engine"], r["output_format"], r["rows"], f"{r['seconds']:.2f}s",
+                       f"{r['rows_per_sec']:.0f}", f"{r['size'] / 1024 / 1024:.2f}"])
+    echo.echo(table.get_string(title=f"{TxtStyle.TITLE}Data Generate Benchmark{TxtStyle.END}"))
+
+
+@data_group.command("export")
+@click.option('-i', '--input-path', required=True, type=click.Path(exists=True),
+              help="Data file generated in parquet, arrow or npy format")
+@click.option('-o', '--output-path', type=click.Path(),
+              help="Path of exported csv file, default to input path with extension replaced by csv")
+@SharedOptions.get_shared_options(hidden=True)
+@click.pass_context
+def export(ctx, input_path, output_path, **kwargs):
+    """
+    convert generated data file of binary format to csv that can be uploaded
+    """
+    from fate_test.scripts.generate_mock_data import export_csv
+
+    ctx.obj.update(**kwargs)
+    ctx.obj.post_process()
+    if output_path is None:
+        output_path = f"{os.path.splitext(input_path)[0]}.csv"
+    export_csv(input_path, output_path)
+    echo.echo(f"exported to {output_path}")
 
 
 @data_group.command("query_schema")
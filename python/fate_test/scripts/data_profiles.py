@@ -0,0 +1,202 @@
+#
+#  Copyright 2019 The FATE Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import numpy as np
+
+# registered distribution profiles, name -> profile class
+DISTRIBUTION_PROFILES = {}
+# stream keys of values derived from row ids, so that all tables of the same rows agree on them
+_LATENT_KEY = 1
+_COMPONENT_KEY = 2
+_LABEL_KEY = 3
+
+
+def register_profile(name):
+    def _register(cls):
+        cls.name = name
+        DISTRIBUTION_PROFILES[name] = cls
+        return cls
+
+    return _register
+
+
+def get_profile(name, **params):
+    """
+    instantiate registered profile `name` with `params`
+    """
+    if name not in DISTRIBUTION_PROFILES:
+        raise ValueError(f"unknown distribution profile: {name}, choose from {list(DISTRIBUTION_PROFILES)}")
+    try:
+        return DISTRIBUTION_PROFILES[name](**params)
+    except TypeError as e:
+        raise ValueError(f"invalid params of distribution profile {name}: {e}")
+
+
+def _splitmix64(x):
+    with np.errstate(over="ignore"):
+        x = x + np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return x ^ (x >> np.uint64(31))
+
+
+def id_uniform(row_ids, columns, key, seed=0):
+    """
+    uniform values in [0, 1) of shape (len(row_ids), columns), each a pure function of (seed, key, row id, column)
+    """
+    row_ids = np.asarray(row_ids, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        base = _splitmix64(row_ids ^ _splitmix64(np.uint64(seed) * np.uint64(0x10001) + np.uint64(key)))
+        bits = _splitmix64(base[:, None] + np.arange(columns, dtype=np.uint64))
+    return (bits >> np.uint64(11)).astype(np.float64) * (1.0 / (1 << 53))
+
+
+def id_normal(row_ids, columns, key, seed=0):
+    """
+    standard normal values derived from row ids, see `id_uniform`
+    """
+    u = id_uniform(row_ids, 2 * columns, key, seed)
+    return np.sqrt(-2 * np.log1p(-u[:, :columns])) * np.cos(2 * np.pi * u[:, columns:])
+
+
+def _sigmoid(x):
+    return 1 / (1 + np.exp(-x))
+
+
+def _normal_cdf(x):
+    # Abramowitz-Stegun approximation of erf, accurate to 1.5e-7
+    t = 1 / (1 + 0.3275911 * np.abs(x) / np.sqrt(2))
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    erf = 1 - poly * np.exp(-x * x / 2)
+    return 0.5 * (1 + np.sign(x) * erf)
+
+
+@register_profile("uniform")
+class UniformProfile(object):
+    """
+    features uniform in [-1, 1) with 4 decimals and labels of fair coin flips, same as legacy generation
+    """
+
+    def __init__(self):
+        self.params = {}
+
+    def describe(self):
+        return dict(name=self.name, **self.params)
+
+    def sample(self, row_ids, feature_nums, label_flag, rng, table_key=0):
+        """
+        Returns
+        -------
+        (labels, x), labels is None if not label_flag, x holds integer codes of value * 10000
+        """
+        n = len(row_ids)
+        labels = rng.integers(0, 2, size=n) if label_flag else None
+        return labels, rng.integers(-10000, 10000, size=(n, feature_nums))
+
+
+class LatentProfile(UniformProfile):
+    """
+    rows are driven by a hidden latent vector and a mixture component, both derived from row id,
+    so that guest and host tables of the same ids are correlated through them;
+    labels come from a hidden logistic model on the latent vector, with bias calibrated to `positive_rate`
+
+    columns of each table are split by `gaussian_ratio`, `skewed_ratio` and rest as categorical:
+    gaussian columns are a gaussian mixture loading on the latent vector,
+    skewed columns are log-normal, categorical columns take `categories` levels of zipf-like frequencies
+    """
+    defaults = dict(latent_dim=8, components=3, signal=1.0, noise=0.5, positive_rate=0.5, label_signal=2.0,
+                    gaussian_ratio=1.0, skewed_ratio=0.0, categories=5, profile_seed=0)
+
+    def __init__(self, **params):
+        unknown = set(params) - set(self.defaults)
+        if unknown:
+            raise TypeError(f"unexpected params {sorted(unknown)}, choose from {sorted(self.defaults)}")
+        self.params = dict(self.defaults, **params)
+        if not 0 < self.params["positive_rate"] < 1:
+            raise ValueError(f"positive_rate should be in (0, 1), got {self.params['positive_rate']}")
+        if self.params["gaussian_ratio"] + self.params["skewed_ratio"] > 1:
+            raise ValueError("gaussian_ratio + skewed_ratio should be no more than 1")
+        rng = np.random.default_rng([self.params["profile_seed"], _LABEL_KEY])
+        label_weight = rng.standard_normal(self.params["latent_dim"])
+        # unit norm keeps logits of latent standard normal, as assumed by bias calibration
+        self._label_weight = label_weight / np.linalg.norm(label_weight)
+        self._label_bias = self._calibrate_bias(rng)
+        self._columns = {}
+
+    def _calibrate_bias(self, rng):
+        logits = self.params["label_signal"] * rng.standard_normal(1 << 16)
+        low, high = -20.0, 20.0
+        for _ in range(60):
+            mid = (low + high) / 2
+            if _sigmoid(logits + mid).mean() < self.params["positive_rate"]:
+                low = mid
+            else:
+                high = mid
+        return (low + high) / 2
+
+    def _column_params(self, feature_nums, table_key):
+        key = (feature_nums, table_key)
+        if key not in self._columns:
+            p = self.params
+            rng = np.random.default_rng([p["profile_seed"], table_key, feature_nums])
+            gaussian_num = round(feature_nums * p["gaussian_ratio"])
+            skewed_num = min(feature_nums - gaussian_num, round(feature_nums * p["skewed_ratio"]))
+            kinds = np.zeros(feature_nums, dtype=np.int8)
+            kinds[gaussian_num:gaussian_num + skewed_num] = 1
+            kinds[gaussian_num + skewed_num:] = 2
+            kinds = rng.permutation(kinds)
+            loading = rng.standard_normal((p["latent_dim"], feature_nums)) * p["signal"] / np.sqrt(p["latent_dim"])
+            centers = rng.standard_normal((p["components"], feature_nums))
+            frequency = 1 / np.arange(1, p["categories"] + 1)
+            cut_points = np.cumsum(frequency / frequency.sum())[:-1]
+            self._columns[key] = (kinds, loading, centers, cut_points)
+        return self._columns[key]
+
+    def sample(self, row_ids, feature_nums, label_flag, rng, table_key=0):
+        p = self.params
+        n = len(row_ids)
+        kinds, loading, centers, cut_points = self._column_params(feature_nums, table_key)
+        latent = id_normal(row_ids, p["latent_dim"], _LATENT_KEY, p["profile_seed"])
+        component = (id_uniform(row_ids, 1, _COMPONENT_KEY, p["profile_seed"])[:, 0] * p["components"]).astype(int)
+        values = latent @ loading + centers[component] + p["noise"] * rng.standard_normal((n, feature_nums))
+        skewed = kinds == 1
+        if skewed.any():
+            values[:, skewed] = np.exp(values[:, skewed] / 2)
+        categorical = kinds == 2
+        if categorical.any():
+            # normal cdf of standardized values keeps latent correlation while drawing zipf-like levels
+            scale = np.sqrt((loading[:, categorical] ** 2).sum(axis=0) + p["noise"] ** 2 + 1)
+            u = _normal_cdf(values[:, categorical] / scale)
+            values[:, categorical] = np.searchsorted(cut_points, u)
+        labels = None
+        if label_flag:
+            logits = p["label_signal"] * (latent @ self._label_weight) + self._label_bias
+            labels = (rng.random(n) < _sigmoid(logits)).astype(np.int64)
+        return labels, np.rint(values * 10000).astype(np.int64)
+
+
+@register_profile("gaussian_mixture")
+class GaussianMixtureProfile(LatentProfile):
+    pass
+
+
+@register_profile("skewed")
+class SkewedProfile(LatentProfile):
+    defaults = dict(LatentProfile.defaults, gaussian_ratio=0.0, skewed_ratio=0.7, positive_rate=0.2)
+
+
+@register_profile("mixed")
+class MixedProfile(LatentProfile):
+    defaults = dict(LatentProfile.defaults, gaussian_ratio=0.6, skewed_ratio=0.25, positive_rate=0.3)
@@ -1,11 +1,19 @@
+import functools
 import hashlib
+import json
+import math
 import os
 import random
+import shutil
 import sys
+import tempfile
 import threading
 import time
 import uuid
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
+import click
 import numpy as np
 import pandas as pd
 from fate_test._config import Config
@@ -14,6 +22,22 @@ from ruamel import yaml
 
 sys.setrecursionlimit(1000000)
 
+GENERATE_ENGINES = ["pandas", "vectorized"]
+# default number of cells sampled and written at once, bounds memory of each batch
+DEFAULT_BATCH_CELLS = 1 << 20
+# buffer size of file handle each data file is written through
+WRITE_BUFFER_SIZE = 16 << 20
+_SIZE_UNITS = {"B": 1, "KB": 1 << 10, "MB": 1 << 20, "GB": 1 << 30}
+# max number of csv cells of each shard, shards are checkpoints of resumable generation;
+# in seeded generation shards are of this fixed size so that they do not depend on workers
+SHARD_CELLS = 1 << 26
+# sidecar file next to each data file, recording parameters and completed shards
+MANIFEST_SUFFIX = ".manifest.json"
+MANIFEST_VERSION = 1
+TAG_START = 2019120799
+# tag_value values are rounded to 4 decimals and clipped to [-TAG_VALUE_BOUND, TAG_VALUE_BOUND]
+TAG_VALUE_BOUND = 100000
+
 
 class data_progress:
     def __init__(self, down_load, time_start):
@@ -65,96 +89,1180 @@ def id_encryption(encryption_type, start_num, end_num):
         return [str(value) for value in range(start_num, end_num)]
 
 
-def get_big_data(guest_data_size, host_data_size, guest_feature_num, host_feature_num, include_path, host_data_type,
-                 conf: Config, encryption_type, match_rate, sparsity, force, split_host, output_path):
-    global big_data_dir
+_HASH_FUNCS = {'md5': hashlib.md5, 'sha256': hashlib.sha256}
+# min number of ids hashed by each task of hashing process pool
+MIN_HASH_CHUNK = 1 << 14
+# default max megabytes of hashed id blocks kept by id hash cache
+DEFAULT_ID_CACHE_SIZE = 2048
+
+
+def _hash_id_range(encryption_type, start_num, end_num):
+    # hashlib has no batch api, ids are hashed one by one and spread over processes by `bulk_id_encryption`
+    hash_func = _HASH_FUNCS[encryption_type]
+    digests = b"".join([hash_func(str(value).encode()).digest() for value in range(start_num, end_num)])
+    # hex encode all digests at once, same text as `hexdigest`
+    return np.frombuffer(digests.hex().encode(), dtype=f"S{hash_func().digest_size * 2}")
+
+
+def bulk_id_encryption(encryption_type, start_num, end_num, workers=1, chunk_size=1 << 18, executor=None):
+    """
+    hash ids of range [start_num, end_num) in chunks, chunks are spread over a process pool if workers > 1,
+    `executor` is used as the pool if given, so that one pool serves all batches of a data file
+    Returns
+    -------
+    numpy bytes array of hex digests, or of plain ids if encryption_type is None
+    """
+    if encryption_type not in _HASH_FUNCS:
+        return np.arange(start_num, end_num, dtype=np.int64).astype("S")
+    data_num = end_num - start_num
+    chunk_size = max(MIN_HASH_CHUNK, min(chunk_size, -(-data_num // max(1, workers or 1))))
+    if workers is None or workers <= 1 or data_num <= chunk_size:
+        return _hash_id_range(encryption_type, start_num, end_num)
+    chunks = [(encryption_type, chunk_start, min(chunk_start + chunk_size, end_num))
+              for chunk_start in range(start_num, end_num, chunk_size)]
+    if executor is not None:
+        return np.concatenate(list(executor.map(_hash_id_range, *zip(*chunks))))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return np.concatenate(list(executor.map(_hash_id_range, *zip(*chunks))))
 
-    def list_tag_value(feature_nums, head):
-        # data = ''
-        # for f in range(feature_nums):
-        #     data += head[f] + ':' + str(round(np.random.randn(), 4)) + ";"
-        # return data[:-1]
-        return ";".join([head[k] + ':' + str(round(v, 4)) for k, v in enumerate(np.random.randn(feature_nums))])
-
-    def list_tag(feature_nums, data_list):
-        data = ''
-        for f in range(feature_nums):
-            data += random.choice(data_list) + ";"
-        return data[:-1]
-
-    def _generate_tag_value_data(data_path, start_num, end_num, feature_nums, progress):
-        data_num = end_num - start_num
-        section_data_size = round(data_num / 100)
-        iteration = round(data_num / section_data_size)
-        head = ['x' + str(i) for i in range(feature_nums)]
-        for batch in range(iteration + 1):
-            progress.set_time_percent(batch)
-            output_data = pd.DataFrame(columns=["id"])
-            if section_data_size * (batch + 1) <= data_num:
-                output_data["id"] = id_encryption(encryption_type, section_data_size * batch + start_num,
-                                                  section_data_size * (batch + 1) + start_num)
-                slicing_data_size = section_data_size
-            elif section_data_size * batch < data_num:
-                output_data['id'] = id_encryption(encryption_type, section_data_size * batch + start_num, end_num)
-                slicing_data_size = data_num - section_data_size * batch
+
+class IdHashCache(object):
+    """
+    memory-mapped cache of hashed ids, stored as aligned blocks of `block_size` ids in `cache_dir`,
+    so that repeated generation over the same id space reuses hashes computed before;
+    blocks are touched when read, least recently used blocks beyond `max_size` megabytes are removed by `warm`
+    """
+
+    def __init__(self, cache_dir, block_size=1 << 18, max_size=DEFAULT_ID_CACHE_SIZE):
+        self.cache_dir = cache_dir
+        self.block_size = block_size
+        self.max_size = max_size
+        self._blocks = {}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _block_path(self, encryption_type, block_start):
+        return os.path.join(self.cache_dir,
+                            f"{encryption_type}_{block_start}_{block_start + self.block_size}.npy")
+
+    def _block_starts(self, start_num, end_num):
+        first = start_num // self.block_size * self.block_size
+        return range(first, end_num, self.block_size)
+
+    @staticmethod
+    def _touch(block_path):
+        try:
+            os.utime(block_path)
+        except FileNotFoundError:
+            pass
+
+    def warm(self, encryption_type, start_num, end_num, workers=1):
+        """
+        compute and store missing blocks covering [start_num, end_num), then evict blocks beyond `max_size`
+        """
+        block_starts = self._block_starts(start_num, end_num)
+        missing = []
+        for block_start in block_starts:
+            block_path = self._block_path(encryption_type, block_start)
+            if os.path.exists(block_path):
+                self._touch(block_path)
             else:
+                missing.append(block_start)
+        if workers is None or workers <= 1:
+            for block_start in missing:
+                self._save(encryption_type, block_start,
+                           _hash_id_range(encryption_type, block_start, block_start + self.block_size))
+        elif missing:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                hashed = executor.map(_hash_id_range, [encryption_type] * len(missing), missing,
+                                      [block_start + self.block_size for block_start in missing])
+                for block_start, block in zip(missing, hashed):
+                    self._save(encryption_type, block_start, block)
+        self.evict(keep={self._block_path(encryption_type, block_start) for block_start in block_starts})
+
+    def evict(self, keep=()):
+        """
+        remove least recently used blocks while cache holds more than `max_size` megabytes, blocks in `keep` stay
+        """
+        if self.max_size is None:
+            return 0
+        blocks = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".npy"):
+                continue
+            block_path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(block_path)
+            except FileNotFoundError:
+                continue
+            blocks.append((stat.st_mtime, stat.st_size, block_path))
+        total = sum(size for _, size, _ in blocks)
+        evicted = 0
+        for _, size, block_path in sorted(blocks):
+            if total <= self.max_size << 20:
                 break
-            feature = [list_tag_value(feature_nums, head) for i in range(slicing_data_size)]
-            output_data['feature'] = feature
-            output_data.to_csv(data_path, mode='a+', index=False, header=False)
+            if block_path in keep:
+                continue
+            # generators reading the block keep their memory map, later reads compute it again
+            remove_file(block_path)
+            total -= size
+            evicted += 1
+        if evicted:
+            LOGGER.debug(f"evicted {evicted} blocks from id hash cache {self.cache_dir}")
+        return evicted
+
+    def _save(self, encryption_type, block_start, block):
+        block_path = self._block_path(encryption_type, block_start)
+        # write to a temp file first, concurrent generators may read the same block
+        tmp_path = f"{block_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, block)
+        os.replace(tmp_path, block_path)
+
+    def _load(self, encryption_type, block_start):
+        key = (encryption_type, block_start)
+        if key not in self._blocks:
+            block_path = self._block_path(encryption_type, block_start)
+            try:
+                block = np.load(block_path, mmap_mode="r")
+                self._touch(block_path)
+            except FileNotFoundError:
+                block = _hash_id_range(encryption_type, block_start, block_start + self.block_size)
+                self._save(encryption_type, block_start, block)
+            if len(self._blocks) >= 8:
+                self._blocks.clear()
+            self._blocks[key] = block
+        return self._blocks[key]
+
+    def get(self, encryption_type, start_num, end_num):
+        if encryption_type not in _HASH_FUNCS:
+            return bulk_id_encryption(encryption_type, start_num, end_num)
+        parts = []
+        for block_start in self._block_starts(start_num, end_num):
+            block = self._load(encryption_type, block_start)
+            parts.append(block[max(start_num, block_start) - block_start:
+                               min(end_num, block_start + self.block_size) - block_start])
+        if not parts:
+            return np.empty(0, dtype=f"S{_HASH_FUNCS[encryption_type]().digest_size * 2}")
+        return np.concatenate(parts) if len(parts) > 1 else np.array(parts[0])
+
+
+def list_tag_value(feature_nums, head):
+    # data = ''
+    # for f in range(feature_nums):
+    #     data += head[f] + ':' + str(round(np.random.randn(), 4)) + ";"
+    # return data[:-1]
+    return ";".join([head[k] + ':' + str(round(v, 4)) for k, v in enumerate(np.random.randn(feature_nums))])
+
+
+def list_tag(feature_nums, data_list):
+    data = ''
+    for f in range(feature_nums):
+        data += random.choice(data_list) + ";"
+    return data[:-1]
+
+
+def parse_batch_size(batch_size):
+    """
+    parse batch size given in rows, e.g. 10000, or in bytes with unit, e.g. "64MB"
+    Returns
+    -------
+    (rows, size), at most one of them is not None
+    """
+    if batch_size is None:
+        return None, None
+    if isinstance(batch_size, int) or str(batch_size).strip().isdigit():
+        rows = int(batch_size)
+        if rows <= 0:
+            raise ValueError(f"batch size should be positive, got {batch_size}")
+        return rows, None
+    text = str(batch_size).strip().upper()
+    for unit in sorted(_SIZE_UNITS, key=len, reverse=True):
+        if text.endswith(unit) and text[:-len(unit)].strip().replace(".", "", 1).isdigit():
+            size = int(float(text[:-len(unit)]) * _SIZE_UNITS[unit])
+            if size <= 0:
+                raise ValueError(f"batch size should be positive, got {batch_size}")
+            return None, size
+    raise ValueError(f"batch size should be rows like 10000 or bytes like 64MB, got {batch_size}")
+
+
+def _row_bytes(data_type, feature_nums, id_width):
+    # approximate csv bytes of one row, values like "-0.1234" take 7 bytes
+    if data_type == 'tag':
+        return id_width + 1 + feature_nums * 11
+    elif data_type == 'tag_value':
+        return id_width + 1 + feature_nums * (len(str(feature_nums)) + 10)
+    return id_width + 2 + feature_nums * 8
+
+
+def _default_batch_rows(feature_nums):
+    return max(1, DEFAULT_BATCH_CELLS // max(1, feature_nums))
+
+
+def _batch_rows(data_type, feature_nums, id_width, batch_size=None):
+    """
+    rows of each batch, from `batch_size` in rows or bytes, default to `DEFAULT_BATCH_CELLS` cells
+    """
+    rows, size = parse_batch_size(batch_size)
+    if rows is not None:
+        return rows
+    if size is not None:
+        return max(1, size // _row_bytes(data_type, feature_nums, id_width))
+    return _default_batch_rows(feature_nums)
+
+
+def _batch_ranges(start_num, end_num, batch_rows):
+    for batch_start in range(start_num, end_num, batch_rows):
+        yield batch_start, min(batch_start + batch_rows, end_num)
+
+
+def _generate_tag_value_data(data_path, start_num, end_num, feature_nums, encryption_type, progress,
+                             batch_size=None):
+    data_num = end_num - start_num
+    batch_rows = _batch_rows('tag_value', feature_nums, _id_width(encryption_type, end_num), batch_size)
+    head = ['x' + str(i) for i in range(feature_nums)]
+    with open(data_path, "w", buffering=WRITE_BUFFER_SIZE, newline="") as f:
+        for batch_start, batch_end in _batch_ranges(start_num, end_num, batch_rows):
+            progress.set_time_percent((batch_start - start_num) / data_num * 100)
+            output_data = pd.DataFrame({
+                "id": id_encryption(encryption_type, batch_start, batch_end),
+                "feature": [list_tag_value(feature_nums, head) for _ in range(batch_end - batch_start)]})
+            output_data.to_csv(f, index=False, header=False)
+
+
+def _generate_dens_data(data_path, start_num, end_num, feature_nums, label_flag, encryption_type, progress,
+                        batch_size=None):
+    if label_flag:
+        head_1 = ['id', 'y']
+    else:
+        head_1 = ['id']
+    data_num = end_num - start_num
+    head_2 = ['x' + str(i) for i in range(feature_nums)]
+    batch_rows = min(_batch_rows('dense', feature_nums, _id_width(encryption_type, end_num), batch_size),
+                     max(1, data_num))
+    # features of every batch are written into the same buffer
+    feature = np.empty((batch_rows, feature_nums))
+    with open(data_path, "w", buffering=WRITE_BUFFER_SIZE, newline="") as f:
+        f.write(",".join(head_1 + head_2) + "\n")
+        for batch_start, batch_end in _batch_ranges(start_num, end_num, batch_rows):
+            progress.set_time_percent((batch_start - start_num) / data_num * 100)
+            slicing_data_size = batch_end - batch_start
+            ids = id_encryption(encryption_type, batch_start, batch_end)
+            if label_flag:
+                labels = [round(np.random.random()) for x in range(slicing_data_size)]
+            batch_feature = feature[:slicing_data_size]
+            np.divide(np.random.randint(-10000, 10000, size=[slicing_data_size, feature_nums]), 10000,
+                      out=batch_feature)
+            output_data = pd.DataFrame(batch_feature, columns=head_2, copy=False)
+            output_data.insert(0, "id", ids)
+            if label_flag:
+                output_data.insert(1, "y", labels)
+            output_data.to_csv(f, index=False, header=False)
+
+
+def _generate_tag_data(data_path, start_num, end_num, feature_nums, sparsity, encryption_type, progress,
+                       batch_size=None):
+    data_num = end_num - start_num
+    batch_rows = _batch_rows('tag', feature_nums, _id_width(encryption_type, end_num), batch_size)
+    valid_set = [x for x in range(TAG_START, TAG_START + round(feature_nums / sparsity))]
+    data = list(map(str, valid_set))
+    with open(data_path, "w", buffering=WRITE_BUFFER_SIZE, newline="") as f:
+        for batch_start, batch_end in _batch_ranges(start_num, end_num, batch_rows):
+            progress.set_time_percent((batch_start - start_num) / data_num * 100)
+            output_data = pd.DataFrame({
+                "id": id_encryption(encryption_type, batch_start, batch_end),
+                "feature": [list_tag(feature_nums, data_list=data) for _ in range(batch_end - batch_start)]})
+            output_data.to_csv(f, index=False, header=False)
+
+
+def _token_table(tokens):
+    """
+    pack tokens into a zero padded uint8 table, one row per token, with one spare column for the separator
+    Returns
+    -------
+    (table, lengths)
+    """
+    tokens = np.asarray(tokens)
+    if tokens.dtype.kind != "S":
+        tokens = tokens.astype("S")
+    lengths = np.char.str_len(tokens).astype(np.int32)
+    width = tokens.dtype.itemsize + 1
+    table = tokens.astype(f"S{width}").view(np.uint8).reshape(len(tokens), width)
+    return table, lengths
+
+
+def _concat_token_tables(*tables):
+    width = max(table.shape[1] for table, _ in tables)
+    padded = [np.pad(table, ((0, 0), (0, width - table.shape[1]))) for table, _ in tables]
+    return np.concatenate(padded), np.concatenate([lengths for _, lengths in tables])
+
+
+def _join_tokens(codes, table, lengths, seps):
+    """
+    assemble csv bytes from a grid of tokens without any per-cell python work
+    Parameters
+    ----------
+    codes: int array of shape (rows, cols), row index in `table` of every cell
+    table: uint8 token table built by `_token_table`
+    lengths: byte length of every token in `table`
+    seps: list of bytes with len(seps) == cols, written after each cell of a column, may be empty
+
+    Returns
+    -------
+    bytes
+    """
+    rows, cols = codes.shape
+    if rows == 0:
+        return b""
+    sep_len = np.array([len(sep) for sep in seps], dtype=np.int32)
+    flat = codes.ravel()
+    cell_len = lengths[flat] + np.tile(sep_len, rows)
+    ends = np.cumsum(cell_len)
+    starts = ends - cell_len
+    cell = np.repeat(np.arange(flat.size, dtype=np.int32 if flat.size < 2 ** 31 else np.int64), cell_len)
+    pos = np.arange(ends[-1], dtype=ends.dtype) - starts[cell]
+    out = table[flat[cell], pos]
+    with_sep = np.tile(sep_len > 0, rows)
+    out[ends[with_sep] - 1] = np.tile(np.frombuffer(b"".join(seps), dtype=np.uint8), rows)
+    return out.tobytes()
+
+
+def _join_token_cells(codes, seps, table, lengths, sep_tokens):
+    """
+    like `_join_tokens` but for rows of different cell numbers
+    Parameters
+    ----------
+    codes: int array, row index in `table` of every cell, cells of all rows flattened in order
+    seps: int array of the same shape as codes, index in `sep_tokens` of separator written after each cell
+    sep_tokens: list of bytes, each of length 0 or 1
+
+    Returns
+    -------
+    bytes
+    """
+    if codes.size == 0:
+        return b""
+    sep_len = np.array([len(sep) for sep in sep_tokens], dtype=np.int32)
+    sep_byte = np.array([sep[0] if sep else 0 for sep in sep_tokens], dtype=np.uint8)
+    cell_len = lengths[codes] + sep_len[seps]
+    ends = np.cumsum(cell_len)
+    starts = ends - cell_len
+    cell = np.repeat(np.arange(codes.size, dtype=np.int32 if codes.size < 2 ** 31 else np.int64), cell_len)
+    pos = np.arange(ends[-1], dtype=ends.dtype) - starts[cell]
+    out = table[codes[cell], pos]
+    with_sep = sep_len[seps] > 0
+    out[ends[with_sep] - 1] = sep_byte[seps[with_sep]]
+    return out.tobytes()
+
+
+def _id_tokens(encryption_type, start_num, end_num, id_cache=None, workers=1, executor=None):
+    if id_cache is not None:
+        return id_cache.get(encryption_type, start_num, end_num)
+    return bulk_id_encryption(encryption_type, start_num, end_num, workers=workers, executor=executor)
+
+
+def _id_hasher(encryption_type, workers, id_cache=None):
+    """
+    process pool hashing ids of all batches of a data file, None if ids are not hashed in parallel
+    """
+    if workers is None or workers <= 1 or id_cache is not None or encryption_type not in _HASH_FUNCS:
+        return None
+    return ProcessPoolExecutor(max_workers=workers)
+
+
+@functools.lru_cache(maxsize=None)
+def _dense_value_table():
+    # same text as pandas writes for randint(-10000, 10000) / 10000
+    return _token_table([repr(k / 10000) for k in range(-10000, 10000)])
+
+
+@functools.lru_cache(maxsize=None)
+def _tag_value_table():
+    return _token_table([repr(k / 10000) for k in range(-TAG_VALUE_BOUND, TAG_VALUE_BOUND + 1)])
+
+
+@functools.lru_cache(maxsize=None)
+def _label_table():
+    return _token_table(["0", "1"])
+
+
+def _sample_batch(data_type, n, feature_nums, label_flag, sparsity, rng, profile=None, row_start=0, table_key=0):
+    """
+    sample one batch as integer codes, dense rows of ids from `row_start` are sampled by `profile` if given
+    Returns
+    -------
+    (labels, x), labels is None if not label_flag; x of shape (n, feature_nums) holds
+    value * 10000 for dense and tag_value data, tag index for tag data
+    """
+    if data_type == 'dense' and profile is not None:
+        labels, x = profile.sample(np.arange(row_start, row_start + n), feature_nums, label_flag, rng, table_key)
+        return labels, np.clip(x, -TAG_VALUE_BOUND, TAG_VALUE_BOUND)
+    labels = rng.integers(0, 2, size=n) if label_flag else None
+    if data_type == 'dense':
+        x = rng.integers(-10000, 10000, size=(n, feature_nums))
+    elif data_type == 'tag':
+        x = rng.integers(0, round(feature_nums / sparsity), size=(n, feature_nums))
+    elif data_type == 'tag_value':
+        x = np.clip(np.rint(rng.standard_normal((n, feature_nums)) * 10000).astype(np.int64),
+                    -TAG_VALUE_BOUND, TAG_VALUE_BOUND)
+    else:
+        raise ValueError(f"unknown data type: {data_type}")
+    return labels, x
+
+
+def _format_dense_batch(ids, labels, x):
+    n = len(ids)
+    id_table = _token_table(ids)
+    if x.size and (x.min() < -10000 or x.max() >= 10000):
+        # values out of [-1, 1) sampled by distribution profiles
+        value_table, value_bound = _tag_value_table(), TAG_VALUE_BOUND
+    else:
+        value_table, value_bound = _dense_value_table(), 10000
+    tables = [id_table, value_table]
+    value_offset = len(id_table[1])
+    columns = [np.arange(n)[:, None]]
+    if labels is not None:
+        tables.append(_label_table())
+        columns.append(labels[:, None] + value_offset + len(value_table[1]))
+    columns.append(x + value_bound + value_offset)
+    table, lengths = _concat_token_tables(*tables)
+    codes = np.concatenate(columns, axis=1)
+    seps = [b","] * (codes.shape[1] - 1) + [b"\n"]
+    return _join_tokens(codes, table, lengths, seps)
+
+
+def _format_tag_batch(ids, x, sparsity):
+    n, feature_nums = x.shape
+    id_table = _token_table(ids)
+    table, lengths = _concat_token_tables(id_table, _tag_table(round(feature_nums / sparsity)))
+    codes = np.concatenate([np.arange(n)[:, None], x + n], axis=1)
+    seps = [b","] + [b";"] * (feature_nums - 1) + [b"\n"]
+    return _join_tokens(codes, table, lengths, seps)
+
+
+def _format_tag_value_batch(ids, x):
+    n, feature_nums = x.shape
+    id_table = _token_table(ids)
+    table, lengths = _concat_token_tables(id_table, _feature_head_table(feature_nums), _tag_value_table())
+    codes = np.empty((n, 2 * feature_nums + 1), dtype=np.int64)
+    codes[:, 0] = np.arange(n)
+    codes[:, 1::2] = np.arange(feature_nums) + n
+    codes[:, 2::2] = x + TAG_VALUE_BOUND + n + feature_nums
+    seps = [b","] + [b"", b";"] * (feature_nums - 1) + [b"", b"\n"]
+    return _join_tokens(codes, table, lengths, seps)
+
+
+def _format_csv_batch(data_type, ids, labels, x, sparsity):
+    if data_type == 'dense':
+        return _format_dense_batch(ids, labels, x)
+    elif data_type == 'tag':
+        return _format_tag_batch(ids, x, sparsity)
+    elif data_type == 'tag_value':
+        return _format_tag_value_batch(ids, x)
+    raise ValueError(f"unknown data type: {data_type}")
+
+
+def _sample_distinct_indices(n, k, num_cols, rng):
+    """
+    sample k distinct column indices out of num_cols for each of n rows, sorted in each row;
+    duplicates are redrawn until none left, which keeps every k-subset equally likely
+    """
+    if k > num_cols // 2:
+        # sample excluded columns instead, so that few draws collide
+        excluded = _sample_distinct_indices(n, num_cols - k, num_cols, rng)
+        mask = np.ones((n, num_cols), dtype=bool)
+        mask[np.arange(n)[:, None], excluded] = False
+        return np.nonzero(mask)[1].reshape(n, k)
+    indices = rng.integers(0, num_cols, size=(n, k))
+    while True:
+        indices.sort(axis=1)
+        duplicated = np.zeros(indices.shape, dtype=bool)
+        duplicated[:, 1:] = indices[:, 1:] == indices[:, :-1]
+        duplicated_num = np.count_nonzero(duplicated)
+        if duplicated_num == 0:
+            return indices
+        indices[duplicated] = rng.integers(0, num_cols, size=duplicated_num)
+
+
+def sparse_shape(data_type, feature_nums, sparsity):
+    """
+    column number and nonzero number of each row in sparse mode, nonzero / column equals to sparsity:
+    tag rows hold `feature_nums` distinct tags out of `feature_nums / sparsity`,
+    tag_value rows hold `feature_nums * sparsity` distinct features out of `feature_nums`
+    """
+    if not 0 < sparsity <= 1:
+        raise ValueError(f"sparsity should be in (0, 1], got {sparsity}")
+    if data_type == 'tag':
+        return round(feature_nums / sparsity), feature_nums
+    elif data_type == 'tag_value':
+        return feature_nums, min(feature_nums, max(1, round(feature_nums * sparsity)))
+    raise ValueError(f"sparse mode only supports tag and tag_value data, got {data_type}")
+
+
+def _sample_sparse_batch(data_type, n, num_cols, nnz, rng):
+    """
+    sample one batch of sparse rows in csr layout
+    Returns
+    -------
+    (indptr, indices, data), data is None for tag data, else value * 10000 of each nonzero
+    """
+    indices = _sample_distinct_indices(n, nnz, num_cols, rng).ravel()
+    indptr = np.arange(n + 1, dtype=np.int64) * nnz
+    data = None
+    if data_type == 'tag_value':
+        data = np.clip(np.rint(rng.standard_normal(indices.size) * 10000).astype(np.int64),
+                       -TAG_VALUE_BOUND, TAG_VALUE_BOUND)
+    return indptr, indices, data
+
+
+@functools.lru_cache(maxsize=4)
+def _tag_table(tag_num):
+    return _token_table(np.arange(TAG_START, TAG_START + tag_num, dtype=np.int64).astype("S"))
+
+
+@functools.lru_cache(maxsize=4)
+def _feature_head_table(feature_nums):
+    return _token_table([f"x{k}:" for k in range(feature_nums)])
+
+
+def _format_sparse_batch(data_type, ids, indptr, indices, data, num_cols):
+    n = len(ids)
+    # one id cell and then every nonzero of each row, in row order
+    cells = n + indices.size if data is None else n + 2 * indices.size
+    codes = np.empty(cells, dtype=np.int64)
+    seps = np.empty(cells, dtype=np.int64)
+    row_start = indptr[:-1] + np.arange(n) if data is None else 2 * indptr[:-1] + np.arange(n)
+    codes[row_start] = np.arange(n)
+    is_id = np.zeros(cells, dtype=bool)
+    is_id[row_start] = True
+    feature_cells = np.nonzero(~is_id)[0]
+    id_table = _token_table(ids)
+    if data is None:
+        table, lengths = _concat_token_tables(id_table, _tag_table(num_cols))
+        codes[feature_cells] = indices + n
+        # separators: 0 -> ",", 1 -> ";", 2 -> "\n"
+        seps[row_start] = 0
+        seps[feature_cells] = 1
+    else:
+        table, lengths = _concat_token_tables(id_table, _feature_head_table(num_cols), _tag_value_table())
+        codes[feature_cells[0::2]] = indices + n
+        codes[feature_cells[1::2]] = data + TAG_VALUE_BOUND + n + num_cols
+        seps[row_start] = 0
+        seps[feature_cells[0::2]] = 3
+        seps[feature_cells[1::2]] = 1
+    row_end = np.append(row_start[1:], cells) - 1
+    seps[row_end] = 2
+    return _join_token_cells(codes, seps, table, lengths, [b",", b";", b"\n", b""])
+
+
+def output_file_path(data_path, output_format):
+    """
+    path of data file written in `output_format`, extension of csv file name in suite is replaced
+    """
+    if output_format == 'csv':
+        return data_path
+    return f"{os.path.splitext(data_path)[0]}.{output_format}"
+
+
+class CsvBatchWriter(object):
+    def __init__(self, data_path, data_type, feature_nums, label_flag, sparsity, **kwargs):
+        self.data_type = data_type
+        self.sparsity = sparsity
+        self._f = open(data_path, "wb", buffering=WRITE_BUFFER_SIZE)
+        if data_type == 'dense':
+            head = ['id', 'y'] if label_flag else ['id']
+            head += ['x' + str(i) for i in range(feature_nums)]
+            self._f.write((",".join(head) + "\n").encode())
+
+    def write(self, ids, labels, x):
+        self._f.write(_format_csv_batch(self.data_type, ids, labels, x, self.sparsity))
+
+    def close(self):
+        self._f.close()
+
+
+def import_pyarrow():
+    """
+    pyarrow with its parquet module, which is an optional dependency for parquet and arrow output formats
+    """
+    try:
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401
+    except ImportError as e:
+        raise click.UsageError(f"output format parquet and arrow require pyarrow ({e}), "
+                               f"install it by `pip install fate_test[arrow]`")
+    return pyarrow
 
-    def _generate_dens_data(data_path, start_num, end_num, feature_nums, label_flag, progress):
+
+class ArrowBatchWriter(object):
+    """
+    write batches as parquet or arrow ipc file with zstd compression, one column per feature;
+    dense and tag_value features are stored as float32 values, tag features as int64 tags
+    """
+
+    def __init__(self, data_path, data_type, feature_nums, label_flag, sparsity, output_format='parquet',
+                 compression='zstd', **kwargs):
+        self._pa = pa = import_pyarrow()
+        self.data_type = data_type
+        fields = [pa.field('id', pa.string())]
         if label_flag:
-            head_1 = ['id', 'y']
+            fields.append(pa.field('y', pa.int8()))
+        feature_type = pa.int64() if data_type == 'tag' else pa.float32()
+        fields += [pa.field(f"x{i}", feature_type) for i in range(feature_nums)]
+        metadata = {"data_type": data_type, "feature_nums": str(feature_nums), "sparsity": str(sparsity)}
+        self.schema = pa.schema(fields, metadata=metadata)
+        if output_format == 'parquet':
+            self._writer = pa.parquet.ParquetWriter(data_path, self.schema, compression=compression)
         else:
-            head_1 = ['id']
-        data_num = end_num - start_num
-        head_2 = ['x' + str(i) for i in range(feature_nums)]
-        df_data_1 = pd.DataFrame(columns=head_1)
-        head_data = pd.DataFrame(columns=head_1 + head_2)
-        head_data.to_csv(data_path, mode='a+', index=False)
-        section_data_size = round(data_num / 100)
-        iteration = round(data_num / section_data_size)
-        for batch in range(iteration + 1):
-            progress.set_time_percent(batch)
-            if section_data_size * (batch + 1) <= data_num:
-                df_data_1["id"] = id_encryption(encryption_type, section_data_size * batch + start_num,
-                                                section_data_size * (batch + 1) + start_num)
-                slicing_data_size = section_data_size
-            elif section_data_size * batch < data_num:
-                df_data_1 = pd.DataFrame(columns=head_1)
-                df_data_1["id"] = id_encryption(encryption_type, section_data_size * batch + start_num, end_num)
-                slicing_data_size = data_num - section_data_size * batch
-            else:
+            self._sink = pa.OSFile(data_path, "wb")
+            self._writer = pa.ipc.new_file(self._sink, self.schema,
+                                           options=pa.ipc.IpcWriteOptions(compression=compression))
+
+    def write(self, ids, labels, x):
+        pa = self._pa
+        arrays = [pa.array(ids).cast(pa.string())]
+        if labels is not None:
+            arrays.append(pa.array(labels.astype(np.int8)))
+        if self.data_type == 'tag':
+            values = x.astype(np.int64) + TAG_START
+        else:
+            values = (x / 10000).astype(np.float32)
+        arrays += [pa.array(values[:, i]) for i in range(values.shape[1])]
+        self._writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self._writer.close()
+        if hasattr(self, "_sink"):
+            self._sink.close()
+
+
+class NpyBatchWriter(object):
+    """
+    write dense batches as one structured npy array with fields id, y(optional) and x(float32 features)
+    """
+
+    def __init__(self, data_path, data_type, feature_nums, label_flag, sparsity, data_num=None, id_width=None,
+                 **kwargs):
+        if data_type != 'dense':
+            raise ValueError(f"npy output only supports dense data, got {data_type}")
+        fields = [('id', f"S{id_width}")]
+        if label_flag:
+            fields.append(('y', np.int8))
+        fields.append(('x', np.float32, (feature_nums,)))
+        self._array = np.lib.format.open_memmap(data_path, mode="w+", dtype=np.dtype(fields), shape=(data_num,))
+        self._offset = 0
+
+    def write(self, ids, labels, x):
+        rows = self._array[self._offset: self._offset + len(ids)]
+        rows['id'] = ids
+        if labels is not None:
+            rows['y'] = labels
+        rows['x'] = x / 10000
+        self._offset += len(ids)
+
+    def close(self):
+        self._array.flush()
+        del self._array
+
+
+OUTPUT_FORMATS = {"csv": CsvBatchWriter, "parquet": ArrowBatchWriter, "arrow": ArrowBatchWriter,
+                  "npy": NpyBatchWriter}
+
+
+def _batch_writer(data_path, output_format, data_type, feature_nums, label_flag, sparsity, data_num, id_width):
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"unknown output format: {output_format}, choose from {list(OUTPUT_FORMATS)}")
+    return OUTPUT_FORMATS[output_format](data_path, data_type, feature_nums, label_flag, sparsity,
+                                         output_format=output_format, data_num=data_num, id_width=id_width)
+
+
+def _id_width(encryption_type, end_num):
+    if encryption_type in _HASH_FUNCS:
+        return _HASH_FUNCS[encryption_type]().digest_size * 2
+    return len(str(max(end_num - 1, 0)))
+
+
+def read_batches(data_path, output_format=None, batch_rows=None):
+    """
+    read back data written in a binary output format
+    Returns
+    -------
+    (meta, iterator of (ids, labels, x) batches), meta has keys data_type, feature_nums, label_flag, sparsity
+    """
+    if output_format is None:
+        output_format = os.path.splitext(data_path)[1].lstrip(".")
+    if output_format == 'npy':
+        array = np.load(data_path, mmap_mode="r")
+        feature_nums = array.dtype['x'].shape[0]
+        label_flag = 'y' in array.dtype.names
+        meta = dict(data_type='dense', feature_nums=feature_nums, label_flag=label_flag, sparsity=None)
+        batch_rows = batch_rows or _default_batch_rows(feature_nums)
+
+        def _npy_batches():
+            for start in range(0, len(array), batch_rows):
+                rows = array[start: start + batch_rows]
+                x = np.rint(rows['x'].astype(np.float64) * 10000).astype(np.int64)
+                yield np.array(rows['id']), rows['y'].astype(np.int64) if label_flag else None, x
+
+        return meta, _npy_batches()
+    elif output_format in ['parquet', 'arrow']:
+        pa = import_pyarrow()
+        if output_format == 'parquet':
+            parquet_file = pa.parquet.ParquetFile(data_path)
+            schema = parquet_file.schema_arrow
+        else:
+            reader = pa.ipc.open_file(pa.memory_map(data_path, "r"))
+            schema = reader.schema
+        metadata = {k.decode(): v.decode() for k, v in schema.metadata.items()}
+        data_type = metadata["data_type"]
+        feature_nums = int(metadata["feature_nums"])
+        label_flag = 'y' in schema.names
+        meta = dict(data_type=data_type, feature_nums=feature_nums, label_flag=label_flag,
+                    sparsity=float(metadata["sparsity"]))
+        if output_format == 'parquet':
+            record_batches = parquet_file.iter_batches(batch_size=batch_rows or _default_batch_rows(feature_nums))
+        else:
+            record_batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+
+        def _arrow_batches():
+            for record_batch in record_batches:
+                ids = np.asarray(record_batch.column('id').cast(pa.binary()).to_numpy(zero_copy_only=False),
+                                 dtype="S")
+                labels = record_batch.column('y').to_numpy().astype(np.int64) if label_flag else None
+                x = np.column_stack([record_batch.column(f"x{i}").to_numpy() for i in range(feature_nums)])
+                if data_type == 'tag':
+                    x = x - TAG_START
+                else:
+                    x = np.rint(x.astype(np.float64) * 10000).astype(np.int64)
+                yield ids, labels, x
+
+        return meta, _arrow_batches()
+    raise ValueError(f"cannot read batches from output format: {output_format}")
+
+
+def export_csv(data_path, csv_path, output_format=None):
+    """
+    convert data file of binary output format to FATE's csv layout
+    """
+    meta, batches = read_batches(data_path, output_format)
+    writer = CsvBatchWriter(csv_path, meta["data_type"], meta["feature_nums"], meta["label_flag"], meta["sparsity"])
+    try:
+        for ids, labels, x in batches:
+            writer.write(ids, labels, x)
+    finally:
+        writer.close()
+
+
+def _generate_vectorized_data(data_path, data_type, start_num, end_num, feature_nums, label_flag, sparsity,
+                              encryption_type, progress, id_cache_dir=None, rng=None, output_format='csv',
+                              batch_size=None, profile=None, table_key=0, workers=1):
+    """
+    vectorized counterpart of `_generate_dens_data`, `_generate_tag_data` and `_generate_tag_value_data`,
+    every batch is sampled as numpy arrays and written in bulk, ids are hashed by `workers` processes
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    data_num = end_num - start_num
+    id_width = _id_width(encryption_type, end_num)
+    batch_rows = _batch_rows(data_type, feature_nums, id_width, batch_size)
+    id_cache = IdHashCache(id_cache_dir) if id_cache_dir and encryption_type in _HASH_FUNCS else None
+    writer = _batch_writer(data_path, output_format, data_type, feature_nums, label_flag, sparsity, data_num,
+                           id_width)
+    hasher = _id_hasher(encryption_type, workers, id_cache)
+    try:
+        for batch_start, batch_end in _batch_ranges(start_num, end_num, batch_rows):
+            progress.set_time_percent((batch_start - start_num) / data_num * 100)
+            ids = _id_tokens(encryption_type, batch_start, batch_end, id_cache, workers, hasher)
+            labels, x = _sample_batch(data_type, batch_end - batch_start, feature_nums, label_flag, sparsity, rng,
+                                      profile, batch_start, table_key)
+            writer.write(ids, labels, x)
+    finally:
+        writer.close()
+        if hasher is not None:
+            hasher.shutdown()
+    progress.set_time_percent(100)
+
+
+def _generate_sparse_data(data_path, data_type, start_num, end_num, feature_nums, sparsity, encryption_type,
+                          progress, id_cache_dir=None, rng=None, batch_size=None, workers=1):
+    """
+    sparse counterpart of `_generate_tag_data` and `_generate_tag_value_data`,
+    every row holds exactly `sparsity` of all columns, sampled as csr arrays and written in bulk,
+    ids are hashed by `workers` processes
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    data_num = end_num - start_num
+    num_cols, nnz = sparse_shape(data_type, feature_nums, sparsity)
+    batch_rows = _batch_rows(data_type, nnz, _id_width(encryption_type, end_num), batch_size)
+    id_cache = IdHashCache(id_cache_dir) if id_cache_dir and encryption_type in _HASH_FUNCS else None
+    hasher = _id_hasher(encryption_type, workers, id_cache)
+    try:
+        with open(data_path, "wb", buffering=WRITE_BUFFER_SIZE) as f:
+            for batch_start, batch_end in _batch_ranges(start_num, end_num, batch_rows):
+                progress.set_time_percent((batch_start - start_num) / data_num * 100)
+                ids = _id_tokens(encryption_type, batch_start, batch_end, id_cache, workers, hasher)
+                indptr, indices, data = _sample_sparse_batch(data_type, batch_end - batch_start, num_cols, nnz,
+                                                             rng)
+                f.write(_format_sparse_batch(data_type, ids, indptr, indices, data, num_cols))
+    finally:
+        if hasher is not None:
+            hasher.shutdown()
+    progress.set_time_percent(100)
+
+
+def _shard_ranges(start_num, end_num, shard_num):
+    data_num = end_num - start_num
+    bounds = [start_num + data_num * i // shard_num for i in range(shard_num + 1)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _seeded_shard_ranges(start_num, end_num, feature_nums):
+    shard_rows = max(1, SHARD_CELLS // max(1, feature_nums))
+    return [(shard_start, min(shard_start + shard_rows, end_num))
+            for shard_start in range(start_num, end_num, shard_rows)]
+
+
+def _unseeded_shard_ranges(start_num, end_num, feature_nums, workers):
+    data_num = end_num - start_num
+    shard_rows = max(1, SHARD_CELLS // max(1, feature_nums))
+    # keep every shard no less than 100 rows, tiny shards cost more in scheduling than in generating
+    shard_num = max(1, math.ceil(data_num / shard_rows), min((workers or 1) * 4, data_num // 100))
+    return _shard_ranges(start_num, end_num, shard_num)
+
+
+def manifest_path(data_path):
+    return f"{data_path}{MANIFEST_SUFFIX}"
+
+
+def load_manifest(data_path):
+    """
+    manifest of `data_path`, None if missing or unreadable
+    """
+    path = manifest_path(data_path)
+    if not os.path.isfile(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        LOGGER.warning(f"ignore broken manifest {path}")
+        return None
+
+
+def _save_manifest(data_path, manifest):
+    path = manifest_path(data_path)
+    tmp_path = f"{path}.{uuid.uuid1().hex}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _file_checksum(path):
+    checksum = 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(WRITE_BUFFER_SIZE)
+            if not chunk:
                 break
-            if label_flag:
-                df_data_1["y"] = [round(np.random.random()) for x in range(slicing_data_size)]
-            feature = np.random.randint(-10000, 10000, size=[slicing_data_size, feature_nums]) / 10000
-            df_data_2 = pd.DataFrame(feature, columns=head_2)
-            output_data = pd.concat([df_data_1, df_data_2], axis=1)
-            output_data.to_csv(data_path, mode='a+', index=False, header=False)
-
-    def _generate_tag_data(data_path, start_num, end_num, feature_nums, sparsity, progress):
-        data_num = end_num - start_num
-        section_data_size = round(data_num / 100)
-        iteration = round(data_num / section_data_size)
-        valid_set = [x for x in range(2019120799, 2019120799 + round(feature_nums / sparsity))]
-        data = list(map(str, valid_set))
-        for batch in range(iteration + 1):
-            progress.set_time_percent(batch)
-            output_data = pd.DataFrame(columns=["id"])
-            if section_data_size * (batch + 1) <= data_num:
-                output_data["id"] = id_encryption(encryption_type, section_data_size * batch + start_num,
-                                                  section_data_size * (batch + 1) + start_num)
-                slicing_data_size = section_data_size
-            elif section_data_size * batch < data_num:
-                output_data["id"] = id_encryption(encryption_type, section_data_size * batch + start_num, end_num)
-                slicing_data_size = data_num - section_data_size * batch
+            checksum = zlib.crc32(chunk, checksum)
+    return f"{checksum:08x}"
+
+
+def _shard_info(shard_path, start_num, end_num):
+    return dict(rows=end_num - start_num, size=os.path.getsize(shard_path), checksum=_file_checksum(shard_path))
+
+
+def _shard_intact(shard_path, info):
+    return (os.path.isfile(shard_path) and os.path.getsize(shard_path) == info["size"]
+            and _file_checksum(shard_path) == info["checksum"])
+
+
+def generation_params(data_type, start_num, end_num, feature_nums, label_flag, sparsity, encryption_type,
+                      engine="pandas", seed=None, seed_key=0, output_format='csv', batch_size=None, sparse=False,
+                      profile=None, **extra):
+    """
+    parameters recorded in manifest, generation with the same parameters of a complete manifest is skipped
+    """
+    return dict(version=MANIFEST_VERSION, data_type=data_type, start_num=start_num, end_num=end_num,
+                feature_nums=feature_nums, label_flag=label_flag, sparsity=sparsity,
+                encryption_type=encryption_type, engine=engine, seed=seed, seed_key=seed_key,
+                output_format=output_format, batch_size=batch_size, sparse=sparse,
+                profile=profile.describe() if profile is not None and data_type == 'dense' else None, **extra)
+
+
+def generation_complete(data_path, params):
+    """
+    whether `data_path` is completely generated with `params` according to its manifest
+    """
+    manifest = load_manifest(data_path)
+    return (manifest is not None and manifest.get("complete") and manifest.get("params") == params
+            and os.path.isfile(data_path) and os.path.getsize(data_path) == manifest.get("size"))
+
+
+def remove_generated(data_path):
+    """
+    remove data file together with its manifest and shard files left by an unfinished generation
+    """
+    manifest = load_manifest(data_path)
+    shard_num = len(manifest.get("shards", [])) if manifest else 0
+    for path in [data_path, manifest_path(data_path)] + [f"{data_path}.part{i}" for i in range(shard_num)]:
+        if os.path.isfile(path):
+            remove_file(path)
+
+
+def shard_seed_sequence(seed, seed_key, shard_index):
+    """
+    random stream of one shard, same as `SeedSequence(seed).spawn(...)[seed_key].spawn(...)[shard_index]`,
+    so any shard can be regenerated alone
+    """
+    return np.random.SeedSequence(seed, spawn_key=(seed_key, shard_index))
+
+
+def _generate_shard(shard_path, data_type, start_num, end_num, feature_nums, label_flag, sparsity, encryption_type,
+                    engine, id_cache_dir=None, seed_seq=None, output_format='csv', batch_size=None,
+                    sparse=False, profile=None, table_key=0, workers=1):
+    if seed_seq is not None:
+        # pandas engine samples from global random state
+        np.random.seed(seed_seq.generate_state(4))
+        random.seed(int(seed_seq.generate_state(1)[0]))
+        rng = np.random.default_rng(seed_seq)
+    else:
+        # forked workers share the random state of parent, reseed before sampling
+        np.random.seed()
+        random.seed()
+        rng = None
+    if os.path.exists(shard_path):
+        remove_file(shard_path)
+    progress = data_progress(shard_path, time.time())
+    if sparse and data_type != 'dense':
+        _generate_sparse_data(shard_path, data_type, start_num, end_num, feature_nums, sparsity, encryption_type,
+                              progress, id_cache_dir, rng=rng, batch_size=batch_size, workers=workers)
+    elif engine == "vectorized":
+        _generate_vectorized_data(shard_path, data_type, start_num, end_num, feature_nums, label_flag, sparsity,
+                                  encryption_type, progress, id_cache_dir, rng=rng, output_format=output_format,
+                                  batch_size=batch_size, profile=profile, table_key=table_key, workers=workers)
+    else:
+        generate_data(shard_path, data_type, start_num, end_num, feature_nums, label_flag, sparsity,
+                      encryption_type, progress, engine=engine, batch_size=batch_size)
+    return _shard_info(shard_path, start_num, end_num)
+
+
+def _stitch_shard(f, shard_path, data_type, shard_index):
+    """
+    append csv shard to open output file `f`, header of dense data is kept from the first shard only
+    """
+    with open(shard_path, "rb") as shard:
+        if data_type == 'dense' and shard_index > 0:
+            shard.readline()
+        shutil.copyfileobj(shard, f, length=WRITE_BUFFER_SIZE)
+
+
+def _generate_sharded_data(data_path, data_type, start_num, end_num, feature_nums, label_flag, sparsity,
+                           encryption_type, progress, engine, workers, id_cache_dir=None, seed=None, seed_key=0,
+                           output_format='csv', batch_size=None, sparse=False, params=None, profile=None):
+    """
+    split id range [start_num, end_num) into shards, generate them in a process pool,
+    and append each shard to `data_path` once all shards before it are appended, so that ids and row order
+    equal to single process output and a shard file is removed as soon as it is stitched;
+    with seed given, shards have fixed size and each shard samples from its own seeded stream,
+    output is then byte-identical whatever the number of workers;
+    with `params` given, progress is checkpointed in manifest: csv output is resumed from the byte offset
+    of shards already stitched, and shards completed but not yet stitched are kept for the next run
+    """
+    manifest = load_manifest(data_path) if params is not None else None
+    if manifest is not None and manifest.get("params") == params and "shards" in manifest:
+        shards = [tuple(shard) for shard in manifest["shards"]]
+        stitched, offset = manifest.get("stitched", 0), manifest.get("offset", 0)
+        if output_format != 'csv' or not os.path.isfile(data_path) or os.path.getsize(data_path) < offset:
+            # only csv can be appended to, other outputs are stitched again from scratch
+            stitched, offset = 0, 0
+        completed = {int(i): info for i, info in manifest["completed"].items()
+                     if int(i) >= stitched and _shard_intact(f"{data_path}.part{i}", info)}
+        if stitched or completed:
+            echo.echo(f"resume {data_path} from {stitched + len(completed)}/{len(shards)} completed shards")
+    else:
+        if manifest is not None:
+            remove_generated(data_path)
+        if seed is not None:
+            shards = _seeded_shard_ranges(start_num, end_num, feature_nums)
+        else:
+            shards = _unseeded_shard_ranges(start_num, end_num, feature_nums, workers)
+        stitched, offset, completed = 0, 0, {}
+    if stitched:
+        with open(data_path, "r+b") as f:
+            f.truncate(offset)
+    elif os.path.exists(data_path):
+        remove_file(data_path)
+    if params is not None:
+        manifest = dict(params=params, shards=shards, completed=completed, stitched=stitched, offset=offset,
+                        complete=False)
+        _save_manifest(data_path, manifest)
+    if seed is not None:
+        seed_seqs = [shard_seed_sequence(seed, seed_key, i) for i in range(len(shards))]
+    else:
+        seed_seqs = [None] * len(shards)
+    shard_num = len(shards)
+    shard_paths = [f"{data_path}.part{i}" for i in range(shard_num)]
+    pending = [i for i in range(stitched, shard_num) if i not in completed]
+    writer = None
+    if output_format == 'csv':
+        out = open(data_path, "ab" if stitched else "wb", buffering=WRITE_BUFFER_SIZE)
+    else:
+        out = None
+        writer = _batch_writer(data_path, output_format, data_type, feature_nums, label_flag, sparsity,
+                               end_num - start_num, _id_width(encryption_type, end_num))
+    next_shard = [stitched]
+
+    def _stitch_ready():
+        while next_shard[0] in completed:
+            i = next_shard[0]
+            if writer is None:
+                _stitch_shard(out, shard_paths[i], data_type, i)
+                out.flush()
             else:
-                break
-            feature = [list_tag(feature_nums, data_list=data) for i in range(slicing_data_size)]
-            output_data['feature'] = feature
-            output_data.to_csv(data_path, mode='a+', index=False, header=False)
+                for ids, labels, x in read_batches(shard_paths[i], output_format)[1]:
+                    writer.write(ids, labels, x)
+            remove_file(shard_paths[i])
+            del completed[i]
+            next_shard[0] = i + 1
+            if params is not None:
+                manifest.update(stitched=i + 1, offset=out.tell() if writer is None else 0)
+                _save_manifest(data_path, manifest)
+
+    def _on_shard_done(i, info):
+        completed[i] = info
+        progress.set_time_percent(min(next_shard[0] + len(completed), shard_num) / shard_num * 100)
+        if params is not None:
+            _save_manifest(data_path, manifest)
+        _stitch_ready()
+
+    done = False
+    try:
+        _stitch_ready()
+        if workers is None or workers <= 1 or len(pending) <= 1:
+            # a single shard left is generated here, its ids hashed by all workers
+            for i in pending:
+                shard_start, shard_end = shards[i]
+                _on_shard_done(i, _generate_shard(shard_paths[i], data_type, shard_start, shard_end, feature_nums,
+                                                  label_flag, sparsity, encryption_type, engine, id_cache_dir,
+                                                  seed_seqs[i], output_format, batch_size, sparse, profile,
+                                                  seed_key, workers or 1))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(_generate_shard, shard_paths[i], data_type, shards[i][0], shards[i][1],
+                                           feature_nums, label_flag, sparsity, encryption_type, engine,
+                                           id_cache_dir, seed_seqs[i], output_format, batch_size, sparse, profile,
+                                           seed_key): i
+                           for i in pending}
+                for future in as_completed(futures):
+                    _on_shard_done(futures[future], future.result())
+        done = True
+    finally:
+        if writer is None:
+            out.close()
+        else:
+            writer.close()
+        # shards of unfinished resumable generation are kept for the next run
+        if done or params is None:
+            for shard_path in shard_paths:
+                if os.path.exists(shard_path):
+                    remove_file(shard_path)
+    if params is not None:
+        manifest.update(complete=True, size=os.path.getsize(data_path))
+        _save_manifest(data_path, manifest)
+
+
+def generate_data(data_path, data_type, start_num, end_num, feature_nums, label_flag, sparsity, encryption_type,
+                  progress, engine="pandas", workers=1, id_cache_dir=None, seed=None, seed_key=0,
+                  output_format='csv', batch_size=None, sparse=False, params=None, profile=None):
+    """
+    generate ids in [start_num, end_num) with sampled features into `data_path`,
+    `batch_size` is rows, e.g. 10000, or bytes, e.g. "64MB", sampled and written at once;
+    with `sparse`, tag and tag_value data are sampled as csr arrays whatever the engine is;
+    with `params` from `generation_params`, generation is resumable from a sidecar manifest,
+    data is then generated in shards even by a single worker, so that a rerun appends after the last stitched shard;
+    dense data is sampled by distribution `profile` if given, see `data_profiles`
+    """
+    sparse = sparse and data_type != 'dense'
+    profile = profile if data_type == 'dense' else None
+    if profile is not None and engine != "vectorized":
+        raise ValueError("distribution profile is only supported by vectorized engine")
+    if output_format != 'csv' and (sparse or engine != "vectorized"):
+        raise ValueError(f"output format {output_format} is only supported by vectorized engine, "
+                         f"without sparse mode")
+    if seed is not None or params is not None or (workers is not None and workers > 1):
+        _generate_sharded_data(data_path, data_type, start_num, end_num, feature_nums, label_flag, sparsity,
+                               encryption_type, progress, engine, workers, id_cache_dir, seed, seed_key,
+                               output_format, batch_size, sparse, params, profile)
+        return
+    if sparse:
+        _generate_sparse_data(data_path, data_type, start_num, end_num, feature_nums, sparsity, encryption_type,
+                              progress, id_cache_dir, batch_size=batch_size)
+    elif engine == "vectorized":
+        _generate_vectorized_data(data_path, data_type, start_num, end_num, feature_nums, label_flag, sparsity,
+                                  encryption_type, progress, id_cache_dir, output_format=output_format,
+                                  batch_size=batch_size, profile=profile, table_key=seed_key)
+    elif engine != "pandas":
+        raise ValueError(f"unknown generate engine: {engine}, choose from {GENERATE_ENGINES}")
+    elif data_type == 'tag':
+        _generate_tag_data(data_path, start_num, end_num, feature_nums, sparsity, encryption_type, progress,
+                           batch_size)
+    elif data_type == 'tag_value':
+        _generate_tag_value_data(data_path, start_num, end_num, feature_nums, encryption_type, progress,
+                                 batch_size)
+    elif data_type == 'dense':
+        _generate_dens_data(data_path, start_num, end_num, feature_nums, label_flag, encryption_type, progress,
+                            batch_size)
+
+
+def benchmark_generate(data_num, feature_nums, data_types=('dense', 'tag', 'tag_value'), engines=None,
+                       sparsity=0.2, encryption_type=None, output_formats=('csv',)):
+    """
+    measure generating throughput and file size of each engine and output format,
+    binary output formats are only measured with vectorized engine
+
+    Returns
+    -------
+    list of dict with keys: engine, data_type, output_format, rows, seconds, rows_per_sec, size
+    """
+    engines = engines or GENERATE_ENGINES
+    result = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for data_type in data_types:
+            for output_format in output_formats:
+                for engine in engines:
+                    if output_format != 'csv' and engine != "vectorized":
+                        continue
+                    if output_format == 'npy' and data_type != 'dense':
+                        continue
+                    data_path = os.path.join(tmp_dir, f"{engine}_{data_type}.{output_format}")
+                    progress = data_progress(f"{engine} {data_type} {output_format}", time.time())
+                    start = time.time()
+                    generate_data(data_path, data_type, 0, data_num, feature_nums, data_type == 'dense', sparsity,
+                                  encryption_type, progress, engine=engine, output_format=output_format)
+                    seconds = time.time() - start
+                    result.append(dict(engine=engine, data_type=data_type, output_format=output_format,
+                                       rows=data_num, seconds=seconds,
+                                       rows_per_sec=data_num / seconds if seconds > 0 else float("inf"),
+                                       size=os.path.getsize(data_path)))
+                    remove_file(data_path)
+    return result
+
+
+def get_big_data(guest_data_size, host_data_size, guest_feature_num, host_feature_num, include_path, host_data_type,
+                 conf: Config, encryption_type, match_rate, sparsity, force, split_host, output_path,
+                 engine="pandas", workers=1, id_cache=False, seed=None, on_generated=None, output_format='csv',
+                 batch_size=None, sparse=False, profile=None, id_cache_size=DEFAULT_ID_CACHE_SIZE):
+    """
+    generate data files defined in suite of `include_path`,
+    `on_generated(data_name, data_path, generated)` is called once a file is ready,
+    `generated` is False if the file already exists and is kept;
+    with `output_format` other than csv, file extension is replaced accordingly;
+    generation is checkpointed in a manifest next to each file, so that an interrupted run resumes
+    from completed shards and a file generated with the same parameters is skipped;
+    a partial file, or one generated with other parameters, is replaced by `generate_data`
+    """
+    global big_data_dir
 
     def data_save(data_info, table_names, namespaces, partition_list):
         data_count = 0
@@ -169,13 +1277,30 @@ def get_big_data(guest_data_size, host_data_size, guest_feature_num, host_featur
             else:
                 host_end_num = host_data_size
                 host_start_num = 0
-            out_path = os.path.join(str(big_data_dir), data_name)
-            if os.path.exists(out_path) and os.path.isfile(out_path):
-                if force:
-                    remove_file(out_path)
-                else:
-                    echo.echo('{} Already exists'.format(out_path))
-                    continue
+            out_path = output_file_path(os.path.join(str(big_data_dir), data_name), output_format)
+            if 'guest' in data_info[data_name]:
+                start_num, end_num, feature_num = guest_start_num, guest_end_num, guest_feature_num
+                data_type = 'dense'
+            else:
+                start_num, end_num, feature_num = host_start_num, host_end_num, host_feature_num
+            seed_key = zlib.crc32(data_name.encode())
+            params = generation_params(data_type, start_num, end_num, feature_num, label_flag, sparsity,
+                                       encryption_type, engine=engine, seed=seed, seed_key=seed_key,
+                                       output_format=output_format, batch_size=batch_size, sparse=sparse,
+                                       profile=profile)
+            if force:
+                remove_generated(out_path)
+            elif generation_complete(out_path, params):
+                echo.echo('{} Already generated with the same parameters'.format(out_path))
+                if on_generated is not None:
+                    on_generated(data_name, out_path, False)
+                continue
+            elif load_manifest(out_path) is None and os.path.isfile(out_path):
+                # file not generated by resumable generation, keep it
+                echo.echo('{} Already exists'.format(out_path))
+                if on_generated is not None:
+                    on_generated(data_name, out_path, False)
+                continue
             data_i = (idx + 1) / len(data_info)
             downLoad = f'dataget  [{"#" * int(24 * data_i)}{"-" * (24 - int(24 * data_i))}]  {idx + 1}/{len(data_info)}'
             start = time.time()
@@ -184,23 +1309,18 @@ def get_big_data(guest_data_size, host_data_size, guest_feature_num, host_featur
             thread.start()
 
             try:
-                if 'guest' in data_info[data_name]:
-                    _generate_dens_data(out_path, guest_start_num, guest_end_num,
-                                        guest_feature_num, label_flag, progress)
-                else:
-                    # if data_type == 'tag' and not parallelize:
-                    if data_type == 'tag':
-                        _generate_tag_data(out_path, host_start_num, host_end_num, host_feature_num, sparsity, progress)
-                    # elif data_type == 'tag_value' and not parallelize:
-                    elif data_type == 'tag_value':
-                        _generate_tag_value_data(out_path, host_start_num, host_end_num, host_feature_num, progress)
-                    # elif data_type == 'dense' and not parallelize:
-                    elif data_type == 'dense':
-                        _generate_dens_data(out_path, host_start_num, host_end_num,
-                                            host_feature_num, label_flag, progress)
+                if id_cache_dir is not None:
+                    IdHashCache(id_cache_dir, max_size=id_cache_size).warm(encryption_type, start_num, end_num,
+                                                                          workers=workers)
+                generate_data(out_path, data_type, start_num, end_num, feature_num, label_flag, sparsity,
+                              encryption_type, progress, engine=engine, workers=workers, id_cache_dir=id_cache_dir,
+                              seed=seed, seed_key=seed_key, output_format=output_format,
+                              batch_size=batch_size, sparse=sparse, params=params, profile=profile)
 
                 progress.set_switch(False)
                 time.sleep(1)
+                if on_generated is not None:
+                    on_generated(data_name, out_path, True)
             except Exception:
                 exception_id = uuid.uuid1()
                 echo.echo(f"exception_id={exception_id}")
@@ -231,6 +1351,11 @@ def get_big_data(guest_data_size, host_data_size, guest_feature_num, host_featur
             big_data_dir = os.path.abspath(conf.cache_directory)
     except Exception:
         raise Exception('{}path does not exist'.format(big_data_dir))
+    # only vectorized engine and sparse mode consume hashed ids in bulk
+    if id_cache and encryption_type in _HASH_FUNCS and (engine == "vectorized" or sparse):
+        id_cache_dir = os.path.join(os.path.abspath(conf.cache_directory), "id_hash_cache")
+    else:
+        id_cache_dir = None
     date_set = {}
     table_name_list = []
     table_namespace_list = []
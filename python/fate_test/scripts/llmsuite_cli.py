@@ -24,6 +24,7 @@ import click
 
 from fate_test._client import Clients
 from fate_test._config import Config
+from fate_test._events import job_events, publish_to
 from fate_test._io import LOGGER, echo
 from fate_test._parser import record_non_success_jobs, non_success_summary
 from fate_test.scripts._options import SharedOptions
@@ -112,7 +113,6 @@ def run_llmsuite(ctx, include, exclude, algorithm_suite, glob, provider, task_co
         try:
             start = time.time()
             echo.echo(f"[{i + 1}/{len(suites)}]start at {time.strftime('%Y-%m-%d %X')} {suite.path}", fg='red')
-            os.environ['enable_pipeline_job_info_callback'] = '1'
             if not skip_data:
                 try:
                     _bind_data(client, suite, config_inst)
@@ -142,6 +142,7 @@ def run_llmsuite(ctx, include, exclude, algorithm_suite, glob, provider, task_co
         suite_file = str(suite.path).split("/")[-1]
         record_non_success_jobs(suite, suite_file)
     non_success_summary()
+    echo.echo(client.pretty_http_stats())
     echo.farewell()
     echo.echo(f"llmsuite namespace: {namespace}", fg='red')
 
@@ -184,26 +185,29 @@ def _run_llmsuite_pairs(config: Config, suite, namespace: str,
                     mod = _load_module_from_script(script_path)
                     input_params = signature(mod.main).parameters
 
+                    task = f"{suite.path}:{pair.pair_name}:{job_name}"
                     try:
                         # pipeline should return pretrained model path
-                        pretrained_model_path = _run_mod(mod, input_params, config, param,
-                                                         namespace, data_namespace_mangling)
+                        with publish_to(job_events, task):
+                            pretrained_model_path = _run_mod(mod, input_params, config, param,
+                                                             namespace, data_namespace_mangling)
                         job.pretrained_model_path = pretrained_model_path
-                        job_info = os.environ.get("pipeline_job_info")
-                        job_id, status, time_elapsed, event = extract_job_status(job_info, client, guest_party_id)
+                        job_id, status, time_elapsed, event = extract_job_status(job_events.submitted(task),
+                                                                                 client, guest_party_id)
                         suite.update_status(pair_name=pair.pair_name, job_name=job_name,
                                             job_id=job_id, status=status,
                                             time_elapsed=time_elapsed,
                                             event=event)
                     except Exception as e:
-                        job_info = os.environ.get("pipeline_job_info")
-                        if job_info is None:
+                        jobs = job_events.submitted(task)
+                        if not jobs:
                             job_id, status, time_elapsed, event = None, 'failed', None, None
                         else:
-                            job_id, status, time_elapsed, event = extract_job_status(job_info, client, guest_party_id)
+                            job_id, status, time_elapsed, event = extract_job_status(jobs, client, guest_party_id)
                         _raise(e, job_id=job_id, status=status, event=event, time_elapsed=time_elapsed)
-                        os.environ.pop("pipeline_job_info")
                         continue
+                    finally:
+                        job_events.clear(task)
                 except Exception as e:
                     _raise(f"pipeline failed: {e}", status="not submitted")
                     continue
@@ -225,7 +229,6 @@ def _run_llmsuite_pairs(config: Config, suite, namespace: str,
                         job_results[job_name] = result
                     except Exception as e:
                         _raise(f"evaluate failed: {e}", status=None)
-                os.environ.pop("pipeline_job_info")
         suite_results[pair.pair_name] = job_results
 
     from fate_llm.evaluate.utils.llm_evaluator import aggregate_table
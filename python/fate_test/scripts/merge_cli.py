@@ -0,0 +1,70 @@
+#
+#  Copyright 2019 The FATE Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import os
+import time
+from pathlib import Path
+
+import click
+
+from fate_test._io import echo
+from fate_test._journal import JOURNAL_FILENAME, RunJournal
+from fate_test._parser import PipelineJob, Testsuite, non_success_summary
+from fate_test.scripts._utils import _set_namespace
+
+
+@click.command("merge")
+@click.argument("journals", nargs=-1, required=True, type=click.Path(exists=True), metavar="<journal>...")
+def run_merge(journals):
+    """
+    merge run journals of testsuite shards into one summary; each <journal> is a `journal.jsonl`
+    or a `logs/{namespace}` directory holding one, e.g. copied from each runner host
+    """
+    paths = [os.path.join(path, JOURNAL_FILENAME) if os.path.isdir(path) else path for path in journals]
+    missing = [path for path in paths if not os.path.exists(path)]
+    if missing:
+        raise click.BadParameter(f"no run journal {missing}", param_hint="<journal>")
+    namespace = f"merge_{time.strftime('%Y%m%d%H%M%S')}"
+    _set_namespace(False, namespace)
+    journal = RunJournal.merge(paths)
+
+    echo.welcome()
+    suite_paths = journal.suites()
+    not_done = []
+    for suite_path in suite_paths:
+        records = journal.jobs(suite_path)
+        suite = Testsuite([], [PipelineJob(record["job_name"], None) for record in records], Path(suite_path))
+        for record in records:
+            RunJournal.restore_status(suite, record)
+        if not journal.suite_done(suite):
+            not_done.append(suite_path)
+        echo.echo(suite.pretty_final_summary([], Path(suite_path).name))
+        echo.stdout_newline()
+    non_success_summary()
+    echo.echo(f"merged {len(suite_paths)} testsuites from {len(paths)} journals", fg='red')
+    if not_done:
+        echo.echo(f"testsuites not done: {not_done}", fg='red')
+    gaps = journal.shard_gaps()
+    if gaps is not None:
+        if gaps["missing_shards"]:
+            echo.echo(f"journals of shards missing: {gaps['missing_shards']}", fg='red')
+        if gaps["unassigned"]:
+            echo.echo(f"testsuites run by no shard: {gaps['unassigned']}", fg='red')
+        if gaps["duplicated"]:
+            echo.echo(f"testsuites run by more than one shard: {gaps['duplicated']}", fg='red')
+        if gaps["inconsistent"]:
+            echo.echo("shards found different testsuites or shard counts, check include paths", fg='red')
+    echo.farewell()
+    echo.echo(f"merge namespace: {namespace}", fg='red')
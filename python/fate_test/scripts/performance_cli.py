@@ -18,7 +18,6 @@ import os
 import time
 import uuid
 from datetime import timedelta
-from inspect import signature
 
 import click
 from prettytable import PrettyTable, ORGMODE
@@ -29,7 +28,10 @@ from fate_test._config import Config
 from fate_test._io import LOGGER, echo
 from fate_test._parser import PerformanceSuite
 from fate_test.scripts._options import SharedOptions
-from fate_test.scripts._utils import _load_testsuites, _upload_data, _delete_data, _load_module_from_script
+from fate_test.scripts._runner import script_runner
+from fate_test.scripts._scheduler import SUCCEEDED, WorkGraph, WorkItem, add_suite_work
+from fate_test.scripts._utils import _load_testsuites, _upload_data, _upload_datasets, _delete_data, CleanupQueue, \
+    _run_script_main, _job_resources, _suite_tables
 from fate_test.utils import TxtStyle, parse_job_time_info, pretty_time_info_summary
 
 
@@ -52,15 +54,26 @@ from fate_test.utils import TxtStyle, parse_job_time_info, pretty_time_info_summ
 @click.option("--skip-data", is_flag=True, default=False,
               help="skip uploading data specified in testsuite")
 @click.option("--disable-clean-data", "clean_data", flag_value=False, default=None)
+@click.option("--global-schedule", is_flag=True, default=False,
+              help="schedule uploads, jobs and cleanups of all performance suites together under the limits below")
+@click.option("--max-party-jobs", type=int, default=2,
+              help="max number of jobs involving a party running at the same time, with --global-schedule")
+@click.option("--max-task-cores", type=int, default=None,
+              help="max sum of task cores of jobs running at the same time, with --global-schedule")
+@click.option("--max-uploads", type=int, default=2,
+              help="max number of performance suites uploading data at the same time, with --global-schedule")
+@click.option("--resume", type=str, metavar="<namespace>",
+              help="resume run of namespace from its journal, skipping work which already succeeded")
 @SharedOptions.get_shared_options(hidden=True)
 @click.pass_context
 def run_performance(ctx, job_type, include, timeout, epochs,
-             max_depth, num_trees, task_cores, storage_tag, history_tag, skip_data, clean_data, **kwargs):
+             max_depth, num_trees, task_cores, storage_tag, history_tag, skip_data, clean_data, global_schedule,
+                    max_party_jobs, max_task_cores, max_uploads, **kwargs):
     """
     Test the performance of big data tasks, alias: bp
     """
     ctx.obj.update(**kwargs)
-    ctx.obj.post_process()
+    ctx.obj.post_process(journal=True)
     config_inst = ctx.obj["config"]
     if ctx.obj["extend_sid"] is not None:
         config_inst.extend_sid = ctx.obj["extend_sid"]
@@ -98,6 +111,28 @@ def run_performance(ctx, job_type, include, timeout, epochs,
 
     echo.stdout_newline()
     client = Clients(config_inst)
+    cleanup = CleanupQueue(client, ctx.obj["upload_cache"]) if ctx.obj["defer_clean_data"] else None
+    # concurrent jobs always run in worker processes, keeping their module globals apart
+    runner = script_runner(ctx.obj, config_inst.timeout, size=None if global_schedule else 1, required=global_schedule,
+                           stop_job=client["guest_0"].stop_job)
+    journal = ctx.obj["journal"]
+
+    if global_schedule:
+        # noinspection PyBroadException
+        try:
+            _schedule_performance_suites(suites, client, config_inst, namespace, data_namespace_mangling,
+                                         limits=dict(party=max_party_jobs, task_cores=max_task_cores,
+                                                     upload=max_uploads),
+                                         runner=runner, journal=journal, epochs=epochs, max_depth=max_depth,
+                                         num_trees=num_trees, storage_tag=storage_tag, history_tag=history_tag,
+                                         skip_data=skip_data, clean_data=clean_data,
+                                         upload_cache=ctx.obj["upload_cache"], partitions=ctx.obj["partitions"],
+                                         upload_concurrency=ctx.obj["upload_concurrency"])
+        except Exception:
+            exception_id = uuid.uuid1()
+            echo.echo(f"exception in global schedule, exception_id={exception_id}")
+            LOGGER.exception(f"exception id: {exception_id}")
+        suites = []
 
     for i, suite in enumerate(suites):
         # noinspection PyBroadException
@@ -105,9 +140,15 @@ def run_performance(ctx, job_type, include, timeout, epochs,
             start = time.time()
             echo.echo(f"[{i + 1}/{len(suites)}]start at {time.strftime('%Y-%m-%d %X')} {suite.path}", fg='red')
 
-            if not skip_data:
+            # time info of all jobs recorded by an earlier run, no data needed
+            done = all(journal.performance(suite, job.job_name) is not None for job in suite.pipeline_jobs)
+            if not skip_data and not done:
+                if cleanup is not None:
+                    cleanup.wait_for(suite)
                 try:
-                    _upload_data(client, suite, config_inst, partitions=ctx.obj["partitions"])
+                    _upload_data(client, suite, config_inst, partitions=ctx.obj["partitions"],
+                                 upload_concurrency=ctx.obj["upload_concurrency"],
+                                 upload_cache=ctx.obj["upload_cache"], journal=journal)
                 except Exception as e:
                     raise RuntimeError(f"exception occur while uploading data for {suite.path}") from e
 
@@ -115,37 +156,21 @@ def run_performance(ctx, job_type, include, timeout, epochs,
             try:
                 job_time_info = _run_performance_jobs(config_inst, suite, namespace, data_namespace_mangling,
                                                       client,
-                                                      epochs, max_depth, num_trees)
+                                                      epochs, max_depth, num_trees, runner=runner,
+                                                      journal=journal)
             except Exception as e:
                 raise RuntimeError(f"exception occur while running pipeline jobs for {suite.path}") from e
 
             echo.echo(f"[{i + 1}/{len(suites)}]elapse {timedelta(seconds=int(time.time() - start))}", fg='red')
-            if not skip_data and clean_data:
-                _delete_data(client, suite)
+            if not skip_data and clean_data and not journal.suite_done(suite):
+                journal.record_clean(suite)
+                if cleanup is not None:
+                    cleanup.put(suite)
+                else:
+                    _delete_data(client, suite, upload_cache=ctx.obj["upload_cache"])
+            journal.record_suite(suite)
             # echo.echo(suite.pretty_final_summary(job_time_info), fg='red')
-            all_summary = []
-            compare_summary = []
-            for job_name, job_time in job_time_info.items():
-                performance_dir = "/".join(
-                    [os.path.join(os.path.abspath(config_inst.cache_directory),
-                                  'benchmark_history', "performance.yaml")])
-                fate_version = client["guest_0"].get_version()
-                # fate_version = "beta-2.0.0"
-                if history_tag:
-                    history_tag = ["_".join([i, job_name]) for i in history_tag]
-                    history_compare_result = comparison_quality(job_name,
-                                                                history_tag,
-                                                                performance_dir,
-                                                                job_time["time_summary"])
-                    compare_summary.append(history_compare_result)
-                if storage_tag:
-                    storage_tag = "_".join(['FATE', fate_version, storage_tag, job_name])
-                    save_quality(storage_tag, performance_dir, job_time["time_summary"])
-                res_str = pretty_time_info_summary(job_time, job_name)
-                all_summary.append(res_str)
-            echo.echo("\n".join(all_summary))
-            echo.echo("#" * 60)
-            echo.echo("\n".join(compare_summary))
+            _show_performance_summary(config_inst, client, job_time_info, storage_tag, history_tag)
 
         except Exception:
             exception_id = uuid.uuid1()
@@ -154,63 +179,172 @@ def run_performance(ctx, job_type, include, timeout, epochs,
         finally:
             echo.stdout_newline()
 
+    if runner is not None:
+        runner.close()
+    if cleanup is not None:
+        cleanup.join()
+    echo.echo(client.pretty_http_stats())
     echo.farewell()
     echo.echo(f"testsuite namespace: {namespace}", fg='red')
 
 
+def _show_performance_summary(config: Config, client, job_time_info, storage_tag, history_tag):
+    all_summary = []
+    compare_summary = []
+    for job_name, job_time in job_time_info.items():
+        performance_dir = "/".join(
+            [os.path.join(os.path.abspath(config.cache_directory),
+                          'benchmark_history', "performance.yaml")])
+        fate_version = client["guest_0"].get_version()
+        # fate_version = "beta-2.0.0"
+        if history_tag:
+            history_tag = ["_".join([i, job_name]) for i in history_tag]
+            history_compare_result = comparison_quality(job_name,
+                                                        history_tag,
+                                                        performance_dir,
+                                                        job_time["time_summary"])
+            compare_summary.append(history_compare_result)
+        if storage_tag:
+            storage_tag = "_".join(['FATE', fate_version, storage_tag, job_name])
+            save_quality(storage_tag, performance_dir, job_time["time_summary"])
+        res_str = pretty_time_info_summary(job_time, job_name)
+        all_summary.append(res_str)
+    echo.echo("\n".join(all_summary))
+    echo.echo("#" * 60)
+    echo.echo("\n".join(compare_summary))
+
+
+def _add_fate_pythonpath(config: Config):
+    PYTHONPATH = os.environ.get('PYTHONPATH') + ":" + os.path.join(config.fate_base, "python")
+    os.environ['PYTHONPATH'] = PYTHONPATH
+
+
 @LOGGER.catch
 def _run_performance_jobs(config: Config, suite: PerformanceSuite, namespace: str,
-                          data_namespace_mangling: bool, client, epochs, max_depth, num_trees):
+                          data_namespace_mangling: bool, client, epochs, max_depth, num_trees, runner=None,
+                          journal=None):
     # pipeline demo goes here
     job_n = len(suite.pipeline_jobs)
-    fate_base = config.fate_base
-    PYTHONPATH = os.environ.get('PYTHONPATH') + ":" + os.path.join(fate_base, "python")
-    os.environ['PYTHONPATH'] = PYTHONPATH
+    _add_fate_pythonpath(config)
     job_time_history = {}
     for j, job in enumerate(suite.pipeline_jobs):
-        try:
-            echo.echo(f"Running [{j + 1}/{job_n}] job: {job.job_name}")
-            job_name, script_path, conf_path = job.job_name, job.script_path, job.conf_path
-            param = Config.load_from_file(conf_path)
-            if epochs is not None:
-                param['epochs'] = epochs
-            if max_depth is not None:
-                param['max_depth'] = max_depth
-            if num_trees is not None:
-                param['num_trees'] = num_trees
-
-            mod = _load_module_from_script(script_path)
-            input_params = signature(mod.main).parameters
-            # local script
-            if len(input_params) == 1:
-                job_id = mod.main(param=param)
-            elif len(input_params) == 2:
-                job_id = mod.main(config=config, param=param)
-            # pipeline script
-            elif len(input_params) == 3:
-                if data_namespace_mangling:
-                    job_id = mod.main(config=config, param=param, namespace=f"_{namespace}")
-                else:
-                    job_id = mod.main(config=config, param=param)
-            else:
-                job_id = mod.main()
-            echo.echo(f"[{j + 1}/{job_n}] job: {job.job_name} Success!\n")
-            ret_msg = client["guest_0"].query_task(job_id=job_id,
-                                                   role="guest",
-                                                   party_id=config.parties.guest[0]).get("data")
-            time_summary = parse_job_time_info(ret_msg)
-            job_time_history[job_name] = {"job_id": job_id, "time_summary": time_summary}
-            echo.echo(f"[{j + 1}/{job_n}] job: {job.job_name} time info: {time_summary}\n")
-
-        except Exception as e:
-            exception_id = uuid.uuid1()
-            echo.echo(f"exception while running [{j + 1}/{job_n}] job, exception_id={exception_id}", err=True,
-                      fg='red')
-            LOGGER.exception(f"exception id: {exception_id}, error message: \n{e}")
-            continue
+        time_info = _run_performance_job(config, suite, job, f"[{j + 1}/{job_n}]", namespace, data_namespace_mangling,
+                                         client, epochs, max_depth, num_trees, runner=runner, journal=journal)
+        if time_info is not None:
+            job_time_history[job.job_name] = time_info
     return job_time_history
 
 
+def _run_performance_job(config: Config, suite: PerformanceSuite, job, progress, namespace: str,
+                         data_namespace_mangling: bool, client, epochs, max_depth, num_trees, runner=None,
+                         journal=None):
+    """
+    run performance job unless its time info is in `journal`, return its time info, None if it failed
+    """
+    time_info = journal.performance(suite, job.job_name) if journal is not None else None
+    if time_info is not None:
+        echo.echo(f"{progress} job: {job.job_name} succeeded before, skip")
+        return time_info
+    try:
+        echo.echo(f"Running {progress} job: {job.job_name}")
+        job_name, script_path, conf_path = job.job_name, job.script_path, job.conf_path
+        param = Config.load_from_file(conf_path)
+        if epochs is not None:
+            param['epochs'] = epochs
+        if max_depth is not None:
+            param['max_depth'] = max_depth
+        if num_trees is not None:
+            param['num_trees'] = num_trees
+
+        script_namespace = f"_{namespace}" if data_namespace_mangling else None
+        if runner is not None:
+            job_id, load_time = runner.run(_run_script_main, script_path, config, param, script_namespace)
+        else:
+            job_id, load_time = _run_script_main(script_path, config, param, script_namespace)
+        echo.echo(f"{progress} job: {job.job_name} Success! script loaded in {load_time:.3f}s\n")
+        ret_msg = client["guest_0"].query_task(job_id=job_id,
+                                               role="guest",
+                                               party_id=config.parties.guest[0]).get("data")
+        time_summary = parse_job_time_info(ret_msg)
+        time_info = {"job_id": job_id, "time_summary": time_summary}
+        if journal is not None:
+            journal.record_performance(suite, job_name, time_info)
+        echo.echo(f"{progress} job: {job.job_name} time info: {time_summary}\n")
+        return time_info
+
+    except Exception as e:
+        exception_id = uuid.uuid1()
+        echo.echo(f"exception while running {progress} job, exception_id={exception_id}", err=True,
+                  fg='red')
+        LOGGER.exception(f"exception id: {exception_id}, error message: \n{e}")
+        return None
+
+
+def _schedule_performance_suites(suites, clients: Clients, config: Config, namespace: str,
+                                 data_namespace_mangling: bool, limits, runner, epochs, max_depth, num_trees,
+                                 storage_tag, history_tag, skip_data=False, clean_data=False, upload_cache=None,
+                                 journal=None, **upload_kwargs):
+    """
+    run uploads, performance jobs and cleanups of all suites as one work graph under `limits`,
+    scheduled as testsuites are by `suite --global-schedule`; time summary of a suite is shown once it is done
+    """
+    graph = WorkGraph(limits)
+    _add_fate_pythonpath(config)
+    # table -> last work item of the suite which used it
+    table_users = {}
+    for i, suite in enumerate(suites):
+        progress = f"[{i + 1}/{len(suites)}]"
+        # time info of all jobs recorded by an earlier run, no data needed
+        done = all(journal.performance(suite, job.job_name) is not None for job in suite.pipeline_jobs)
+        upload = None
+        if not skip_data and not done:
+            def _upload(suite=suite, progress=progress):
+                echo.echo(f"{progress}upload data of {suite.path}", fg='red')
+                failed = _upload_datasets(clients, suite, config, upload_cache=upload_cache, journal=journal,
+                                          **upload_kwargs)
+                if failed:
+                    raise RuntimeError(f"{failed} datasets of {suite.path} failed to upload")
+                return True
+
+            upload = WorkItem(f"upload {suite.path}", _upload, resources={"upload": 1})
+        job_time_info = {}
+        jobs = []
+        resources = _job_resources(config, suite)
+        for job in suite.pipeline_jobs:
+            def _job(suite=suite, job=job, progress=progress, job_time_info=job_time_info):
+                time_info = _run_performance_job(config, suite, job, progress, namespace, data_namespace_mangling,
+                                                 clients, epochs, max_depth, num_trees, runner=runner,
+                                                 journal=journal)
+                if time_info is None:
+                    return False
+                job_time_info[job.job_name] = time_info
+                return True
+
+            def _skip(suite=suite, job=job):
+                echo.echo(f"Skip job: {job.job_name} of {suite.path}, data upload not success")
+
+            jobs.append(WorkItem(f"job {job.job_name} of {suite.path}", _job, resources=resources, on_skip=_skip))
+
+        def _finish(suite=suite, progress=progress, upload=upload, job_time_info=job_time_info):
+            if upload is not None and upload.state != SUCCEEDED:
+                echo.echo(f"{progress}exception occur while uploading data for {suite.path}")
+                return False
+            if not skip_data and clean_data and not journal.suite_done(suite):
+                journal.record_clean(suite)
+                _delete_data(clients, suite, upload_cache=upload_cache)
+            journal.record_suite(suite)
+            # keep job order of suite in summary
+            _show_performance_summary(config, clients, {job.job_name: job_time_info[job.job_name]
+                                                        for job in suite.pipeline_jobs
+                                                        if job.job_name in job_time_info},
+                                      storage_tag, history_tag)
+            return True
+
+        add_suite_work(graph, _suite_tables(clients, suite), table_users, WorkItem(f"finish {suite.path}", _finish),
+                       upload=upload, jobs=jobs)
+    graph.run()
+
+
 def comparison_quality(group_name, history_tags, history_info_dir, time_consuming):
     assert os.path.exists(history_info_dir), f"Please check the {history_info_dir} Is it deleted"
     with open(history_info_dir, 'r') as f:
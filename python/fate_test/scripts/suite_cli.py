@@ -14,9 +14,9 @@
 #  limitations under the License.
 #
 
-import os
 import time
 import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import timedelta
 
 import click
@@ -24,10 +24,15 @@ import click
 from fate_test import _config
 from fate_test._client import Clients
 from fate_test._config import Config
+from fate_test._events import FINISHED, JobEvent, job_events
 from fate_test._io import LOGGER, echo
 from fate_test._parser import Testsuite, non_success_summary
-from fate_test.scripts._options import SharedOptions
-from fate_test.scripts._utils import _load_testsuites, _upload_data, _delete_data, _load_module_from_script
+from fate_test._run_history import RunHistory
+from fate_test.scripts._options import SharedOptions, parse_shard
+from fate_test.scripts._runner import script_runner
+from fate_test.scripts._scheduler import ABORTED, SUCCEEDED, FailureBudget, WorkGraph, WorkItem, add_suite_work
+from fate_test.scripts._utils import _load_testsuites, _upload_data, _upload_datasets, _delete_data, \
+    _run_pipeline_script, _shard_suites, _suites_root, _job_resources, _suite_tables, CleanupQueue
 from fate_test.utils import extract_job_status
 
 
@@ -51,15 +56,43 @@ from fate_test.utils import extract_job_status
               help="Select the fate version, for example: fate@2.0-beta")
 @click.option("--disable-clean-data", "clean_data", flag_value=False, default=None)
 @click.option("--enable-clean-data", "clean_data", flag_value=True, default=None)
+@click.option("--parallelism", type=int, default=1,
+              help="max number of pipeline jobs of a testsuite running at the same time, each in a worker process")
+@click.option("--global-schedule", is_flag=True, default=False,
+              help="schedule uploads, jobs and cleanups of all testsuites together under the limits below")
+@click.option("--max-party-jobs", type=int, default=2,
+              help="max number of pipeline jobs involving a party running at the same time, with --global-schedule")
+@click.option("--max-task-cores", type=int, default=None,
+              help="max sum of task cores of pipeline jobs running at the same time, with --global-schedule")
+@click.option("--max-uploads", type=int, default=2,
+              help="max number of testsuites uploading data at the same time, with --global-schedule")
+@click.option("--order", type=click.Choice(["history", "path"]), default="history",
+              help="run testsuites which failed recently first then shortest first, by run history, "
+                   "as well as ready jobs of testsuites declaring deps; or testsuites by path; "
+                   "other jobs always run as listed")
+@click.option("--fail-fast", type=int, default=None, metavar="<N>",
+              help="abort remaining testsuites and jobs after N failures")
+@click.option("--shard", type=parse_shard, default=None, metavar="<i/N>",
+              help="run only testsuites of shard i out of N, e.g. one shard on each runner host")
+@click.option("--shard-by", type=click.Choice(["hash", "duration"]), default="hash",
+              help="partition testsuites into shards by stable hash of their paths, "
+                   "or by durations in `--shard-history`")
+@click.option("--shard-history", type=click.Path(exists=True, dir_okay=False), default=None,
+              help="run history file read by `--shard-by duration`, e.g. a copy of run_history.json given to all "
+                   "shards, which should not change while shards run")
+@click.option("--resume", type=str, metavar="<namespace>",
+              help="resume run of namespace from its journal, skipping work which already succeeded")
 @SharedOptions.get_shared_options(hidden=True)
 @click.pass_context
 def run_suite(ctx, include, exclude, glob,
-              skip_jobs, skip_data, data_only, clean_data, provider, task_cores, timeout, **kwargs):
+              skip_jobs, skip_data, data_only, clean_data, provider, task_cores, timeout, parallelism,
+              global_schedule, max_party_jobs, max_task_cores, max_uploads, order, fail_fast, shard, shard_by,
+              shard_history, **kwargs):
     """
     process testsuite
     """
     ctx.obj.update(**kwargs)
-    ctx.obj.post_process()
+    ctx.obj.post_process(journal=True)
     config_inst = ctx.obj["config"]
     if ctx.obj["extend_sid"] is not None:
         config_inst.extend_sid = ctx.obj["extend_sid"]
@@ -81,6 +114,23 @@ def run_suite(ctx, include, exclude, glob,
     echo.echo(f"testsuite namespace: {namespace}", fg='red')
     echo.echo("loading testsuites:")
     suites = _load_testsuites(includes=include, excludes=exclude, glob=glob, provider=provider)
+    history = RunHistory(config_inst.cache_directory, root=_suites_root(suites))
+    if shard is not None:
+        if shard_by == "duration" and shard_history is None:
+            raise click.BadParameter("`--shard-by duration` requires a run history snapshot shared by all shards",
+                                     param_hint="--shard-history")
+        all_suites = suites
+        snapshot = RunHistory(path=shard_history) if shard_by == "duration" else None
+        suites = _shard_suites(all_suites, *shard, history=snapshot)
+        echo.echo(f"shard {shard[0]}/{shard[1]}: {len(suites)} of {len(all_suites)} testsuites")
+        shard_keys = [history.suite_key(suite) for suite in suites]
+        LOGGER.info(f"testsuites of shard {shard[0]}/{shard[1]}: {shard_keys}")
+        ctx.obj["journal"].record_shard(shard[0], shard[1], [history.suite_key(suite) for suite in all_suites],
+                                        shard_keys)
+    if order == "history":
+        suites = _prioritize(suites, history)
+    else:
+        suites = sorted(suites, key=lambda suite: str(suite.path))
     for suite in suites:
         _config.jobs_num += len(suite.pipeline_jobs)
         echo.echo(f"\tdataset({len(suite.dataset)}) "
@@ -91,31 +141,73 @@ def run_suite(ctx, include, exclude, glob,
     echo.stdout_newline()
     # with Clients(config_inst) as client:
     client = Clients(config_inst)
+    cleanup = CleanupQueue(client, ctx.obj["upload_cache"]) if ctx.obj["defer_clean_data"] else None
+    journal = ctx.obj["journal"]
+    budget = FailureBudget(fail_fast)
+    # concurrent jobs always run in worker processes, keeping their module globals and job events apart
+    runner = script_runner(ctx.obj, config_inst.timeout, size=None if global_schedule else parallelism,
+                           required=global_schedule or parallelism > 1, stop_job=client["guest_0"].stop_job)
+
+    if global_schedule:
+        # noinspection PyBroadException
+        try:
+            _schedule_suites(suites, client, config_inst, namespace, data_namespace_mangling,
+                             limits=dict(party=max_party_jobs, task_cores=max_task_cores, upload=max_uploads),
+                             runner=runner, journal=journal, history=history, budget=budget,
+                             skip_data=skip_data, skip_jobs=skip_jobs or data_only, clean_data=clean_data,
+                             upload_cache=ctx.obj["upload_cache"], partitions=ctx.obj["partitions"],
+                             upload_concurrency=ctx.obj["upload_concurrency"])
+        except Exception:
+            exception_id = uuid.uuid1()
+            echo.echo(f"exception in global schedule, exception_id={exception_id}")
+            LOGGER.exception(f"exception id: {exception_id}")
+        suites = []
 
     for i, suite in enumerate(suites):
+        if budget.exhausted():
+            echo.echo(f"fail fast after {budget.failures} failures, skip remaining {len(suites) - i} testsuites",
+                      fg='red')
+            break
         # noinspection PyBroadException
         try:
             start = time.time()
             echo.echo(f"[{i + 1}/{len(suites)}]start at {time.strftime('%Y-%m-%d %X')} {suite.path}", fg='red')
+            succeeded = journal.succeeded_jobs(suite)
+            if journal.suite_done(suite) and len(succeeded) == len(suite.pipeline_jobs):
+                echo.echo(f"[{i + 1}/{len(suites)}]done before, skip {suite.path}", fg='red')
+                if not skip_jobs:
+                    echo.echo(suite.pretty_final_summary([], str(suite.path).split("/")[-1]))
+                continue
             if not skip_data:
+                if cleanup is not None:
+                    cleanup.wait_for(suite)
                 try:
-                    _upload_data(client, suite, config_inst, partitions=ctx.obj["partitions"])
+                    _upload_data(client, suite, config_inst, partitions=ctx.obj["partitions"],
+                                 upload_concurrency=ctx.obj["upload_concurrency"],
+                                 upload_cache=ctx.obj["upload_cache"], journal=journal)
                 except Exception as e:
                     raise RuntimeError(f"exception occur while uploading data for {suite.path}") from e
             if data_only:
                 continue
 
             if not skip_jobs:
-                os.environ['enable_pipeline_job_info_callback'] = '1'
                 try:
-                    time_consuming = _run_pipeline_jobs(config_inst, suite, namespace, data_namespace_mangling, client)
+                    time_consuming = _run_pipeline_jobs(config_inst, suite, namespace, data_namespace_mangling, client,
+                                                        parallelism=parallelism, runner=runner, journal=journal,
+                                                        succeeded=succeeded, history=history, budget=budget)
                 except Exception as e:
                     raise RuntimeError(f"exception occur while running pipeline jobs for {suite.path}") from e
 
             if not skip_data and clean_data:
-                _delete_data(client, suite)
+                journal.record_clean(suite)
+                if cleanup is not None:
+                    cleanup.put(suite)
+                else:
+                    _delete_data(client, suite, upload_cache=ctx.obj["upload_cache"])
+            journal.record_suite(suite)
             echo.echo(f"[{i + 1}/{len(suites)}]elapse {timedelta(seconds=int(time.time() - start))}", fg='red')
             if not skip_jobs:
+                history.record(history.suite_key(suite), time.time() - start, not _suite_failed(suite))
                 suite_file = str(suite.path).split("/")[-1]
                 echo.echo(suite.pretty_final_summary(time_consuming, suite_file))
 
@@ -123,74 +215,303 @@ def run_suite(ctx, include, exclude, glob,
             exception_id = uuid.uuid1()
             echo.echo(f"exception in {suite.path}, exception_id={exception_id}")
             LOGGER.exception(f"exception id: {exception_id}")
+            budget.fail()
+            history.record(history.suite_key(suite), time.time() - start, False)
         finally:
             echo.stdout_newline()
     non_success_summary()
+    if runner is not None:
+        runner.close()
+    if cleanup is not None:
+        cleanup.join()
+    echo.echo(client.pretty_http_stats())
     echo.farewell()
     echo.echo(f"testsuite namespace: {namespace}", fg='red')
 
 
+def _prioritize(suites, history: RunHistory):
+    """
+    suites in order of priority by run history; jobs of a suite are reordered only if the suite declares deps,
+    otherwise they may rely on running as listed
+    """
+    for suite in suites:
+        if any(job.deps for job in suite.pipeline_jobs):
+            suite.pipeline_jobs = history.order(suite.pipeline_jobs,
+                                                key=lambda job, suite=suite: history.job_key(suite, job.job_name))
+    return history.order(suites, key=history.suite_key)
+
+
+def _suite_failed(suite: Testsuite):
+    """
+    whether any job of suite did not succeed, jobs aborted by fail fast aside
+    """
+    for status in suite.get_final_status().values():
+        if isinstance(status.status, list):
+            if not all(s.is_success() for s in status.status):
+                return True
+        elif status.status != ABORTED:
+            return True
+    return False
+
+
+def _execute_pipeline_script(runner, pipeline_job, config: Config, namespace=None, task=None):
+    """
+    run pipeline script in current process, or in a worker process of `runner` if given
+    """
+    if runner is None:
+        return _run_pipeline_script(pipeline_job.script_path, config, namespace, task)
+    try:
+        return runner.run(_run_pipeline_script, pipeline_job.script_path, config, namespace, task)
+    except (TimeoutError, RuntimeError) as e:
+        return dict(loaded=True, error=str(e))
+    except Exception as e:
+        # script not sent to a worker, e.g. config not picklable
+        return dict(loaded=False, error=f"{type(e).__name__}: {e}")
+
+
+def _pipeline_task(suite: Testsuite, job_name):
+    return f"{suite.path}:{job_name}"
+
+
+def _record_pipeline_error(suite: Testsuite, job_name, err_msg, status="failed", job_id=None, event=None,
+                           time_elapsed=None):
+    exception_id = str(uuid.uuid1())
+    suite.update_status(job_name=job_name, job_id=job_id, exception_id=exception_id, status=status,
+                        event=event, time_elapsed=time_elapsed)
+    echo.file(f"exception({exception_id}), error message:\n{err_msg}")
+
+
+def _record_pipeline_result(suite: Testsuite, job_name, result, client, guest_party_id):
+    """
+    update status of job in suite from result of `_run_pipeline_script` and jobs it published,
+    return (whether status was recorded without error, whether all flow jobs of it succeeded)
+    """
+    task = _pipeline_task(suite, job_name)
+    jobs = job_events.submitted(task)
+    if result.get("load_time") is not None:
+        suite.update_status(job_name=job_name, load_time=result["load_time"])
+    if not result["loaded"]:
+        job_events.clear(task)
+        _record_pipeline_error(suite, job_name, result["error"], status="not submitted")
+        return False, False
+    error = result["error"]
+    # noinspection PyBroadException
+    try:
+        if not jobs:
+            job_id, status, time_elapsed, event = None, 'failed', None, None
+            if error is None:
+                error = "no pipeline job reported"
+        else:
+            job_id, status, time_elapsed, event = extract_job_status(jobs, client, guest_party_id)
+            for job in zip(job_id, status, time_elapsed, event):
+                job_events.publish(JobEvent(task, FINISHED, job[0], job[3], job[1], job[2]))
+        job_events.clear(task)
+        if error is not None:
+            _record_pipeline_error(suite, job_name, error, job_id=job_id, status=status, event=event,
+                                   time_elapsed=time_elapsed)
+            return False, False
+        suite.update_status(job_name=job_name, job_id=job_id, status=status, time_elapsed=time_elapsed,
+                            event=event)
+    except Exception as e:
+        job_events.clear(task)
+        _record_pipeline_error(suite, job_name, e, status="not submitted")
+        return False, False
+    return True, all(s.is_success() for s in status)
+
+
 def _run_pipeline_jobs(config: Config, suite: Testsuite, namespace: str, data_namespace_mangling: bool,
-                       clients: Clients):
-    # pipeline demo goes here
+                       clients: Clients, parallelism=1, runner=None, journal=None, succeeded=(), history=None,
+                       budget=None):
+    """
+    run pipeline jobs of suite, a job starts only after all its deps succeeded;
+    with `runner`, jobs run in its worker processes, up to `parallelism` of them at the same time;
+    jobs in `succeeded` are not run again, final status of each job run is recorded to `journal`
+    and its outcome to `history`; failures are counted in `budget`, jobs not started once it is exhausted are aborted
+    """
     client = clients['guest_0']
     guest_party_id = config.parties.role_to_party("guest")[0]
     job_n = len(suite.pipeline_jobs)
     time_list = []
-    for i, pipeline_job in enumerate(suite.pipeline_jobs):
-        echo.echo(f"Running [{i + 1}/{job_n}] job: {pipeline_job.job_name}")
-
-        def _raise(err_msg, status="failed", job_id=None, event=None, time_elapsed=None):
-            exception_id = str(uuid.uuid1())
-            suite.update_status(job_name=job_name, job_id=job_id, exception_id=exception_id, status=status,
-                                event=event, time_elapsed=time_elapsed)
-            echo.file(f"exception({exception_id}), error message:\n{err_msg}")
-
-        job_name, script_path = pipeline_job.job_name, pipeline_job.script_path
-        mod = _load_module_from_script(script_path)
-        start = time.time()
-        try:
-            if data_namespace_mangling:
-                try:
-                    mod.main(config=config, namespace=f"_{namespace}")
-                    job_info = os.environ.get("pipeline_job_info")
-                    job_id, status, time_elapsed, event = extract_job_status(job_info, client, guest_party_id)
-                    suite.update_status(job_name=job_name, job_id=job_id, status=status, time_elapsed=time_elapsed,
-                                        event=event)
-                    time_list.append(time.time() - start)
-                    os.environ.pop("pipeline_job_info")
+    script_namespace = f"_{namespace}" if data_namespace_mangling else None
+    pending = [pipeline_job for pipeline_job in suite.pipeline_jobs if pipeline_job.job_name not in succeeded]
+    succeeded, finished = set(succeeded), set(succeeded)
+    running = {}
+    started = job_n - len(pending)
+    if started:
+        echo.echo(f"Skip {started} jobs succeeded before: {sorted(succeeded)}")
 
-                except Exception as e:
-                    job_info = os.environ.get("pipeline_job_info")
-                    if job_info is None:
-                        job_id, status, time_elapsed, event = None, 'failed', None, None
-                    else:
-                        job_id, status, time_elapsed, event = extract_job_status(job_info, client, guest_party_id)
-                    _raise(e, job_id=job_id, status=status, event=event, time_elapsed=time_elapsed)
-                    os.environ.pop("pipeline_job_info")
+    def _finish(pipeline_job, result, start):
+        finished.add(pipeline_job.job_name)
+        recorded, success = _record_pipeline_result(suite, pipeline_job.job_name, result, client, guest_party_id)
+        if journal is not None:
+            journal.record_job(suite, pipeline_job.job_name)
+        if history is not None:
+            history.record(history.job_key(suite, pipeline_job.job_name), time.time() - start, success)
+        if recorded:
+            time_list.append(time.time() - start)
+        if success:
+            succeeded.add(pipeline_job.job_name)
+        elif budget is not None:
+            budget.fail()
+
+    with ThreadPoolExecutor(max_workers=max(1, parallelism)) as executor:
+        while pending or running:
+            if pending and budget is not None and budget.exhausted():
+                echo.echo(f"Abort {len(pending)} jobs: {[job.job_name for job in pending]}, "
+                          f"fail fast after {budget.failures} failures")
+                for pipeline_job in pending:
+                    suite.update_status(job_name=pipeline_job.job_name, status=ABORTED)
+                pending.clear()
+            for pipeline_job in list(pending):
+                if len(running) >= max(1, parallelism) or (budget is not None and budget.exhausted()):
+                    break
+                if not all(dep in finished for dep in pipeline_job.deps):
+                    continue
+                pending.remove(pipeline_job)
+                started += 1
+                failed_deps = [dep for dep in pipeline_job.deps if dep not in succeeded]
+                if failed_deps:
+                    echo.echo(f"Skip [{started}/{job_n}] job: {pipeline_job.job_name}, "
+                              f"deps {failed_deps} not success")
+                    _record_pipeline_error(suite, pipeline_job.job_name, f"deps {failed_deps} not success",
+                                           status="not submitted")
+                    finished.add(pipeline_job.job_name)
                     continue
-            else:
+                echo.echo(f"Running [{started}/{job_n}] job: {pipeline_job.job_name}")
+                start = time.time()
+                task = _pipeline_task(suite, pipeline_job.job_name)
+                if runner is None:
+                    _finish(pipeline_job, _execute_pipeline_script(None, pipeline_job, config, script_namespace,
+                                                                   task), start)
+                    continue
+                future = executor.submit(_execute_pipeline_script, runner, pipeline_job, config, script_namespace,
+                                         task)
+                running[future] = (pipeline_job, start)
+
+            if not running:
+                continue
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                pipeline_job, start = running.pop(future)
+                _finish(pipeline_job, future.result(), start)
+
+    return [str(int(i)) + "s" for i in time_list]
+
+
+def _schedule_suites(suites, clients: Clients, config: Config, namespace: str, data_namespace_mangling: bool,
+                     limits, runner, skip_data=False, skip_jobs=False, clean_data=False, upload_cache=None,
+                     journal=None, history=None, budget=None, **upload_kwargs):
+    """
+    run uploads, pipeline jobs and cleanups of all suites as one work graph under `limits`:
+    jobs of a suite wait for its upload and their deps, cleanup of a suite waits for its jobs,
+    and a suite reusing tables of an earlier suite uploads only after that suite is done with them;
+    each job holds one slot of every party of its suite and `task_cores` cores, each upload holds one upload slot;
+    jobs run in worker processes of `runner`, jobs which succeeded before by `journal` are not run again;
+    outcomes are recorded to `history`, failures counted in `budget` and once it is exhausted,
+    uploads and jobs not started yet are aborted
+    """
+    graph = WorkGraph(limits, abort=budget.exhausted if budget is not None else None)
+    client = clients['guest_0']
+    guest_party_id = config.parties.role_to_party("guest")[0]
+    script_namespace = f"_{namespace}" if data_namespace_mangling else None
+    # table -> last work item of the suite which used it
+    table_users = {}
+    for i, suite in enumerate(suites):
+        progress = f"[{i + 1}/{len(suites)}]"
+        start, time_list = [], []
+        succeeded = journal.succeeded_jobs(suite) if journal is not None else set()
+        if journal is not None and journal.suite_done(suite) and len(succeeded) == len(suite.pipeline_jobs):
+            echo.echo(f"{progress}done before, skip {suite.path}", fg='red')
+            if not skip_jobs:
+                echo.echo(suite.pretty_final_summary([], str(suite.path).split("/")[-1]))
+            continue
+
+        def _start(suite=suite, progress=progress, start=start):
+            if not start:
+                start.append(time.time())
+                echo.echo(f"{progress}start at {time.strftime('%Y-%m-%d %X')} {suite.path}", fg='red')
+
+        upload = None
+        if not skip_data:
+            def _upload(suite=suite, _start=_start):
+                _start()
                 try:
-                    mod.main(config=config)
-                    job_info = os.environ.get("pipeline_job_info")
-                    job_id, status, time_elapsed, event = extract_job_status(job_info, client, guest_party_id)
-                    suite.update_status(job_name=job_name, job_id=job_id, status=status, time_elapsed=time_elapsed,
-                                        event=event)
-                    # suite.update_status(job_name=job_name, status="success")
-                    time_list.append(time.time() - start)
-                    os.environ.pop("pipeline_job_info")
+                    failed = _upload_datasets(clients, suite, config, upload_cache=upload_cache, journal=journal,
+                                              **upload_kwargs)
+                    if failed:
+                        raise RuntimeError(f"{failed} datasets of {suite.path} failed to upload")
+                except Exception:
+                    if budget is not None:
+                        budget.fail()
+                    raise
+                return True
 
-                except Exception as e:
-                    job_info = os.environ.get("pipeline_job_info")
-                    if job_info is None:
-                        job_id, status, time_elapsed, event = None, 'failed', None, None
+            def _abort_upload(suite=suite):
+                LOGGER.debug(f"upload of {suite.path} aborted")
+
+            upload = WorkItem(f"upload {suite.path}", _upload, resources={"upload": 1}, on_abort=_abort_upload)
+        job_items = {}
+        if not skip_jobs:
+            resources = _job_resources(config, suite)
+            pipeline_jobs = [job for job in suite.pipeline_jobs if job.job_name not in succeeded]
+            for pipeline_job in pipeline_jobs:
+                def _job(suite=suite, pipeline_job=pipeline_job, _start=_start, time_list=time_list):
+                    _start()
+                    echo.echo(f"Running job: {pipeline_job.job_name} of {suite.path}")
+                    job_start = time.time()
+                    result = _execute_pipeline_script(runner, pipeline_job, config, script_namespace,
+                                                      _pipeline_task(suite, pipeline_job.job_name))
+                    recorded, success = _record_pipeline_result(suite, pipeline_job.job_name, result,
+                                                                client, guest_party_id)
+                    if journal is not None:
+                        journal.record_job(suite, pipeline_job.job_name)
+                    if history is not None:
+                        history.record(history.job_key(suite, pipeline_job.job_name), time.time() - job_start,
+                                       success)
+                    if recorded:
+                        time_list.append(time.time() - job_start)
+                    if not success and budget is not None:
+                        budget.fail()
+                    return success
+
+                def _skip(suite=suite, pipeline_job=pipeline_job, upload=upload):
+                    if upload is not None and upload.state != SUCCEEDED:
+                        reason = "data upload not success"
                     else:
-                        job_id, status, time_elapsed, event = extract_job_status(job_info, client, guest_party_id)
-                    _raise(e, job_id=job_id, status=status, event=event, time_elapsed=time_elapsed)
-                    os.environ.pop("pipeline_job_info")
-                    continue
-        except Exception as e:
-            _raise(e, status="not submitted")
-            continue
+                        reason = f"deps {pipeline_job.deps} not success"
+                    echo.echo(f"Skip job: {pipeline_job.job_name} of {suite.path}, {reason}")
+                    _record_pipeline_error(suite, pipeline_job.job_name, reason, status="not submitted")
 
-    return [str(int(i)) + "s" for i in time_list]
+                def _abort(suite=suite, pipeline_job=pipeline_job):
+                    suite.update_status(job_name=pipeline_job.job_name, status=ABORTED)
+
+                job_items[pipeline_job.job_name] = WorkItem(f"job {pipeline_job.job_name} of {suite.path}", _job,
+                                                            resources=resources, on_skip=_skip, on_abort=_abort)
+            for pipeline_job in pipeline_jobs:
+                job_items[pipeline_job.job_name].requires = [job_items[dep] for dep in pipeline_job.deps
+                                                             if dep not in succeeded]
+
+        def _finish(suite=suite, progress=progress, start=start, time_list=time_list):
+            if not start and budget is not None and budget.exhausted():
+                # aborted before anything of suite ran
+                return True
+            if not skip_data and clean_data:
+                if journal is not None:
+                    journal.record_clean(suite)
+                _delete_data(clients, suite, upload_cache=upload_cache)
+            if journal is not None:
+                journal.record_suite(suite)
+            if start:
+                echo.echo(f"{progress}elapse {timedelta(seconds=int(time.time() - start[0]))}", fg='red')
+                if history is not None and not skip_jobs:
+                    history.record(history.suite_key(suite), time.time() - start[0], not _suite_failed(suite))
+            if not skip_jobs:
+                suite_file = str(suite.path).split("/")[-1]
+                echo.echo(suite.pretty_final_summary([f"{int(t)}s" for t in time_list], suite_file))
+            return True
+
+        add_suite_work(graph, _suite_tables(clients, suite), table_users, WorkItem(f"finish {suite.path}", _finish),
+                       upload=upload, jobs=list(job_items.values()))
+    graph.run()
+    if budget is not None and budget.exhausted():
+        echo.echo(f"fail fast after {budget.failures} failures, remaining uploads and jobs aborted", fg='red')
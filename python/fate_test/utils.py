@@ -14,7 +14,6 @@
 #  limitations under the License.
 #
 
-import json
 import math
 import os
 from datetime import timedelta
@@ -409,17 +408,25 @@ def pretty_time_info_summary(time_info_summary, job_name):
                                   f"{job_name}({time_info_summary['job_id']}){TxtStyle.END}")
 
 
-def extract_job_status(job_info_list, client, party_id):
-    job_id_list = []
+def extract_job_status(jobs, client, party_id):
+    """
+    ids, final statuses, elapsed times and pipeline events of submitted `jobs`, a list of `JobEvent`;
+    jobs without a final status yet are queried from flow together
+    """
+    from fate_test._flow_client import Status
+
+    job_id_list = [job.job_id for job in jobs]
+    event_list = [job.event for job in jobs]
+    known = {job.job_id: job for job in jobs if job.status is not None and Status(str(job.status)).is_done()}
+    unknown = [job_id for job_id in job_id_list if job_id not in known]
+    queried = dict(zip(unknown, client.query_jobs(unknown, "guest", party_id))) if unknown else {}
     job_status_list = []
     job_time_list = []
-    event_list = []
-    job_info_list = json.loads(job_info_list)
-    for job_info in job_info_list:
-        job_id = job_info.get("job_info").get("job_id")
-        job_id_list.append(job_id)
-        event_list.append(job_info.get("event"))
-        job_summary = client.query_job(job_id, "guest", party_id)
-        job_status_list.append(job_summary.status)
-        job_time_list.append(job_summary.elapsed)
+    for job_id in job_id_list:
+        if job_id in known:
+            job_status_list.append(Status(str(known[job_id].status)))
+            job_time_list.append(known[job_id].elapsed)
+        else:
+            job_status_list.append(queried[job_id].status)
+            job_time_list.append(queried[job_id].elapsed)
     return job_id_list, job_status_list, job_time_list, event_list
@@ -13,9 +13,16 @@ install_requires = [
     "ruamel.yaml>=0.16,<0.17.0",
     'colorama>0.4.4',
     'xgboost>=1.7.6',
-    "scikit-learn"
+    "scikit-learn",
+    "requests>=2.25.0",
+    "urllib3>=1.26.0"
 ]
 
+extras_require = {
+    "async": ["aiohttp>=3.8.0"],
+    "arrow": ["pyarrow>=10.0.0"]
+}
+
 entry_points = {"console_scripts": ["fate_test = fate_test.scripts.cli:cli"]}
 
 setup_kwargs = {
@@ -31,6 +38,7 @@ setup_kwargs = {
     "packages": packages,
     "package_data": package_data,
     "install_requires": install_requires,
+    "extras_require": extras_require,
     "entry_points": entry_points,
     "python_requires": ">=3.8",
 }
@@ -0,0 +1,167 @@
+import asyncio
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+try:
+    from aiohttp import web
+    from aiohttp.test_utils import TestServer
+except ImportError:
+    web = None
+try:
+    from fate_client.flow_sdk import FlowClient
+except ImportError:
+    FlowClient = None
+
+from fate_test._async_flow_client import AsyncFLOWClient
+from fate_test._parser import Data
+
+
+@unittest.skipIf(web is None, "aiohttp not installed, install fate_test[async]")
+class TestAsyncFLOWClient(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        Path(self._dir.name, "guest.csv").write_text("id,x0\n1,0.5\n")
+        self.uploads = []
+        self.queries = []
+        app = web.Application()
+        app.router.add_post("/v2/data/component/upload/file", self._upload)
+        app.router.add_get("/v2/job/query", self._query)
+        app.router.add_get("/v2/table/query", self._reset)
+        app.router.add_post("/v2/table/delete", self._reset)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.client = AsyncFLOWClient(f"{self.server.host}:{self.server.port}", self._dir.name, self._dir.name,
+                                      poll_max_interval=0.2, http=dict(pool_size=2, read_timeout=5))
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.server.close()
+        self._dir.cleanup()
+
+    async def _upload(self, request):
+        form = await request.post()
+        self.uploads.append(dict(name=form["name"], namespace=form["namespace"], partitions=form["partitions"],
+                                 content=form["file"].file.read().decode()))
+        return web.json_response(dict(code=0, job_id="upload_job"))
+
+    async def _query(self, request):
+        self.queries.append(request.query["job_id"])
+        status = "running" if len(self.queries) < 3 else "success"
+        return web.json_response(dict(code=0, data=[dict(status=status, progress=50, elapsed=1000)]))
+
+    async def _reset(self, request):
+        self.queries.append(request.path)
+        request.transport.close()
+        return web.json_response(dict(code=0))
+
+    def _data(self):
+        return Data(dict(file="guest.csv", namespace="experiment", table_name="guest", partitions=2), "guest_0")
+
+    async def test_submit_upload(self):
+        job_id = await self.client.submit_upload(self._data())
+        self.assertEqual(job_id, "upload_job")
+        self.assertEqual(self.uploads, [dict(name="guest", namespace="experiment", partitions="2",
+                                             content="id,x0\n1,0.5\n")])
+
+    async def test_awaiting(self):
+        progress = []
+        status = await self.client.awaiting("upload_job", "local", 0, callback=progress.append)
+        self.assertTrue(status.is_success())
+        self.assertEqual(self.queries, ["upload_job"] * 3)
+        self.assertEqual(len(progress), 2)
+
+    async def test_upload_callback_called_once_with_upload_response(self):
+        responses = []
+        status = await self.client.upload_file_and_convert_to_dataframe(self._data(), callback=responses.append)
+        self.assertEqual(status, "success")
+        self.assertEqual(responses, [dict(code=0, job_id="upload_job")])
+
+    async def test_reset_retried_for_idempotent_methods_only(self):
+        with self.assertRaises(Exception):
+            await self.client.table_count("guest", "experiment")
+        # aiohttp may retry a reset of reused connection by itself as well
+        self.assertGreaterEqual(len(self.queries), 4)
+        self.assertEqual(set(self.queries), {"/v2/table/query"})
+        self.queries.clear()
+        with self.assertRaises(Exception):
+            await self.client.delete_table("guest", "experiment")
+        self.assertEqual(self.queries, ["/v2/table/delete"])
+
+    async def test_session_follows_http_config(self):
+        session = self.client._get_session()
+        self.assertEqual(session.connector.limit, 2)
+        self.assertEqual(session.timeout.sock_read, 5)
+        self.assertEqual(session.timeout.sock_connect, 10)
+
+
+@unittest.skipIf(web is None or FlowClient is None, "aiohttp or fate client flow sdk not installed")
+class TestAsyncFLOWClientEndpoints(unittest.IsolatedAsyncioTestCase):
+    """
+    requests of `AsyncFLOWClient` equal to those of flow sdk it stands in for
+    """
+
+    async def asyncSetUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        Path(self._dir.name, "guest.csv").write_text("id,x0\n1,0.5\n")
+        self.requests = []
+        app = web.Application()
+        app.router.add_route("*", "/{path:.*}", self._record)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.address = f"{self.server.host}:{self.server.port}"
+        self.client = AsyncFLOWClient(self.address, self._dir.name, self._dir.name)
+        self.sdk = FlowClient(self.server.host, self.server.port, "v2")
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.server.close()
+        self._dir.cleanup()
+
+    async def _record(self, request):
+        if request.content_type == "multipart/form-data":
+            form = await request.post()
+            body = {k: v.file.read().decode() if hasattr(v, "file") else v for k, v in form.items()}
+        else:
+            text = await request.text()
+            body = json.loads(text) if text else None
+        self.requests.append((request.method, request.path, dict(request.query), body))
+        return web.json_response(dict(code=0, message="success", job_id="job",
+                                      data=[dict(status="success", progress=100, elapsed=0)]))
+
+    async def _assert_same_request(self, call, sdk_call):
+        # only requests are compared, responses recorded here do not fit every endpoint
+        await asyncio.gather(call, return_exceptions=True)
+        await asyncio.to_thread(sdk_call)
+        self.assertEqual(len(self.requests), 2)
+        self.assertEqual(self.requests[0], self.requests[1])
+        self.requests.clear()
+
+    async def test_requests_equal_to_flow_sdk(self):
+        data = Data(dict(file="guest.csv", namespace="experiment", table_name="guest", partitions=2), "guest_0")
+        path = str(Path(self._dir.name, "guest.csv"))
+        await self._assert_same_request(
+            self.client.submit_upload(data),
+            lambda: self.sdk.data.upload_file(file=path, head=data.head, meta=data.meta,
+                                              extend_sid=data.extend_sid, partitions=data.partitions,
+                                              namespace=data.namespace, name=data.table_name))
+        await self._assert_same_request(self.client.query_job("job", "guest", "9999"),
+                                        lambda: self.sdk.job.query("job", role="guest", party_id="9999"))
+        await self._assert_same_request(self.client.query_task("job", "guest", "9999"),
+                                        lambda: self.sdk.task.query("job", role="guest", party_id="9999"))
+        await self._assert_same_request(
+            self.client.output_data_table("job", "guest", "9999", "reader_0", "data"),
+            lambda: self.sdk.output.data_table("job", role="guest", party_id="9999", task_name="reader_0"))
+        await self._assert_same_request(self.client.table_count("guest", "experiment"),
+                                        lambda: self.sdk.table.query(namespace="experiment", name="guest"))
+        await self._assert_same_request(self.client.delete_table("guest", "experiment"),
+                                        lambda: self.sdk.table.delete(namespace="experiment", name="guest"))
+        bind = Data(dict(file="guest.csv", namespace="experiment", table_name="guest"), "guest_0")
+        await self._assert_same_request(
+            self.client.bind_table(bind),
+            lambda: self.sdk.table.bind_path(path=path, namespace="experiment", name="guest"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+
+from fate_test._flow_client import JobPoller, PollBackoff, Status
+from fate_test.scripts.generate_mock_data import IdHashCache, bulk_id_encryption
+
+
+class TestPollBackoff(unittest.TestCase):
+    def test_intervals_grow_up_to_max(self):
+        backoff = PollBackoff(initial=0.5, max_interval=4, factor=2, jitter=0)
+        self.assertEqual([backoff.next() for _ in range(6)], [0.5, 1, 2, 4, 4, 4])
+
+    def test_jitter(self):
+        backoff = PollBackoff(initial=1, max_interval=1, jitter=0.2)
+        for _ in range(100):
+            self.assertTrue(0.8 <= backoff.next() <= 1.2)
+
+
+class FakeFlowClient(object):
+    address = "127.0.0.1:9380"
+
+    def __init__(self, polls_until_done, failures=0):
+        self.polls_until_done = polls_until_done
+        self.failures = failures
+        self.queries = []
+        self._lock = threading.Lock()
+
+    def query_job(self, job_id, role, party_id):
+        with self._lock:
+            self.queries.append(job_id)
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError("flow unavailable")
+            done = self.queries.count(job_id) >= self.polls_until_done[job_id]
+        status = Status("success" if done else "running")
+        return type("QueryJobResponse", (), dict(status=status))()
+
+
+class TestJobPoller(unittest.TestCase):
+    def test_jobs_polled_by_one_loop_until_done(self):
+        client = FakeFlowClient(dict(a=2, b=3))
+        poller = JobPoller(client, max_interval=0.2)
+        progress = []
+        futures = [poller.watch("a", "guest", 9999, callback=progress.append), poller.watch("b", "guest", 9999)]
+        self.assertTrue(all(str(future.result(10)) == "success" for future in futures))
+        self.assertEqual(sorted(client.queries), ["a", "a", "b", "b", "b"])
+        # called for each poll before job is done
+        self.assertEqual(len(progress), 1)
+
+    def test_query_failures_retried(self):
+        client = FakeFlowClient(dict(a=1), failures=2)
+        poller = JobPoller(client, max_interval=0.2)
+        self.assertTrue(poller.wait("a", "guest", 9999, timeout=10).is_success())
+        self.assertEqual(client.queries, ["a"] * 3)
+
+
+class TestIdHashCache(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_hashes_equal_uncached(self):
+        cache = IdHashCache(self._dir.name, block_size=100)
+        for start, end in [(0, 100), (30, 250), (250, 260), (5, 5)]:
+            np.testing.assert_array_equal(cache.get("sha256", start, end), bulk_id_encryption("sha256", start, end))
+        # blocks computed once are reused by a new cache
+        self.assertEqual(len(os.listdir(self._dir.name)), 3)
+        np.testing.assert_array_equal(IdHashCache(self._dir.name, block_size=100).get("sha256", 120, 180),
+                                      bulk_id_encryption("sha256", 120, 180))
+
+    def test_least_recently_used_blocks_evicted(self):
+        cache = IdHashCache(self._dir.name, block_size=1 << 14, max_size=1)
+        cache.warm("sha256", 0, 1 << 14)
+        first = os.listdir(self._dir.name)
+        # one block of sha256 hex digests takes 1MB, the cache keeps only the block just warmed
+        cache.warm("sha256", 1 << 14, 2 << 14)
+        blocks = os.listdir(self._dir.name)
+        self.assertEqual(len(blocks), 1)
+        self.assertNotEqual(blocks, first)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+
+try:
+    from fate_client.pipeline.executor.task_executor import FateFlowExecutor
+    from fate_client.pipeline.pipeline import FateFlowPipeline
+except ImportError:
+    FateFlowPipeline = None
+
+from fate_test._events import FINISHED, JobEventBus, SUBMITTED, publish_to
+
+
+class FakeJobInvoker(object):
+    def __init__(self, job_ids):
+        self._job_ids = iter(job_ids)
+
+    def submit_job(self, dag_schema):
+        return next(self._job_ids), "model", "0"
+
+    def monitor_status(self, job_id, role, party_id):
+        if job_id.startswith("failed"):
+            raise ValueError(f"Job is failed, job_id={job_id}")
+
+
+class FakeDagSchema(object):
+    @staticmethod
+    def dict(**kwargs):
+        return {}
+
+
+@unittest.skipIf(FateFlowPipeline is None, "fate client pipeline not installed")
+class TestPipelineJobEvents(unittest.TestCase):
+    def _run(self, pipeline, job_id, event):
+        # what `fit` and `predict` of pipeline run once dag is built
+        FateFlowExecutor()._run(FakeDagSchema(), "guest", "9999", FakeJobInvoker([job_id]),
+                                pipeline.callback_handler, event=event)
+
+    def test_jobs_published_to_task_in_scope(self):
+        bus = JobEventBus()
+        with publish_to(bus, "task"):
+            pipeline = FateFlowPipeline()
+            self._run(pipeline, "fit-job", "fit")
+            self._run(pipeline, "predict-job", "predict")
+            with self.assertRaises(ValueError):
+                self._run(pipeline, "failed-job", "fit")
+        self.assertEqual([(e.kind, e.job_id, e.event) for e in bus.events("task")],
+                         [(SUBMITTED, "fit-job", "fit"), (FINISHED, "fit-job", "fit"),
+                          (SUBMITTED, "predict-job", "predict"), (FINISHED, "predict-job", "predict"),
+                          (SUBMITTED, "failed-job", "fit")])
+        jobs = bus.submitted("task")
+        self.assertEqual([job.status for job in jobs], ["success", "success", None])
+        self.assertIsNotNone(jobs[0].elapsed)
+
+    def test_jobs_outside_scope_ignored(self):
+        bus = JobEventBus()
+        with publish_to(bus, "task"):
+            pass
+        self._run(FateFlowPipeline(), "fit-job", "fit")
+        self.assertEqual(bus.events("task"), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    from fate_client.flow_sdk import FlowClient
+except ImportError:
+    FlowClient = None
+
+from fate_test._http import FlowSession, attach_session
+
+
+class FlowHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.requests.append((self.path.split("?")[0], self.headers.get("Connection")))
+        body = json.dumps(dict(code=0, data=[])).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@unittest.skipIf(FlowClient is None, "fate client flow sdk not installed")
+class TestAttachSession(unittest.TestCase):
+    """
+    requests of the flow sdk fate_test is pinned to go through `FlowSession` attached to it
+    """
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FlowHandler)
+        self.server.requests = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.address = f"127.0.0.1:{self.server.server_port}"
+        self.sdk = FlowClient("127.0.0.1", self.server.server_port, "v2")
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _query(self, times):
+        for _ in range(times):
+            self.assertEqual(self.sdk.job.query("job", role="guest", party_id="9999")["code"], 0)
+
+    def test_pooled_session_used_by_sdk(self):
+        session = FlowSession(self.address, pool_size=2)
+        attach_session(self.sdk, session)
+        self._query(3)
+        self.assertEqual(session.stats.requests, 3)
+        self.assertEqual(session.connections(), (1, 3))
+        self.assertEqual(self.server.requests, [("/v2/job/query", None)] * 3)
+
+    def test_keep_alive_disabled(self):
+        session = FlowSession(self.address, keep_alive=False)
+        attach_session(self.sdk, session)
+        self._query(2)
+        self.assertEqual(session.stats.requests, 2)
+        self.assertEqual(self.server.requests, [("/v2/job/query", "close")] * 2)
+
+    def test_sdk_without_session_fails(self):
+        class SessionlessClient(object):
+            pass
+
+        with self.assertRaises(RuntimeError):
+            attach_session(SessionlessClient(), FlowSession(self.address))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import threading
+import time
+import unittest
+
+from fate_test.scripts._scheduler import (ABORTED, FAILED, SKIPPED, SUCCEEDED, FailureBudget, WorkGraph, WorkItem,
+                                          add_suite_work)
+
+
+class Tracker(object):
+    """
+    work item runs recording how many ran at the same time
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+        self.ran = []
+
+    def work(self, name, result=True, seconds=0.05):
+        def _run():
+            with self._lock:
+                self.running += 1
+                self.max_running = max(self.max_running, self.running)
+                self.ran.append(name)
+            time.sleep(seconds)
+            with self._lock:
+                self.running -= 1
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        return _run
+
+
+class TestWorkGraph(unittest.TestCase):
+    def test_limit_of_resource_kind_applies_to_each_resource(self):
+        tracker = Tracker()
+        graph = WorkGraph(dict(party=2))
+        for i in range(6):
+            graph.add(WorkItem(f"job{i}", tracker.work(f"job{i}"), resources={"party:9999": 1}))
+        states = graph.run()
+        self.assertEqual(set(states.values()), {SUCCEEDED})
+        self.assertEqual(tracker.max_running, 2)
+
+    def test_limits_of_all_resources_hold(self):
+        tracker = Tracker()
+        graph = WorkGraph(dict(party=4, task_cores=8))
+        for i in range(6):
+            graph.add(WorkItem(f"job{i}", tracker.work(f"job{i}"),
+                               resources={"party:9999": 1, "party:10000": 1, "task_cores": 4}))
+        graph.run()
+        self.assertEqual(tracker.max_running, 2)
+
+    def test_item_over_limit_runs_alone(self):
+        tracker = Tracker()
+        graph = WorkGraph(dict(task_cores=4))
+        graph.add(WorkItem("small", tracker.work("small", seconds=0.2), resources={"task_cores": 2}))
+        graph.add(WorkItem("large", tracker.work("large"), resources={"task_cores": 16}))
+        self.assertEqual(set(graph.run().values()), {SUCCEEDED})
+        self.assertEqual(tracker.max_running, 1)
+
+    def test_later_item_passes_blocked_one(self):
+        tracker = Tracker()
+        graph = WorkGraph(dict(upload=1))
+        graph.add(WorkItem("first", tracker.work("first", seconds=0.2), resources={"upload": 1}))
+        graph.add(WorkItem("blocked", tracker.work("blocked"), resources={"upload": 1}))
+        graph.add(WorkItem("other", tracker.work("other")))
+        graph.run()
+        self.assertLess(tracker.ran.index("other"), tracker.ran.index("blocked"))
+
+    def test_requires_skips_on_failure(self):
+        tracker = Tracker()
+        skipped = []
+        graph = WorkGraph()
+        upload = graph.add(WorkItem("upload", tracker.work("upload", result=RuntimeError("upload failed"))))
+        graph.add(WorkItem("job", tracker.work("job"), requires=[upload], on_skip=lambda: skipped.append("job")))
+        graph.add(WorkItem("finish", tracker.work("finish"), after=[upload]))
+        states = graph.run()
+        self.assertEqual(states, dict(upload=FAILED, job=SKIPPED, finish=SUCCEEDED))
+        self.assertEqual(skipped, ["job"])
+        self.assertEqual(tracker.ran, ["upload", "finish"])
+
+    def test_suite_waits_for_earlier_suite_using_its_tables(self):
+        tracker = Tracker()
+        graph = WorkGraph()
+        table_users = {}
+        for suite in ("a", "b"):
+            add_suite_work(graph, {("guest", "experiment", "table")}, table_users,
+                           WorkItem(f"finish {suite}", tracker.work(f"finish {suite}")),
+                           upload=WorkItem(f"upload {suite}", tracker.work(f"upload {suite}")),
+                           jobs=[WorkItem(f"job {suite}", tracker.work(f"job {suite}"))])
+        graph.run()
+        self.assertEqual(tracker.ran, ["upload a", "job a", "finish a", "upload b", "job b", "finish b"])
+
+
+class TestFailureBudget(unittest.TestCase):
+    def test_no_limit(self):
+        budget = FailureBudget()
+        for _ in range(10):
+            budget.fail()
+        self.assertFalse(budget.exhausted())
+
+    def test_pending_items_aborted_once_exhausted(self):
+        tracker = Tracker()
+        budget = FailureBudget(1)
+        aborted = []
+        graph = WorkGraph(dict(party=1), abort=budget.exhausted)
+
+        def _fail():
+            budget.fail()
+            return False
+
+        graph.add(WorkItem("failed", _fail, resources={"party:9999": 1}))
+        for i in range(3):
+            graph.add(WorkItem(f"job{i}", tracker.work(f"job{i}"), resources={"party:9999": 1},
+                               on_abort=lambda i=i: aborted.append(f"job{i}")))
+        graph.add(WorkItem("cleanup", tracker.work("cleanup")))
+        states = graph.run()
+        self.assertTrue(budget.exhausted())
+        self.assertEqual(states["failed"], FAILED)
+        self.assertEqual(aborted, ["job0", "job1", "job2"])
+        self.assertEqual([states[f"job{i}"] for i in range(3)], [ABORTED] * 3)
+        # items without `on_abort`, such as cleanups, still run
+        self.assertEqual(tracker.ran, ["cleanup"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import inspect
+import os
+import tempfile
+import textwrap
+import threading
+import unittest
+from pathlib import Path
+
+from fate_test._events import SUBMITTED, job_events
+from fate_test._parser import PipelineJob
+from fate_test.scripts._runner import ScriptRunner
+from fate_test.scripts._utils import _run_pipeline_script
+from fate_test.scripts.cli import MultiCLI
+
+PIPELINE_SCRIPT = """
+from fate_test._events import publish_job
+
+
+def main(config=None, namespace=None):
+    publish_job("job-of-" + str(namespace), "fit")
+"""
+
+HANGING_SCRIPT = """
+import time
+
+from fate_test._events import publish_job
+
+
+def main(config=None, namespace=None):
+    publish_job("finished-job", "fit")
+    publish_job("finished-job", "fit", kind="finished", status="success")
+    publish_job("running-job", "predict")
+    time.sleep(600)
+"""
+
+
+class TestSuiteScriptRunner(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.script_path = Path(self._dir.name, "pipeline_script.py")
+        self.script_path.write_text(textwrap.dedent(PIPELINE_SCRIPT))
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_suite_job_runs_in_worker(self):
+        # load suite command as fate_test does, through `eval` of its file
+        command = MultiCLI().get_command(None, "suite")
+        suite_cli = inspect.unwrap(command.callback).__globals__
+        task = f"{self.script_path}:job"
+        with ScriptRunner(size=1, timeout=60) as runner:
+            result = suite_cli["_execute_pipeline_script"](runner, PipelineJob("job", self.script_path), None,
+                                                           "ns", task)
+        self.assertIsNone(result["error"])
+        self.assertTrue(result["loaded"])
+        jobs = job_events.submitted(task)
+        job_events.clear(task)
+        self.assertEqual([(job.kind, job.job_id, job.event) for job in jobs], [(SUBMITTED, "job-of-ns", "fit")])
+
+    def test_timeout_stops_running_jobs(self):
+        script_path = Path(self._dir.name, "hanging_script.py")
+        script_path.write_text(textwrap.dedent(HANGING_SCRIPT))
+        task = f"{script_path}:job"
+        stopped = []
+        with ScriptRunner(size=1, timeout=10, stop_job=stopped.append) as runner:
+            with self.assertRaises(TimeoutError):
+                runner.run(_run_pipeline_script, script_path, None, "ns", task)
+        job_events.clear(task)
+        self.assertEqual(stopped, ["running-job"])
+
+
+class TestScriptRunner(unittest.TestCase):
+    def test_failed_send_releases_worker(self):
+        with ScriptRunner(size=1, timeout=60) as runner:
+            with self.assertRaises(Exception):
+                runner.run(os.getpid, lambda: None)
+            pids = []
+            thread = threading.Thread(target=lambda: pids.append(runner.run(os.getpid)), daemon=True)
+            thread.start()
+            thread.join(60)
+            self.assertFalse(thread.is_alive(), "worker slot leaked by failed call")
+            self.assertEqual(len(pids), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
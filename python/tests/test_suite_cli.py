@@ -0,0 +1,132 @@
+import inspect
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+from fate_test._events import FINISHED, SUBMITTED, JobEvent, job_events
+from fate_test._journal import RunJournal
+from fate_test._parser import PipelineJob, Testsuite
+from fate_test._run_history import RunHistory
+from fate_test.scripts._utils import _shard_suites
+from fate_test.scripts.cli import MultiCLI
+
+
+def _suite(path, job_names, deps=None):
+    deps = deps or {}
+    return Testsuite([], [PipelineJob(name, Path(f"{name}.py"), deps.get(name)) for name in job_names], Path(path))
+
+
+class TestSuiteCli(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        # load suite command as fate_test does, through `eval` of its file
+        command = MultiCLI().get_command(None, "suite")
+        self.suite_cli = inspect.unwrap(command.callback).__globals__
+        self._execute = self.suite_cli["_execute_pipeline_script"]
+        self.suite_cli["_execute_pipeline_script"] = self._run_script
+        self.ran = []
+        self.failing = set()
+
+    def tearDown(self):
+        self.suite_cli["_execute_pipeline_script"] = self._execute
+        self._dir.cleanup()
+
+    def _run_script(self, runner, pipeline_job, config, namespace=None, task=None):
+        self.ran.append(pipeline_job.job_name)
+        job_id = f"{pipeline_job.job_name}-{len(self.ran)}"
+        status = "failed" if pipeline_job.job_name in self.failing else "success"
+        job_events.publish(JobEvent(task, SUBMITTED, job_id, "fit"))
+        job_events.publish(JobEvent(task, FINISHED, job_id, "fit", status, 1.0))
+        return dict(loaded=True, error=None, load_time=0.01)
+
+    def _run_jobs(self, suite, journal):
+        config = SimpleNamespace(parties=SimpleNamespace(role_to_party=lambda role: [9999]))
+        succeeded = journal.succeeded_jobs(suite)
+        self.suite_cli["_run_pipeline_jobs"](config, suite, "ns", False, {"guest_0": None}, journal=journal,
+                                            succeeded=succeeded)
+
+    def test_resume_skips_journaled_jobs(self):
+        path = os.path.join(self._dir.name, "journal.jsonl")
+        self.failing = {"b"}
+        self._run_jobs(_suite("suite.yaml", ["a", "b", "c"]), RunJournal(path=path))
+        self.assertEqual(self.ran, ["a", "b", "c"])
+
+        self.ran, self.failing = [], set()
+        suite = _suite("suite.yaml", ["a", "b", "c"])
+        self._run_jobs(suite, RunJournal(path=path, resume=True))
+        self.assertEqual(self.ran, ["b"])
+        status = suite.get_final_status()
+        # status of skipped jobs restored from journal
+        self.assertEqual(status["a"].job_id, ["a-1"])
+        self.assertEqual(status["b"].job_id, ["b-1"])
+        self.assertTrue(all(s.is_success() for job in status.values() for s in job.status))
+
+    def test_history_orders_suites_and_only_jobs_with_deps(self):
+        history = RunHistory(path=os.path.join(self._dir.name, "run_history.json"), root=self._dir.name)
+        slow = _suite(os.path.join(self._dir.name, "slow.yaml"), ["z", "y"])
+        fast = _suite(os.path.join(self._dir.name, "fast.yaml"), ["z", "y"])
+        failed = _suite(os.path.join(self._dir.name, "failed.yaml"), ["z", "y"], deps={"z": ["x"], "y": ["x"]})
+        failed.pipeline_jobs.insert(0, PipelineJob("x", Path("x.py")))
+        history.record(history.suite_key(slow), 100, True)
+        history.record(history.suite_key(fast), 10, True)
+        history.record(history.suite_key(failed), 50, False)
+        for suite in (slow, fast, failed):
+            history.record(history.job_key(suite, "z"), 20, True)
+            history.record(history.job_key(suite, "y"), 5, True)
+
+        ordered = self.suite_cli["_prioritize"]([slow, fast, failed], history)
+        self.assertEqual(ordered, [failed, fast, slow])
+        # jobs without deps keep listed order, they may rely on it
+        self.assertEqual([job.job_name for job in slow.pipeline_jobs], ["z", "y"])
+        self.assertEqual([job.job_name for job in failed.pipeline_jobs], ["x", "y", "z"])
+
+
+class TestShardSuites(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def _suites(self, root):
+        return [_suite(os.path.join(root, group, f"suite{i}.yaml"), ["job"])
+                for group in ("hetero", "homo") for i in range(7)]
+
+    def _assert_partition(self, suites, count, history=None):
+        shards = [_shard_suites(suites, index, count, history) for index in range(1, count + 1)]
+        ran = [suite.path for shard in shards for suite in shard]
+        self.assertEqual(sorted(ran), sorted(suite.path for suite in suites))
+        return [[os.path.relpath(suite.path, os.path.dirname(os.path.dirname(suite.path))) for suite in shard]
+                for shard in shards]
+
+    def test_hash_shards_cover_each_suite_once(self):
+        for count in (1, 2, 3, 5):
+            self._assert_partition(self._suites(self._dir.name), count)
+
+    def test_duration_shards_cover_each_suite_once(self):
+        history_path = os.path.join(self._dir.name, "run_history.json")
+        history = RunHistory(path=history_path, root=self._dir.name)
+        for i, suite in enumerate(self._suites(self._dir.name)[:10]):
+            history.record(history.suite_key(suite), 10 * (i + 1), True)
+        snapshot = RunHistory(path=history_path)
+        for count in (1, 2, 3, 5):
+            self._assert_partition(self._suites(self._dir.name), count, snapshot)
+
+    def test_hosts_with_different_checkouts_agree(self):
+        history_path = os.path.join(self._dir.name, "run_history.json")
+        history = RunHistory(path=history_path, root="/checkout")
+        for i, suite in enumerate(self._suites("/checkout")):
+            history.record(history.suite_key(suite), 10 * (i + 1), True)
+        with open(history_path) as f:
+            self.assertTrue(all(not key.startswith("/") for key in json.load(f)["runs"]))
+        snapshot = RunHistory(path=history_path)
+        for history in (None, snapshot):
+            self.assertEqual(self._assert_partition(self._suites("/host1/fate"), 3, history),
+                             self._assert_partition(self._suites("/host2/other/fate"), 3, history))
+
+
+if __name__ == '__main__':
+    unittest.main()